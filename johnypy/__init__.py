@@ -1,4 +1,41 @@
 # johnpy module
 
+import importlib
+
 from .base import *
-from .dbc import *
\ No newline at end of file
+from .profiling import *
+from .dbc import *
+from .decoder import *
+from .encoder import *
+from .filters import *
+from .transport import *
+from .incremental import *
+from .parallel import *
+from .synth import *
+
+# modules which depend on numpy, pyarrow or asyncio are imported on first attribute access
+_LAZY_MODULES = {
+    'FrameBatch': 'batch',
+    'CaptureReader': 'capture',
+    'LogReader': 'canlog',
+    'CandumpReader': 'canlog',
+    'AscReader': 'canlog',
+    'open_log': 'canlog',
+    'SignalWriter': 'export',
+    'ShardedDecoder': 'sharded',
+    'SignalStore': 'store',
+    'WindowAggregator': 'aggregate',
+    'DecodePipeline': 'aio',
+    'open_stream': 'aio',
+    'read_candump': 'aio',
+    'read_socketcan': 'aio',
+    'iter_chunks': 'aio'
+}
+
+
+def __getattr__(name):
+    """Import lazy modules on first access of one of their attributes"""
+    if name in _LAZY_MODULES:
+        module = importlib.import_module('.%s' % _LAZY_MODULES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -0,0 +1,170 @@
+#!/usr/bin/python
+
+import numpy as np
+
+__all__ = ['WindowAggregator', 'RECORD_DTYPE']
+
+# aggregate record of one window of one spn
+RECORD_DTYPE = np.dtype([('spn', '<i8'), ('start', '<f8'), ('end', '<f8'), ('count', '<u4'),
+                         ('min', '<f8'), ('max', '<f8'), ('mean', '<f8'), ('last', '<f8')])
+
+
+class _Panes():
+    """Aggregates of the step long panes of one spn which still belong to open windows"""
+
+    __slots__ = ['index', 'count', 'total', 'low', 'high', 'last', 'emitted']
+
+    def __init__(self):
+        self.index = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0, dtype=np.int64)
+        self.total = self.low = self.high = self.last = np.empty(0, dtype=np.float64)
+        # index of the last pane which ended an emitted window
+        self.emitted = None
+
+    def columns(self):
+        return self.index, self.count, self.total, self.low, self.high, self.last
+
+    def merge(self, index, count, total, low, high, last):
+        """Append pane aggregates of later values, the first one may continue the open pane"""
+        if self.index.shape[0] and index[0] == self.index[-1]:
+            count[0] += self.count[-1]
+            total[0] += self.total[-1]
+            low[0] = min(low[0], self.low[-1])
+            high[0] = max(high[0], self.high[-1])
+            self.index, self.count, self.total, self.low, self.high, self.last = \
+                (column[:-1] for column in self.columns())
+        self.index, self.count, self.total, self.low, self.high, self.last = \
+            (np.concatenate((old, new)) for old, new in zip(self.columns(), (index, count, total, low, high, last)))
+
+    def keep(self, first):
+        """Drop panes before pane index first"""
+        cut = int(np.searchsorted(self.index, first))
+        self.index, self.count, self.total, self.low, self.high, self.last = \
+            (column[cut:] for column in self.columns())
+
+
+class WindowAggregator():
+    """Streaming min/max/mean/last/count aggregation of decoded spn values in time windows
+
+    Windows are size seconds long and start every step seconds, aligned to
+    timestamp 0. step equal to size gives tumbling windows, smaller steps sliding
+    windows, size has to be a multiple of step. Values are reduced with NumPy into
+    step long panes, only the panes of open windows are kept per spn. A window is
+    emitted once a value of a later pane of its spn arrives or on flush. Values
+    of already closed panes are counted as late and dropped.
+    """
+
+    def __init__(self, size, step=None, dbc=None, spns=None, groups=None, units=None, valid_only=False):
+        """Create aggregator, spns, slot groups and units select the aggregated signals of dbc
+
+        Without selection all spns are aggregated. valid_only drops values outside the
+        slot range of the spn, like the j1939 error and not available values.
+        """
+        self.size = float(size)
+        self.step = float(step or size)
+        self.panes = int(round(self.size / self.step))
+        if self.panes < 1 or abs(self.panes * self.step - self.size) > 1e-9 * self.size:
+            raise ValueError('Window size %r is no multiple of step %r' % (size, step))
+        if (groups is not None or units is not None or valid_only) and dbc is None:
+            raise ValueError('Selection by slot metadata requires a dbc')
+
+        self.spns = None if spns is None else set(spns)
+        if groups is not None or units is not None:
+            groups = set(groups or ())
+            units = set(units or ())
+            selected = {sig.spn for msg in dbc.msgs for sig in msg.signals
+                        if sig.slot.group in groups or sig.slot.unit in units}
+            self.spns = selected if self.spns is None else self.spns | selected
+        self.ranges = None
+        if valid_only:
+            self.ranges = {sig.spn: (sig.slot.min, sig.slot.max) for msg in dbc.msgs for sig in msg.signals
+                           if sig.slot.min < sig.slot.max}
+        self._state = {}
+        self.stats = {'values': 0, 'late': 0, 'invalid': 0, 'windows': 0}
+
+    def _select(self, spn, stamps, values):
+        """Return valid values of spn in time order"""
+        stamps = np.asarray(stamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        limits = None if self.ranges is None else self.ranges.get(spn)
+        if limits is not None:
+            valid &= (values >= limits[0]) & (values <= limits[1])
+        if not valid.all():
+            self.stats['invalid'] += int(valid.size - np.count_nonzero(valid))
+            stamps, values = stamps[valid], values[valid]
+        if stamps.shape[0] > 1 and (stamps[1:] < stamps[:-1]).any():
+            order = np.argsort(stamps, kind='stable')
+            stamps, values = stamps[order], values[order]
+        return stamps, values
+
+    def update(self, spn, stamps, values):
+        """Aggregate values of spn, returns records of the windows which closed"""
+        if self.spns is not None and spn not in self.spns:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        stamps, values = self._select(spn, stamps, values)
+        state = self._state.get(spn)
+        if state is None:
+            state = self._state[spn] = _Panes()
+        index = np.floor(stamps / self.step).astype(np.int64)
+        if state.index.shape[0]:
+            late = np.searchsorted(index, state.index[-1])
+            if late:
+                self.stats['late'] += int(late)
+                index, values = index[late:], values[late:]
+        if not index.shape[0]:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        self.stats['values'] += index.shape[0]
+
+        starts = np.flatnonzero(np.concatenate(([True], index[1:] != index[:-1])))
+        bounds = np.append(starts, index.shape[0])
+        state.merge(index[starts], np.diff(bounds), np.add.reduceat(values, starts),
+                    np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts),
+                    values[bounds[1:] - 1])
+        # windows ending before the open pane are complete
+        records = self._windows(spn, state, state.index[-1] - 1)
+        state.keep(state.index[-1] - self.panes + 1)
+        return records
+
+    def update_decoded(self, decoded):
+        """Aggregate the spn -> (timestamps, values) result of DBCDecoder.decode_batch"""
+        records = [self.update(spn, stamps, values) for spn, (stamps, values) in decoded.items()]
+        return np.concatenate(records) if records else np.empty(0, dtype=RECORD_DTYPE)
+
+    def flush(self):
+        """Close all open windows and return their records"""
+        records = [self._windows(spn, state, None) for spn, state in self._state.items()]
+        self._state = {}
+        return np.concatenate(records) if records else np.empty(0, dtype=RECORD_DTYPE)
+
+    def _windows(self, spn, state, limit):
+        """Return records of the windows ending at panes up to limit, None for all panes"""
+        index = state.index
+        ends = np.unique((index[:, None] + np.arange(self.panes)).ravel())
+        if state.emitted is not None:
+            ends = ends[ends > state.emitted]
+        if limit is not None:
+            ends = ends[ends <= limit]
+        if not ends.shape[0]:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        state.emitted = int(ends[-1])
+
+        lo = np.searchsorted(index, ends - self.panes + 1)
+        hi = np.searchsorted(index, ends, side='right')
+        # reduceat over interleaved (lo, hi) pairs reduces each window at the even entries
+        pairs = np.empty(2 * ends.shape[0], dtype=np.intp)
+        pairs[0::2], pairs[1::2] = lo, hi
+        counts = np.concatenate(([0], np.cumsum(state.count)))
+        totals = np.concatenate(([0.0], np.cumsum(state.total)))
+
+        records = np.empty(ends.shape[0], dtype=RECORD_DTYPE)
+        records['spn'] = spn
+        records['start'] = (ends - self.panes + 1) * self.step
+        records['end'] = (ends + 1) * self.step
+        records['count'] = counts[hi] - counts[lo]
+        records['min'] = np.minimum.reduceat(np.append(state.low, 0.0), pairs)[0::2]
+        records['max'] = np.maximum.reduceat(np.append(state.high, 0.0), pairs)[0::2]
+        records['mean'] = (totals[hi] - totals[lo]) / records['count']
+        records['last'] = state.last[hi - 1]
+        self.stats['windows'] += ends.shape[0]
+        return records
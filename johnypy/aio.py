@@ -0,0 +1,220 @@
+#!/usr/bin/python
+
+import time
+import struct
+import asyncio
+import logging
+from .decoder import DBCDecoder
+from .canlog import parse_candump_line
+
+__all__ = ['DecodePipeline', 'open_stream', 'read_candump', 'read_socketcan', 'iter_chunks']
+
+# socketcan struct can_frame in host byte order
+SOCKETCAN_FRAME = struct.Struct('=IB3x8s')
+
+CAN_EFF_FLAG = 0x80000000
+CAN_ERR_FLAG = 0x20000000
+CAN_EFF_MASK = 0x1fffffff
+
+READ_SIZE = 1 << 16
+
+
+async def open_stream(address):
+    """Open tcp (host, port) or unix socket path stream, returns asyncio (reader, writer)"""
+    if isinstance(address, (tuple, list)):
+        return await asyncio.open_connection(*address)
+    return await asyncio.open_unix_connection(str(address))
+
+
+async def read_candump(reader, read_size=READ_SIZE):
+    """Generate frame lists from a stream of candump lines, lines without timestamp get the receive time"""
+    rest = b''
+    while True:
+        chunk = await reader.read(read_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        stamp = time.time()
+        frames = [frame for frame in (parse_candump_line(line, stamp) for line in lines) if frame]
+        if frames:
+            yield frames
+    frame = parse_candump_line(rest, time.time())
+    if frame:
+        yield [frame]
+
+
+async def read_socketcan(reader, read_size=READ_SIZE):
+    """Generate frame lists from a stream of binary socketcan frames with the receive time"""
+    size = SOCKETCAN_FRAME.size
+    rest = b''
+    while True:
+        chunk = await reader.read(read_size)
+        if not chunk:
+            break
+        rest += chunk
+        end = len(rest) - len(rest) % size
+        stamp = time.time()
+        frames = []
+        for canid, dlc, data in SOCKETCAN_FRAME.iter_unpack(rest[:end]):
+            if canid & CAN_ERR_FLAG:
+                continue
+            frames.append((stamp, canid & CAN_EFF_MASK if canid & CAN_EFF_FLAG else canid & 0x7ff,
+                           data[:min(dlc, 8)]))
+        rest = rest[end:]
+        if frames:
+            yield frames
+
+
+async def iter_chunks(frames):
+    """Wrap an (async) iterator of single (timestamp, canid, data) frames into frame lists"""
+    if hasattr(frames, '__aiter__'):
+        async for frame in frames:
+            yield [frame]
+    else:
+        for frame in frames:
+            yield [frame]
+
+
+class DecodePipeline():
+    """asyncio decode pipeline with bounded queues between its stages
+
+    ingest -> lookup (canid decomposition, dbc lookup, optional transport reassembly)
+    -> decode -> consumers. Decoded values are passed to every consumer as micro
+    batches of (timestamp, canid, spn, value) tuples. Full queues block the previous
+    stage, consumers added with policy 'drop' lose their oldest batch instead.
+    Frames rejected by the optional FrameFilter are dropped before the lookup,
+    transported messages are filtered after their reassembly.
+    """
+
+    QUEUE_SIZE = 64
+    BATCH_SIZE = 1024
+    BATCH_TIMEOUT = 0.05
+
+    def __init__(self, dbc, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, batch_timeout=BATCH_TIMEOUT,
+                 reassembler=None, frame_filter=None):
+        """Create new pipeline for dbc, queue_size counts frame lists or batches"""
+        self.decoder = DBCDecoder(dbc)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.reassembler = reassembler
+        self.frame_filter = frame_filter
+        self.consumers = []
+        self.stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """Reset throughput counters"""
+        self.stats = {'frames': 0, 'filtered': 0, 'unknown': 0, 'decoded': 0, 'values': 0, 'batches': 0,
+                      'dropped': 0, 'elapsed': 0.0}
+
+    def rates(self):
+        """Return frames, values and batches per second of the last run"""
+        elapsed = self.stats['elapsed'] or float('nan')
+        return {key: self.stats[key] / elapsed for key in ('frames', 'decoded', 'values', 'batches')}
+
+    def add_consumer(self, consumer, policy='block'):
+        """Add async consumer callable which receives each batch, policy is 'block' or 'drop'"""
+        if policy not in ('block', 'drop'):
+            raise ValueError('Unknown consumer policy %s' % policy)
+        self.consumers.append((consumer, policy))
+
+    async def run(self, source):
+        """Run the pipeline until source, an async iterator of frame lists, is exhausted
+
+        Exceptions of the source, lookup and decode stages cancel all stages and are raised.
+        """
+        self._reset_stats()
+        start = time.perf_counter()
+        lookups = asyncio.Queue(self.queue_size)
+        decodes = asyncio.Queue(self.queue_size)
+        outputs = [asyncio.Queue(self.queue_size) for _ in self.consumers]
+        tasks = [asyncio.ensure_future(self._lookup(lookups, decodes)),
+                 asyncio.ensure_future(self._decode(decodes, outputs))]
+        tasks += [asyncio.ensure_future(self._consume(consumer, queue))
+                  for (consumer, _), queue in zip(self.consumers, outputs)]
+        tasks.append(asyncio.ensure_future(self._ingest(source, lookups)))
+        try:
+            # the first failing stage ends the run, the ingestion would block on its full queue
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.stats['elapsed'] = time.perf_counter() - start
+        return self.stats
+
+    async def _ingest(self, source, lookups):
+        """Pass frame lists of source to the lookup stage"""
+        async for frames in source:
+            self.stats['frames'] += len(frames)
+            await lookups.put(frames)
+        await lookups.put(None)
+
+    async def _lookup(self, lookups, decodes):
+        """Resolve decode functions of all frames, unknown frames are dropped here"""
+        get_decoder = self.decoder.get_decoder
+        while True:
+            frames = await lookups.get()
+            if frames is None:
+                await decodes.put(None)
+                return
+            if self.reassembler is not None:
+                frames = list(self.reassembler.reassemble(frames))
+            if self.frame_filter is not None:
+                # filtered after the reassembly, transport frames do not carry the pgn of their message
+                count = len(frames)
+                frames = list(self.frame_filter.filter_frames(frames))
+                self.stats['filtered'] += count - len(frames)
+            resolved = []
+            for ts, canid, data in frames:
+                func = get_decoder(canid)
+                if func is None:
+                    self.stats['unknown'] += 1
+                else:
+                    resolved.append((ts, canid, func, data))
+            if resolved:
+                await decodes.put(resolved)
+
+    async def _decode(self, decodes, outputs):
+        """Decode frames and publish micro batches on size or timeout"""
+        batch = []
+        while True:
+            try:
+                frames = await asyncio.wait_for(decodes.get(), self.batch_timeout if batch else None)
+            except asyncio.TimeoutError:
+                batch = await self._publish(batch, outputs)
+                continue
+            if frames is None:
+                if batch:
+                    await self._publish(batch, outputs)
+                for queue in outputs:
+                    await queue.put(None)
+                return
+            for ts, canid, func, data in frames:
+                batch.extend((ts, canid, spn, value) for spn, value in func(data).items())
+            self.stats['decoded'] += len(frames)
+            if len(batch) >= self.batch_size:
+                batch = await self._publish(batch, outputs)
+
+    async def _publish(self, batch, outputs):
+        """Pass batch to all consumer queues, returns a new empty batch"""
+        self.stats['values'] += len(batch)
+        self.stats['batches'] += 1
+        for (_, policy), queue in zip(self.consumers, outputs):
+            if policy == 'drop' and queue.full():
+                queue.get_nowait()
+                self.stats['dropped'] += 1
+            await queue.put(batch)
+        return []
+
+    async def _consume(self, consumer, queue):
+        """Pass batches of one consumer queue to the consumer"""
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            try:
+                await consumer(batch)
+            except Exception:
+                logging.exception('Consumer %s failed' % consumer)
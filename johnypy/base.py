@@ -1,9 +1,8 @@
 #!/usr/bin/python
 
-import struct
 import logging
 
-__all__ = ['PGN', 'Stringify']
+__all__ = ['PGN', 'Stringify', 'CanIdCache']
 
 
 class Stringify():
@@ -48,24 +47,43 @@ class PGN(Stringify):
     def parse_canid(canid):
         """Return pgn from given canid"""
         if type(canid) == int:
-            pgn = bytearray(canid.to_bytes(4, byteorder='big')[0:3])
-            pgn[0] &= 0x03
-            pgn = int.from_bytes(pgn, byteorder='big')
-            return PGN.parse_pgn(pgn)
+            return PGN.parse_pgn((canid >> 8) & 0x3ffff)
         else:
             logging.warn('Please provide a canid as integer')
 
     @staticmethod
     def parse_pgn(pgn):
         """Parse canid into j1939 relevant data"""
-        d = {}
         pgn = int(pgn) if type(pgn) != int else pgn
-        pgn_bytes = pgn.to_bytes(4, byteorder='big')
-        d['edp'] = int(pgn_bytes[0] & 0x02)
-        d['dp'] = int(pgn_bytes[0] & 0x01)
-        d['pgnf'] = int(pgn_bytes[2])
-        d['pgne'] = int(pgn_bytes[3])
-        return d
+        return {
+            'edp': (pgn >> 24) & 0x02,
+            'dp': (pgn >> 24) & 0x01,
+            'pgnf': (pgn >> 8) & 0xff,
+            'pgne': pgn & 0xff
+        }
+
+    @staticmethod
+    def split_canids(canids):
+        """Split array of 29 bit canids or a FrameBatch into dict of prio, edp, dp, pf, ps, sa, da and pgn arrays
+
+        For pdu1 (pf < 240) ps is the destination address and not part of the pgn,
+        pdu2 messages are sent to the global address.
+        """
+        import numpy as np
+        canids = np.asarray(getattr(canids, 'canids', canids), dtype=np.uint32)
+        pf = ((canids >> 16) & 0xff).astype(np.uint8)
+        ps = ((canids >> 8) & 0xff).astype(np.uint8)
+        pdu1 = pf < 240
+        return {
+            'prio': ((canids >> 26) & 0x07).astype(np.uint8),
+            'edp': ((canids >> 25) & 0x01).astype(np.uint8),
+            'dp': ((canids >> 24) & 0x01).astype(np.uint8),
+            'pf': pf,
+            'ps': ps,
+            'sa': (canids & 0xff).astype(np.uint8),
+            'da': np.where(pdu1, ps, np.uint8(0xff)),
+            'pgn': (canids >> 8) & np.where(pdu1, np.uint32(0x3ff00), np.uint32(0x3ffff))
+        }
 
     @classmethod
     def from_canid(cls, canid):
@@ -84,6 +102,35 @@ class PGN(Stringify):
 
     def calc_pgn(self, edp, dp, pgnf, pgne):
         """Calculate pgn from it's componets"""
-        pgn = struct.pack('<ccc', bytes(
-            [dp + 2 * edp]), bytes([pgnf]), bytes([pgne]))
-        return int.from_bytes(pgn, byteorder='big')
\ No newline at end of file
+        return ((dp + 2 * edp) << 16) | (pgnf << 8) | pgne
+
+
+class CanIdCache():
+    """Bounded flyweight cache for objects looked up by canid, e.g. PGN or DBCMessage"""
+
+    SIZE = 1024
+
+    def __init__(self, factory=PGN.from_canid, size=SIZE):
+        """Create new cache, factory creates the value for canids which are not cached yet"""
+        self.factory = factory
+        self.size = size
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, canid):
+        """Return cached value for canid, the oldest entry is evicted once the cache is full"""
+        try:
+            return self.items[canid]
+        except KeyError:
+            pass
+        value = self.factory(canid)
+        if len(self.items) >= self.size:
+            del self.items[next(iter(self.items))]
+        self.items[canid] = value
+        return value
+
+    def clear(self):
+        """Remove all cached values"""
+        self.items.clear()
\ No newline at end of file
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+
+import numpy as np
+from pathlib import Path
+
+__all__ = ['FrameBatch', 'FRAME_DTYPE']
+
+# record layout of stored batches, 24 bytes per frame
+FRAME_DTYPE = np.dtype([('timestamp', '<f8'), ('canid', '<u4'), ('dlc', 'u1'), ('pad', 'V3'), ('data', 'u1', (8,))])
+
+
+class FrameBatch():
+    """Batch of can frames as parallel NumPy arrays of timestamps, canids, dlcs and payloads
+
+    Payloads is an (n, 8) uint8 matrix, bytes beyond the dlc are zero. Slices are
+    views, masks and index arrays copy only the selected rows. For compatibility
+    with the (timestamps, canids, payloads) tuples of the readers a batch unpacks
+    into these three arrays and integer indexes 0 to 2 return them, len is the
+    number of frames.
+    """
+
+    __slots__ = ['timestamps', 'canids', 'dlcs', 'payloads']
+
+    def __init__(self, timestamps, canids, payloads, dlcs=None):
+        """Create batch from arrays of n frames, dlcs defaults to 8"""
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.canids = np.asarray(canids, dtype=np.uint32)
+        self.payloads = np.asarray(payloads, dtype=np.uint8)
+        self.dlcs = np.full(self.canids.shape[0], 8, dtype=np.uint8) if dlcs is None else \
+            np.asarray(dlcs, dtype=np.uint8)
+        if self.payloads.ndim != 2 or self.payloads.shape[1] != 8 or \
+                not self.timestamps.shape[0] == self.canids.shape[0] == self.payloads.shape[0] == self.dlcs.shape[0]:
+            raise ValueError('Batch needs %d timestamps, dlcs and an (%d, 8) payload matrix' %
+                             (self.canids.shape[0], self.canids.shape[0]))
+
+    @classmethod
+    def empty(cls, size=0):
+        """Create batch of size zeroed frames"""
+        return cls(np.zeros(size), np.zeros(size, dtype=np.uint32), np.zeros((size, 8), dtype=np.uint8),
+                   np.zeros(size, dtype=np.uint8))
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Create batch from (timestamp, canid, data) frames"""
+        frames = list(frames)
+        batch = cls.empty(len(frames))
+        for idx, (ts, canid, data) in enumerate(frames):
+            size = min(len(data), 8)
+            batch.timestamps[idx], batch.canids[idx], batch.dlcs[idx] = ts, canid, size
+            batch.payloads[idx, :size] = np.frombuffer(bytes(data[:size]), dtype=np.uint8)
+        return batch
+
+    @classmethod
+    def from_records(cls, records):
+        """Create batch of views on the fields of a FRAME_DTYPE array"""
+        return cls(records['timestamp'], records['canid'], records['data'], records['dlc'])
+
+    @classmethod
+    def from_buffer(cls, buffer, count=-1, offset=0):
+        """Create batch of views on FRAME_DTYPE records in buffer, e.g. a mapped file"""
+        return cls.from_records(np.frombuffer(buffer, dtype=FRAME_DTYPE, count=count, offset=offset))
+
+    @classmethod
+    def load(cls, filepath):
+        """Map file of FRAME_DTYPE records written by save read only, empty files give an empty batch"""
+        path = Path(filepath)
+        if path.stat().st_size == 0:
+            return cls.empty()
+        return cls.from_records(np.memmap(path, dtype=FRAME_DTYPE, mode='r'))
+
+    @staticmethod
+    def concat(batches):
+        """Concatenate batches into one new batch"""
+        batches = list(batches)
+        if not batches:
+            return FrameBatch.empty()
+        return FrameBatch(*(np.concatenate([getattr(batch, name) for batch in batches])
+                            for name in ('timestamps', 'canids', 'payloads', 'dlcs')))
+
+    def __len__(self):
+        return self.canids.shape[0]
+
+    def __iter__(self):
+        return iter((self.timestamps, self.canids, self.payloads))
+
+    def __getitem__(self, key):
+        """Return tuple array for int keys, otherwise the batch of the selected rows
+
+        A single bool selects all or no rows like a mask of that value.
+        """
+        if isinstance(key, (bool, np.bool_)):
+            key = np.full(len(self), bool(key))
+        elif isinstance(key, (int, np.integer)):
+            return (self.timestamps, self.canids, self.payloads)[key]
+        return FrameBatch(self.timestamps[key], self.canids[key], self.payloads[key], self.dlcs[key])
+
+    def __repr__(self):
+        return '<FrameBatch of %d frames>' % len(self)
+
+    def filter(self, mask):
+        """Return batch of the rows of a bool mask"""
+        return self[np.asarray(mask, dtype=bool)]
+
+    def sort(self):
+        """Return batch in timestamp order, batches in order are returned as they are"""
+        stamps = self.timestamps
+        if stamps.shape[0] < 2 or not (stamps[1:] < stamps[:-1]).any():
+            return self
+        return self[np.argsort(stamps, kind='stable')]
+
+    def records(self):
+        """Return frames as new FRAME_DTYPE array"""
+        records = np.zeros(len(self), dtype=FRAME_DTYPE)
+        records['timestamp'], records['canid'] = self.timestamps, self.canids
+        records['dlc'], records['data'] = self.dlcs, self.payloads
+        return records
+
+    def save(self, filepath, append=False):
+        """Write frames as FRAME_DTYPE records, load maps them without copy"""
+        with open(Path(filepath), 'ab' if append else 'wb') as fd:
+            self.records().tofile(fd)
+
+    def split_canids(self):
+        """Return PGN.split_canids parts of the canids"""
+        from .base import PGN
+        return PGN.split_canids(self.canids)
+
+    def frames(self):
+        """Generate (timestamp, canid, data) frames, data is bytes of dlc length"""
+        for ts, canid, dlc, data in zip(self.timestamps.tolist(), self.canids.tolist(), self.dlcs.tolist(),
+                                        self.payloads):
+            yield ts, canid, data[:dlc].tobytes()
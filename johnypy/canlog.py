@@ -0,0 +1,437 @@
+#!/usr/bin/python
+
+import re
+import logging
+import numpy as np
+from abc import ABC, abstractmethod
+from pathlib import Path
+from numpy.lib.stride_tricks import sliding_window_view
+from .batch import FrameBatch
+
+__all__ = ['LogReader', 'CandumpReader', 'AscReader', 'LineTemplate', 'open_log']
+
+# candump log format "(timestamp) can0 18FEF100#0102" and default format
+# "can0  18FEF100   [2]  01 02", both with optional leading timestamp
+CANDUMP_LINE = re.compile(
+    rb'^\s*(?:\((\d+\.\d+)\)\s+)?\S+\s+([0-9A-Fa-f]{3,8})'
+    rb'(?:#([0-9A-Fa-f]*)|\s+\[(\d)\]((?:\s+[0-9A-Fa-f]{2})*))(?=\s|$)')
+
+# vector asc classic can frame "0.012345 1  18FEF100x  Rx   d 8 01 02 ..."
+ASC_LINE = re.compile(
+    rb'^\s*(\d+\.\d+)\s+\d+\s+([0-9A-Fa-f]+)(x?)\s+(?:Rx|Tx)\s+d\s+(\d)((?:\s+[0-9A-Fa-f]{1,3})*)')
+ASC_BASE = re.compile(rb'^\s*base\s+(hex|dec)\s+timestamps\s+(absolute|relative)', re.M)
+# leading timestamp of all asc event lines, e.g. error frames and status lines
+ASC_STAMP = re.compile(rb'^\s*(\d+\.\d+)\s')
+HEX_TOKEN = re.compile(rb'[0-9A-Fa-f]+')
+
+CAN_EFF_MASK = 0x1fffffff
+CAN_SFF_MASK = 0x000007ff
+
+# hex digit values of all characters, 0xff for characters which are no hex digits
+HEX_TABLE = np.full(256, 0xff, dtype=np.uint8)
+HEX_TABLE[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+HEX_TABLE[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+HEX_TABLE[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+
+HEX_WEIGHTS = 16 ** np.arange(7, -1, -1, dtype=np.int64)
+
+# bytes around each chunk, so template windows of a line never leave the chunk
+PADDING = b'\0' * 256
+
+
+def parse_candump_line(line, stamp=None):
+    """Parse candump line into (timestamp, canid, data) or None for other lines"""
+    match = CANDUMP_LINE.match(line)
+    if match is None:
+        return None
+    ts, canid, hexdata, _, spaced = match.groups()
+    canid = int(canid, 16)
+    if canid > CAN_EFF_MASK:
+        return None
+    data = bytes.fromhex((hexdata if hexdata is not None else spaced).decode('ascii'))
+    return float(ts) if ts else stamp, canid, data
+
+
+def parse_asc_line(line, base=16):
+    """Parse vector asc line into (timestamp, canid, data) or None for other lines"""
+    match = ASC_LINE.match(line)
+    if match is None:
+        return None
+    ts, canid, _, dlc, data = match.groups()
+    canid = int(canid, base)
+    if canid > CAN_EFF_MASK:
+        return None
+    data = bytes(int(value, base) for value in data.split()[:int(dlc)])
+    return float(ts), canid, data
+
+
+class LineTemplate():
+    """Column layout of one log line, taken from the spans of its grammar match
+
+    Lines with the same fixed characters and digits at the same positions are
+    parsed column wise and give the same result as the line grammar.
+    """
+
+    __slots__ = ['width', 'fixed', 'chars', 'digits', 'weights', 'scale', 'hexcols', 'ident', 'dlc']
+
+    # timestamp digits are accumulated in int64, from 16 digits on they exceed the
+    # 53 bit mantissa, e.g. epoch timestamps in microseconds, and may round differently
+    MAX_DIGITS = 18
+
+    def __init__(self, line, width, stamp, ident, data):
+        """Create template from line, the width of its match and the spans of its fields
+
+        data is the list of positions of the first hex digit of each payload byte.
+        """
+        digits = [col for col in range(*stamp) if line[col] != ord('.')]
+        hexcols = list(range(*ident)) + [col + offset for col in data for offset in (0, 1)]
+        self.digits = np.array(digits, dtype=np.intp)
+        self.weights = 10 ** np.arange(len(digits) - 1, -1, -1, dtype=np.int64)
+        self.scale = 10.0 ** (stamp[1] - line.index(b'.', stamp[0]) - 1)
+        self.hexcols = np.array(hexcols, dtype=np.intp)
+        self.ident = ident[1] - ident[0]
+        self.dlc = len(data)
+        variable = np.zeros(width, dtype=bool)
+        variable[self.digits] = variable[self.hexcols] = True
+        self.width = width
+        self.fixed = np.flatnonzero(~variable)
+        self.chars = np.frombuffer(line, dtype=np.uint8, count=width)[self.fixed]
+
+    def parse(self, windows, follow):
+        """Parse character windows of lines, the characters following them have to be whitespace
+
+        Returns the indexes of the fitting windows, their timestamps, canids and
+        payload nibbles. Timestamp digits are accumulated as integer, so the values
+        equal float() of the text up to 15 digits, longer ones may differ by one ulp.
+        """
+        digits = windows[:, self.digits] - np.uint8(48)
+        nibbles = HEX_TABLE[windows[:, self.hexcols]]
+        fit = np.flatnonzero((windows[:, self.fixed] == self.chars).all(1) & (follow <= 32) &
+                             (digits.max(1) <= 9) & (nibbles.max(1) < 16))
+        digits, nibbles = digits[fit], nibbles[fit]
+        stamps = np.einsum('ij,j->i', digits, self.weights) / self.scale
+        canids = np.einsum('ij,j->i', nibbles[:, :self.ident], HEX_WEIGHTS[8 - self.ident:])
+        return fit, stamps, canids, nibbles[:, self.ident:]
+
+    def payloads(self, nibbles):
+        """Combine payload nibbles into (n, 8) matrix, bytes beyond dlc are zero"""
+        payloads = np.zeros((nibbles.shape[0], 8), dtype=np.uint8)
+        payloads[:, :self.dlc] = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+        return payloads
+
+
+class LogReader(ABC):
+    """Buffered reader for text can logs
+
+    The log is read in large chunks of complete lines. The first line of each new
+    layout is parsed with the line grammar and turned into a LineTemplate, all
+    lines of the chunk which fit it are parsed column wise with NumPy. Timestamps
+    and canids are parsed first, so payloads are only decoded for frames within the
+    time window and pgn filter. Logs are expected in time order, reading stops after
+    the time window.
+    """
+
+    CHUNK_SIZE = 1 << 24
+    BATCH_SIZE = 1 << 16
+
+    # templates per chunk, lines of further layouts are parsed one by one
+    MAX_TEMPLATES = 32
+
+    def __init__(self, filepath, start=None, end=None, pgns=None):
+        """Open log file, only frames within [start, end] and of the given pgns are read"""
+        self.path = Path(filepath)
+        if not self.path.is_file():
+            logging.error(
+                'Failed to load local log file %s, it does not exists' % (self.path.resolve()))
+            raise FileNotFoundError('No log file found')
+        self.start = start
+        self.end = end
+        self.pgns = None if pgns is None else np.unique(np.asarray(list(pgns), dtype=np.int64))
+        self.stats = {'lines': 0, 'frames': 0, 'templates': 0, 'fallback': 0}
+        self._past_end = False
+
+    def _chunks(self, start=0, stop=None):
+        """Generate padded chunks of complete lines between the byte offsets start and stop
+
+        Each line ends with a newline. The chunks are views on one reused buffer,
+        they are valid until the next chunk.
+        """
+        pad = len(PADDING)
+        buf = bytearray(self.CHUNK_SIZE + 2 * pad)
+        view, fill = memoryview(buf), 0
+        left = -1 if stop is None else stop - start
+        with open(self.path, 'rb') as fd:
+            fd.seek(start)
+            while left:
+                if len(buf) - 2 * pad - fill < self.CHUNK_SIZE // 2:
+                    # grow for lines longer than half a chunk, earlier chunks may still be referenced
+                    grown = bytearray(len(buf) + self.CHUNK_SIZE)
+                    grown[pad:pad + fill] = view[pad:pad + fill]
+                    buf, view = grown, memoryview(grown)
+                room = view[pad + fill:len(buf) - pad]
+                count = fd.readinto(room if left < 0 else room[:left])
+                if not count:
+                    break
+                fill += count
+                left = left - count if left > 0 else left
+                cut = buf.rfind(b'\n', pad, pad + fill) + 1
+                if not cut:
+                    continue
+                rest = bytes(view[cut:pad + fill])
+                view[cut:cut + pad] = PADDING
+                yield view[:cut + pad]
+                fill = len(rest)
+                view[pad:pad + fill] = rest
+        if bytes(view[pad:pad + fill]).strip():
+            view[pad + fill:pad + fill + 1 + pad] = b'\n' + PADDING
+            yield view[:pad + fill + 1 + pad]
+
+    @abstractmethod
+    def _template(self, line):
+        """Create LineTemplate from line or None if the line can only be parsed by the grammar"""
+
+    @abstractmethod
+    def _parse_line(self, line):
+        """Parse single line with the line grammar into (timestamp, canid, data) or None"""
+
+    def _event_stamp(self, line):
+        """Return timestamp of a line which is no frame but counts for _timestamps, None by default"""
+        return None
+
+    def _timestamps(self, stamps):
+        """Convert parsed timestamps of one chunk, absolute timestamps are kept"""
+        return stamps
+
+    def _keep(self, stamps, canids):
+        """Return mask of frames within the time window and pgn filter"""
+        keep = np.ones(stamps.size, dtype=bool)
+        if self.start is not None:
+            keep &= stamps >= self.start
+        if self.end is not None:
+            keep &= stamps <= self.end
+        if self.pgns is not None:
+            pgn = (canids >> 8) & 0x3ffff
+            pgn = np.where(((pgn >> 8) & 0xff) < 240, pgn & 0x3ff00, pgn)
+            keep &= (canids > CAN_SFF_MASK) & np.isin(pgn, self.pgns)
+        return keep
+
+    @staticmethod
+    def _windows(arr, starts, width):
+        """Return (n, width) character windows at starts, evenly spaced lines are viewed without copy"""
+        view = sliding_window_view(arr, width)
+        step = starts[1] - starts[0] if starts.size > 1 else 1
+        if step > 0 and starts[-1] - starts[0] == step * (starts.size - 1) and (np.diff(starts) == step).all():
+            return view[starts[0]:starts[-1] + 1:step]
+        return view[starts]
+
+    def _parse_chunk(self, buf):
+        """Parse chunk into (timestamps, canids, dlcs, payloads) of the matching frames"""
+        arr = np.frombuffer(buf, dtype=np.uint8)
+        ends = np.flatnonzero(arr == 10)
+        starts = np.empty_like(ends)
+        starts[0], starts[1:] = len(PADDING), ends[:-1] + 1
+        ends -= arr[ends - 1] == 13
+        self.stats['lines'] += ends.size
+
+        # rows are parsed by template parts[part] or by the grammar for part -1,
+        # part -3 marks timestamped lines without frame
+        stamps = np.zeros(ends.size, dtype=np.float64)
+        canids = np.zeros(ends.size, dtype=np.int64)
+        part = np.full(ends.size, -2, dtype=np.int64)
+        index = np.zeros(ends.size, dtype=np.int64)
+        parts, slow = [], []
+        remaining = np.flatnonzero(ends > starts)
+        while remaining.size:
+            row = remaining[0]
+            line = bytes(buf[starts[row]:ends[row]])
+            template = self._template(line) if len(parts) < self.MAX_TEMPLATES else None
+            if template is not None and template.digits.size <= LineTemplate.MAX_DIGITS:
+                rows = remaining[ends[remaining] - starts[remaining] >= template.width]
+                fit, ids, stamp, nibbles = self._parse_rows(arr, starts[rows], template)
+                rows = rows[fit]
+                if rows.size and rows[0] == row:
+                    stamps[rows], canids[rows] = stamp, ids
+                    part[rows], index[rows] = len(parts), np.arange(rows.size)
+                    parts.append((template, nibbles))
+                    remaining = remaining[~np.isin(remaining, rows, assume_unique=True)]
+                    continue
+            frame = self._parse_line(line)
+            if frame is not None:
+                stamps[row], canids[row], part[row], index[row] = frame[0], frame[1], -1, len(slow)
+                slow.append(frame[2])
+            else:
+                stamp = self._event_stamp(line)
+                if stamp is not None:
+                    stamps[row], part[row] = stamp, -3
+            remaining = remaining[1:]
+        self.stats['templates'] += len(parts)
+        self.stats['fallback'] += len(slow)
+
+        rows = np.flatnonzero(part != -2)
+        stamps = self._timestamps(stamps[rows])
+        frames = np.flatnonzero(part[rows] != -3)
+        if frames.size < rows.size:
+            rows, stamps = rows[frames], stamps[frames]
+        self._past_end = self.end is not None and stamps.size > 0 and stamps[-1] > self.end
+        keep = np.flatnonzero(self._keep(stamps, canids[rows]))
+        if keep.size < rows.size:
+            rows, stamps = rows[keep], stamps[keep]
+
+        # payloads are combined for the kept frames only
+        dlcs = np.zeros(rows.size, dtype=np.uint8)
+        payloads = np.zeros((rows.size, 8), dtype=np.uint8)
+        if len(parts) == 1 and not slow and rows.size == parts[0][1].shape[0]:
+            dlcs[:], payloads[:] = parts[0][0].dlc, parts[0][0].payloads(parts[0][1])
+            parts = []
+        for idx, (template, nibbles) in enumerate(parts):
+            sel = np.flatnonzero(part[rows] == idx)
+            if sel.size:
+                payloads[sel] = template.payloads(nibbles[index[rows[sel]]])
+                dlcs[sel] = template.dlc
+        for sel in np.flatnonzero(part[rows] == -1):
+            data = slow[index[rows[sel]]][:8]
+            dlcs[sel] = len(data)
+            payloads[sel, :len(data)] = np.frombuffer(data, dtype=np.uint8)
+        return stamps, canids[rows].astype(np.uint32), dlcs, payloads
+
+    def _parse_rows(self, arr, starts, template):
+        """Parse lines at starts with template, returns (fitting rows, canids, timestamps, nibbles)
+
+        Canids beyond 29 bit are error frames, they are left to the line grammar.
+        """
+        windows = LogReader._windows(arr, starts, template.width)
+        fit, stamps, canids, nibbles = template.parse(windows, arr[starts + template.width])
+        valid = np.flatnonzero(canids <= CAN_EFF_MASK)
+        if valid.size < fit.size:
+            fit, stamps, canids, nibbles = fit[valid], stamps[valid], canids[valid], nibbles[valid]
+        return fit, canids, stamps, nibbles
+
+    def _batches(self, size, start=0, stop=None):
+        """Generate (timestamps, canids, dlcs, payloads) batches with up to size frames"""
+        for chunk in self._chunks(start, stop):
+            stamps, canids, dlcs, payloads = self._parse_chunk(chunk)
+            self.stats['frames'] += stamps.size
+            for idx in range(0, stamps.size, size):
+                yield stamps[idx:idx + size], canids[idx:idx + size], dlcs[idx:idx + size], \
+                    payloads[idx:idx + size]
+            if self._past_end:
+                break
+
+    def batches(self, size=BATCH_SIZE):
+        """Generate FrameBatch batches with up to size frames
+
+        Batches unpack into (timestamps, canids, payloads), payloads is an (n, 8)
+        uint8 matrix, bytes beyond the frame length are zero.
+        """
+        for stamps, canids, dlcs, payloads in self._batches(size):
+            yield FrameBatch(stamps, canids, payloads, dlcs)
+
+    def shards(self, count):
+        """Split the log into up to count (start, stop) byte ranges at line boundaries"""
+        size = self.path.stat().st_size
+        bounds = [0]
+        with open(self.path, 'rb') as fd:
+            for idx in range(1, count):
+                pos = size * idx // count
+                if pos <= bounds[-1]:
+                    continue
+                fd.seek(pos - 1)
+                fd.readline()
+                if fd.tell() >= size:
+                    break
+                if fd.tell() > bounds[-1]:
+                    bounds.append(fd.tell())
+        bounds.append(size)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def read_shard(self, shard, size=BATCH_SIZE):
+        """Generate FrameBatch batches of one shard of shards()"""
+        for stamps, canids, dlcs, payloads in self._batches(size, *shard):
+            yield FrameBatch(stamps, canids, payloads, dlcs)
+
+    def frames(self):
+        """Generate (timestamp, canid, data) frames"""
+        for stamps, canids, dlcs, payloads in self._batches(self.BATCH_SIZE):
+            for ts, canid, dlc, data in zip(stamps.tolist(), canids.tolist(), dlcs.tolist(), payloads):
+                yield ts, canid, data[:dlc].tobytes()
+
+
+class CandumpReader(LogReader):
+    """Reader for candump log files with "(timestamp) interface canid#data" lines"""
+
+    def _template(self, line):
+        """Create template of a candump log line with timestamp and hex payload"""
+        match = CANDUMP_LINE.match(line)
+        if match is None or match.group(1) is None or match.group(3) is None:
+            return None
+        start, stop = match.span(3)
+        if (stop - start) % 2 or stop - start > 16 or int(match.group(2), 16) > CAN_EFF_MASK:
+            return None
+        return LineTemplate(line, stop, match.span(1), match.span(2), range(start, stop, 2))
+
+    def _parse_line(self, line):
+        """Parse candump line, lines without timestamp get nan"""
+        return parse_candump_line(line, float('nan'))
+
+
+class AscReader(LogReader):
+    """Reader for vector asc log files, only classic can data frames are read
+
+    The base and timestamps mode are taken from the header, relative timestamps
+    are accumulated over all timestamped lines, including events like error frames.
+    """
+
+    HEADER_SIZE = 1 << 12
+
+    def __init__(self, filepath, start=None, end=None, pgns=None):
+        """Open asc log file and read its header"""
+        super().__init__(filepath, start, end, pgns)
+        with open(self.path, 'rb') as fd:
+            match = ASC_BASE.search(fd.read(AscReader.HEADER_SIZE))
+        self.base = 10 if match and match.group(1) == b'dec' else 16
+        self.relative = bool(match and match.group(2) == b'relative')
+        self._offset = 0.0
+
+    def _template(self, line):
+        """Create template of an asc frame line with two hex digits per data byte"""
+        match = ASC_LINE.match(line) if self.base == 16 else None
+        if match is None or match.end(2) - match.start(2) > 8:
+            return None
+        dlc = int(match.group(4))
+        data = [token.span() for token in HEX_TOKEN.finditer(line, *match.span(5))][:dlc]
+        if len(data) < dlc or any(stop - start != 2 for start, stop in data):
+            return None
+        width = data[-1][1] if data else match.end(4)
+        return LineTemplate(line, width, match.span(1), match.span(2), [start for start, _ in data])
+
+    def _parse_line(self, line):
+        """Parse asc line with the base of the header"""
+        return parse_asc_line(line, self.base)
+
+    def _event_stamp(self, line):
+        """Return relative timestamp of event lines, absolute ones are not needed"""
+        if not self.relative:
+            return None
+        match = ASC_STAMP.match(line)
+        return None if match is None else float(match.group(1))
+
+    def shards(self, count):
+        """Split the log into byte ranges, relative timestamps can only be read as one shard"""
+        if self.relative:
+            return [(0, self.path.stat().st_size)]
+        return super().shards(count)
+
+    def _timestamps(self, stamps):
+        """Accumulate relative timestamps"""
+        if not self.relative:
+            return stamps
+        stamps = np.cumsum(stamps) + self._offset
+        if stamps.size:
+            self._offset = stamps[-1]
+        return stamps
+
+
+def open_log(filepath, start=None, end=None, pgns=None):
+    """Open log reader by file suffix, .asc files are read as vector asc, all others as candump log"""
+    reader = AscReader if Path(filepath).suffix.lower() == '.asc' else CandumpReader
+    return reader(filepath, start, end, pgns)
@@ -0,0 +1,383 @@
+#!/usr/bin/python
+
+import mmap
+import struct
+import logging
+import numpy as np
+from pathlib import Path
+from .batch import FrameBatch
+
+__all__ = ['CaptureReader']
+
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_CAN_SOCKETCAN = 227
+
+# linux cooked header protocol types for can and can fd frames
+SLL_PROTOCOLS = (0x000c, 0x000d)
+
+# socketcan canid flags
+CAN_EFF_FLAG = 0x80000000
+CAN_ERR_FLAG = 0x20000000
+CAN_EFF_MASK = 0x1fffffff
+CAN_SFF_MASK = 0x000007ff
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9)
+}
+
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_IDB = 0x00000001
+PCAPNG_PB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+# minimum total length of the pcapng blocks by type, other blocks need at least 12 bytes
+PCAPNG_MIN_LENGTH = {PCAPNG_SHB: 28, PCAPNG_IDB: 20, PCAPNG_PB: 32, PCAPNG_SPB: 16, PCAPNG_EPB: 32}
+
+
+class CaptureReader():
+    """Memory mapped pcap/pcapng reader for SocketCAN captures
+
+    Blocks are walked directly on the mapped file, frames reference the mapped
+    memory and batches of uniform classic can records are read with NumPy views.
+    """
+
+    BATCH_SIZE = 1 << 16
+
+    # rows of the first validation window of a uniform record run
+    FIRST_WINDOW = 64
+
+    def __init__(self, filepath, id_byteorder=None):
+        """Open capture file, id_byteorder is detected from the first frame if not given"""
+        self.path = Path(filepath)
+        if not self.path.is_file():
+            logging.error(
+                'Failed to load local capture file %s, it does not exists' % (self.path.resolve()))
+            raise FileNotFoundError('No capture file found')
+
+        self._fd = open(self.path, 'rb')
+        self._map = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._map)
+        self.pcapng = self._buf[0:4] == struct.pack('<I', PCAPNG_SHB)
+        self._endian = '<'
+        self._interfaces = []
+        if self.pcapng:
+            self._start = 0
+        elif bytes(self._buf[0:4]) in PCAP_MAGIC:
+            self._endian, resol = PCAP_MAGIC[bytes(self._buf[0:4])]
+            linktype = struct.unpack_from(self._endian + 'I', self._buf, 20)[0] & 0xffff
+            self._interfaces.append((linktype, resol, 0))
+            self._start = 24
+        else:
+            self.close()
+            raise ValueError('Unknown capture file format %s' % self.path.name)
+
+        try:
+            self.id_byteorder = id_byteorder or self._detect_byteorder()
+        except ValueError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the mapped file, frames still referenced by the caller keep it alive"""
+        if self._buf is None:
+            return
+        self._buf.release()
+        self._buf = None
+        try:
+            self._map.close()
+        except BufferError:
+            logging.debug('Capture %s still referenced, mapping is released later' % self.path.name)
+        self._fd.close()
+
+    def _read_block(self, pos):
+        """Read block/record at pos, return next position and (timestamp, offset, length, linktype)"""
+        buf, endian = self._buf, self._endian
+        if not self.pcapng:
+            sec, frac, length, _ = struct.unpack_from(endian + 'IIII', buf, pos)
+            linktype, resol, _ = self._interfaces[0]
+            return pos + 16 + length, (sec + frac * resol, pos + 16, length, linktype)
+
+        btype, blen = struct.unpack_from(endian + 'II', buf, pos)
+        if btype == PCAPNG_SHB:
+            self._endian = endian = '<' if buf[pos + 8:pos + 12] == b'\x4d\x3c\x2b\x1a' else '>'
+            blen = struct.unpack_from(endian + 'I', buf, pos + 4)[0]
+        if blen < PCAPNG_MIN_LENGTH.get(btype, 12):
+            raise ValueError('Invalid pcapng block length %d at %d' % (blen, pos))
+        if pos + blen > len(buf):
+            raise ValueError('Truncated pcapng block of length %d at %d' % (blen, pos))
+        if btype == PCAPNG_SHB:
+            self._interfaces = []
+        elif btype == PCAPNG_IDB:
+            self._interfaces.append(self._read_interface(pos, blen))
+        elif btype == PCAPNG_EPB:
+            ifid, high, low, length = struct.unpack_from(endian + 'IIII', buf, pos + 8)
+            return pos + blen, self._record(ifid, high, low, pos + 28, length)
+        elif btype == PCAPNG_SPB:
+            length = min(struct.unpack_from(endian + 'I', buf, pos + 8)[0], blen - 16)
+            return pos + blen, (float('nan'), pos + 12, length, self._interfaces[0][0])
+        elif btype == PCAPNG_PB:
+            ifid, _, high, low, length = struct.unpack_from(endian + 'HHIII', buf, pos + 8)
+            return pos + blen, self._record(ifid, high, low, pos + 28, length)
+        return pos + blen, None
+
+    def _record(self, ifid, high, low, offset, length):
+        """Return record tuple for pcapng packet blocks"""
+        linktype, resol, tsoffset = self._interfaces[ifid]
+        return (((high << 32) | low) * resol + tsoffset, offset, length, linktype)
+
+    def _read_interface(self, pos, blen):
+        """Parse pcapng interface description block into (linktype, resolution, offset)"""
+        endian = self._endian
+        linktype = struct.unpack_from(endian + 'H', self._buf, pos + 8)[0]
+        resol, tsoffset = 1e-6, 0
+        opt, end = pos + 16, pos + blen - 4
+        while opt + 4 <= end:
+            code, length = struct.unpack_from(endian + 'HH', self._buf, opt)
+            if code == 0:
+                break
+            if code == 9:
+                value = self._buf[opt + 4]
+                resol = 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+            elif code == 14:
+                tsoffset = struct.unpack_from(endian + 'q', self._buf, opt + 4)[0]
+            opt += 4 + ((length + 3) & ~3)
+        return linktype, resol, tsoffset
+
+    @staticmethod
+    def _frame_offset(buf, record):
+        """Return offset of the socketcan frame inside the record or None for other link types"""
+        _, offset, length, linktype = record
+        if linktype == LINKTYPE_CAN_SOCKETCAN and length >= 8:
+            return offset
+        if linktype == LINKTYPE_LINUX_SLL and length >= 24 and \
+                struct.unpack_from('>H', buf, offset + 14)[0] in SLL_PROTOCOLS:
+            return offset + 16
+        return None
+
+    def _records(self):
+        """Generate all packet records of the capture"""
+        pos, end = self._start, len(self._buf)
+        while pos + 12 <= end:
+            pos, record = self._read_block(pos)
+            if pos > end:
+                logging.warning('Skip truncated record at the end of %s' % self.path.name)
+                break
+            if record is not None:
+                yield pos, record
+
+    def _detect_byteorder(self):
+        """Detect canid byte order from the first extended frame, libpcap uses big endian"""
+        for _, record in self._records():
+            offset = CaptureReader._frame_offset(self._buf, record)
+            if offset is None:
+                continue
+            if not struct.unpack_from('>I', self._buf, offset)[0] & CAN_EFF_FLAG and \
+                    struct.unpack_from('<I', self._buf, offset)[0] & CAN_EFF_FLAG:
+                return 'little'
+            break
+        return 'big'
+
+    def frames(self):
+        """Generate (timestamp, canid, data) frames, data is a memoryview on the mapped file"""
+        buf = self._buf
+        fmt = '>I' if self.id_byteorder == 'big' else '<I'
+        for _, record in self._records():
+            offset = CaptureReader._frame_offset(buf, record)
+            if offset is None:
+                continue
+            canid = struct.unpack_from(fmt, buf, offset)[0]
+            if canid & CAN_ERR_FLAG:
+                continue
+            canid &= CAN_EFF_MASK if canid & CAN_EFF_FLAG else CAN_SFF_MASK
+            length = min(buf[offset + 4], CaptureReader._frame_length(record, offset) - 8)
+            yield record[0], canid, buf[offset + 8:offset + 8 + length]
+
+    def _batch_dtype(self, linktype):
+        """Return structured dtype of a uniform classic can record for linktype or None"""
+        endian = self._endian
+        fields = [('sec', endian + 'u4'), ('frac', endian + 'u4')] if not self.pcapng else \
+            [('type', endian + 'u4'), ('blen', endian + 'u4'), ('ifid', endian + 'u4'),
+             ('high', endian + 'u4'), ('low', endian + 'u4')]
+        fields += [('length', endian + 'u4'), ('orig', endian + 'u4')]
+        if linktype == LINKTYPE_LINUX_SLL:
+            fields += [('sll', 'V14'), ('protocol', '>u2')]
+        elif linktype != LINKTYPE_CAN_SOCKETCAN:
+            return None
+        fields += [('canid', ('>' if self.id_byteorder == 'big' else '<') + 'u4'),
+                   ('dlc', 'u1'), ('pad', 'V3'), ('data', 'u1', (8,))]
+        if self.pcapng:
+            fields += [('blen2', endian + 'u4')]
+        return np.dtype(fields)
+
+    def _uniform_count(self, rows, linktype, ifid):
+        """Return number of leading rows which are classic can records of the expected layout"""
+        length = 32 if linktype == LINKTYPE_LINUX_SLL else 16
+        valid = rows['length'] == length
+        if self.pcapng:
+            valid &= (rows['type'] == PCAPNG_EPB) & (rows['blen'] == rows.dtype.itemsize) & \
+                (rows['ifid'] == ifid)
+        if linktype == LINKTYPE_LINUX_SLL:
+            valid &= np.isin(rows['protocol'], SLL_PROTOCOLS)
+        return rows.shape[0] if valid.all() else int(np.argmin(valid))
+
+    def _uniform_run(self, pos, limit, fast):
+        """Return number of uniform records of fast = (dtype, linktype, ifid) at pos, at most limit
+
+        The records are validated in growing windows, so a short run costs no more
+        than twice its length plus the first window.
+        """
+        dtype, linktype, ifid = fast
+        limit = min(limit, (len(self._buf) - pos) // dtype.itemsize)
+        count, window = 0, CaptureReader.FIRST_WINDOW
+        while count < limit:
+            step = min(window, limit - count)
+            rows = np.frombuffer(self._buf, dtype=dtype, count=step, offset=pos + count * dtype.itemsize)
+            valid = self._uniform_count(rows, linktype, ifid)
+            count += valid
+            if valid < step:
+                break
+            window *= 2
+        return count
+
+    @staticmethod
+    def _frame_length(record, offset):
+        """Return captured length of the socketcan frame at offset of record"""
+        return record[2] - (offset - record[1])
+
+    def batches(self, size=BATCH_SIZE):
+        """Generate FrameBatch batches with up to size frames
+
+        Batches unpack into (timestamps, canids, payloads), payloads is an (n, 8)
+        uint8 matrix, bytes beyond the frame length are zero.
+        """
+        return self._batches(self._start, len(self._buf), size)
+
+    def _skip(self, pos, target):
+        """Advance from the record boundary pos to the first record boundary at or after target
+
+        Runs of uniform classic can records are skipped with a NumPy view of their lengths.
+        """
+        buf, end = self._buf, len(self._buf)
+        previous = None
+        while pos < target and pos + 12 <= end:
+            start = pos
+            pos, record = self._read_block(pos)
+            size, last = pos - start, previous
+            previous = None if record is None else size
+            if record is None or pos >= target:
+                continue
+            dtype = self._batch_dtype(record[3])
+            # runs are only tried after two records of the uniform size
+            if dtype is None or size != dtype.itemsize or last != size:
+                continue
+            ifid = struct.unpack_from(self._endian + 'I', buf, start + 8)[0] if self.pcapng else 0
+            count = self._uniform_run(pos, -(-(target - pos) // size), (dtype, record[3], ifid))
+            pos += count * size
+            if not count:
+                previous = None
+        return min(pos, end)
+
+    def shards(self, count):
+        """Split the capture into up to count byte ranges at record boundaries
+
+        Returns a list of (start, stop, state), state is the pcapng section state at
+        start which read_shard restores before reading.
+        """
+        end = len(self._buf)
+        step = max(1, (end - self._start) // count)
+        shards, start = [], self._start
+        state = (self._endian, list(self._interfaces))
+        while start < end:
+            stop = self._skip(start, start + step) if len(shards) < count - 1 else end
+            shards.append((start, stop, state))
+            start, state = stop, (self._endian, list(self._interfaces))
+        return shards
+
+    def read_shard(self, shard, size=BATCH_SIZE):
+        """Generate FrameBatch batches of one shard of shards()"""
+        start, stop, (endian, interfaces) = shard
+        self._endian, self._interfaces = endian, list(interfaces)
+        return self._batches(start, stop, size)
+
+    def _batches(self, pos, end, size):
+        """Generate batches of the records between pos and end"""
+        buf = self._buf
+        stamps = np.empty(size, dtype=np.float64)
+        canids = np.empty(size, dtype=np.uint32)
+        payloads = np.zeros((size, 8), dtype=np.uint8)
+        dlcs = np.empty(size, dtype=np.uint8)
+        fill, fast, previous = 0, None, None
+
+        while pos + 12 <= end:
+            if fast is not None:
+                dtype, linktype, ifid = fast
+                count = self._uniform_run(pos, min((end - pos) // dtype.itemsize, size - fill), fast)
+                rows = np.frombuffer(buf, dtype=dtype, count=count, offset=pos)
+                if self.pcapng:
+                    _, resol, tsoffset = self._interfaces[ifid]
+                    ticks = (rows['high'].astype(np.uint64) << np.uint64(32)) | rows['low']
+                    stamps[fill:fill + count] = ticks * resol + tsoffset
+                else:
+                    stamps[fill:fill + count] = rows['sec'] + rows['frac'] * self._interfaces[0][1]
+                canids[fill:fill + count] = rows['canid']
+                dlcs[fill:fill + count] = rows['dlc']
+                payloads[fill:fill + count] = rows['data']
+                fill += count
+                pos += count * dtype.itemsize
+                if not count:
+                    # back off until two records of the uniform size follow each other again
+                    fast = previous = None
+
+            if fill < size and pos + 12 <= end:
+                start = pos
+                pos, record = self._read_block(pos)
+                if pos > end:
+                    logging.warning('Skip truncated record at the end of %s' % self.path.name)
+                    break
+                offset = None if record is None else CaptureReader._frame_offset(buf, record)
+                if offset is not None:
+                    ifid = struct.unpack_from(self._endian + 'I', buf, start + 8)[0] \
+                        if self.pcapng else 0
+                    dtype = self._batch_dtype(record[3])
+                    # runs are only tried after two records of the uniform size
+                    size_ok = dtype is not None and pos - start == dtype.itemsize
+                    fast = (dtype, record[3], ifid) if size_ok and previous == pos - start else None
+                    previous = pos - start
+                    fmt = '>I' if self.id_byteorder == 'big' else '<I'
+                    dlc = min(buf[offset + 4], 8, CaptureReader._frame_length(record, offset) - 8)
+                    stamps[fill] = record[0]
+                    canids[fill] = struct.unpack_from(fmt, buf, offset)[0]
+                    dlcs[fill] = dlc
+                    payloads[fill] = 0
+                    payloads[fill, :dlc] = np.frombuffer(buf, dtype=np.uint8, count=dlc, offset=offset + 8)
+                    fill += 1
+                elif record is None:
+                    # section and interface blocks may change the layout of the following records
+                    fast = previous = None
+
+            if fill == size:
+                yield CaptureReader._finish_batch(stamps, canids, payloads, dlcs, fill)
+                fill = 0
+
+        if fill:
+            yield CaptureReader._finish_batch(stamps, canids, payloads, dlcs, fill)
+
+    @staticmethod
+    def _finish_batch(stamps, canids, payloads, dlcs, fill):
+        """Copy batch buffers, mask canid flags, zero bytes beyond dlc and drop error frames"""
+        ids = canids[:fill]
+        keep = (ids & CAN_ERR_FLAG) == 0
+        ids = np.where(ids & CAN_EFF_FLAG, ids & CAN_EFF_MASK, ids & CAN_SFF_MASK)[keep]
+        data = payloads[:fill][keep]
+        dlc = np.minimum(dlcs[:fill][keep], 8)
+        data[np.arange(8) >= dlc[:, None]] = 0
+        return FrameBatch(stamps[:fill][keep], ids.astype(np.uint32), data, dlc)
@@ -1,6 +1,6 @@
 #!/usr/bin/python
 
-__all__ = ['dbcconst']
+__all__ = ['dbcconst', 'csvconst']
 
 dbcconst = {
     'header': 'VERSION ""\nNS_ :\n NS_DESC_\n CM_\n BA_DEF_\n BA_\n VAL_\n CAT_DEF_\n CAT_\n FILTER\n BA_DEF_DEF_\n EV_DATA_\n ENVVAR_DATA_\n SGTYPE_\n SGTYPE_VAL_\n BA_DEF_SGTYPE_\n BA_SGTYPE_\n SIG_TYPE_REF_\n VAL_TABLE_\n SIG_GROUP_\n SIG_VALTYPE_\n SIGTYPE_VALTYPE_\n BO_TX_BU_\n BA_DEF_REL_\n BA_REL_\n BA_DEF_DEF_REL_\n BU_SG_REL_\n BU_EV_REL_\n BU_BO_REL_\n SG_MUL_VAL_\nBS_:\nBU_:\n',
@@ -8,3 +8,9 @@ dbcconst = {
     'footer': '\n',
     'msgType': 'Vector__XXX'
 }
+
+csvconst = {
+    # missing values, same as the pandas read_csv default na_values
+    'naValues': frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+                           '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+}
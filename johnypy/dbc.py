@@ -1,63 +1,347 @@
 #!/usr/bin/python
 
+import io
+import os
 import re
+import csv
+import json
 import struct
+import pickle
+import hashlib
 import logging
-import pandas as pd
+import importlib.util
+import itertools
 from pathlib import Path
+from . import fields
+from . import profiling
 from .base import PGN, Stringify
 from .utils import escapeDBCString
-from .const import dbcconst
+from .const import dbcconst, csvconst
 
 __all__ = ['DBCMessage', 'DBCConverter', 'DBCMessage', 'DBC']
 
+# dbc statements, BO_ and SG_ are parsed right away, all other supported
+# statements are kept as raw text until DBC.materialize is called
+_DBC_STATEMENT = re.compile(r'''
+    ^(?:
+        BO_\ +(\d+)\ +(\w+)\ *:\ *(\d+)
+       |[\ \t]+SG_\ +(\w+)(?:\ +[Mm]\d*)?\ *:\ *(\d+)\|(\d+)@([01])([+-])\ *
+            \(([^,]+),([^)]+)\)\ *\[([^|]+)\|([^\]]+)\]\ *"([^"]*)"
+       |((?:CM_|BA_DEF_DEF_|BA_DEF_|BA_|VAL_)\ (?:[^";]|"(?:[^"\\]|\\.)*")*;)
+    )''', re.M | re.X)
+_DBC_COMMENT = re.compile(r'CM_\s+(?:BO_\s+(\d+)|SG_\s+(\d+)\s+(\w+))\s+"((?:[^"\\]|\\.)*)"', re.S)
+_DBC_ATTRIBUTE = re.compile(r'BA_\s+"(\w+)"\s+(?:(BO_|BU_|EV_)\s+(\w+)\s+|(SG_)\s+(\d+)\s+(\w+)\s+)?("[^"]*"|\S+?)\s*;')
+_DBC_ATTRIBUTE_DEF = re.compile(r'BA_DEF_(DEF_)?\s+(?:(BO_|SG_|BU_|EV_)\s+)?"(\w+)"\s*(.*?)\s*;', re.S)
+_DBC_VALUE = re.compile(r'VAL_\s+(\d+)\s+(\w+)\s+(.*?)\s*;', re.S)
+_DBC_VALUE_PAIR = re.compile(r'(-?\d+)\s+"((?:[^"\\]|\\.)*)"')
+
 
 class DBC(Stringify):
     """DBC file internal class"""
 
-    __slots__ = ['name', 'msgs']
+    __slots__ = ['name', 'msgs', 'values', 'attributes', 'attrdefs', '_pending',
+                 '_pgns', '_canids', '_spns', '_names']
 
     STRINIFY = __slots__
 
+    CHUNK_SIZE = 1 << 16
+
+    # canid mask without extended frame flag and source address
+    ID_MASK = 0x1fffff00
+
+    # canid masks for the message key without priority and source address,
+    # pdu1 messages carry the destination address in pdu specific
+    PGN_MASK = 0x03ffff00
+    PDU1_MASK = 0x03ff0000
+
     def __init__(self, name):
         """Create new DBC file/project instance"""
         self.name = name
         self.msgs = []
+        self.values = {}
+        self.attributes = {}
+        self.attrdefs = {}
+        self._pending = None
+        self._pgns = {}
+        self._canids = {}
+        self._spns = {}
+        self._names = {}
+
+    @staticmethod
+    def message_key(canid):
+        """Return canid masked to the pgn, the destination address is removed for pdu1 messages"""
+        if (canid >> 16) & 0xff < 240:
+            return canid & DBC.PDU1_MASK
+        return canid & DBC.PGN_MASK
+
+    def add_msg(self, msg):
+        """Add message and its signals to the database and all indexes"""
+        self.msgs.append(msg)
+        self._pgns.setdefault(msg.pgn, []).append(msg)
+        self._canids.setdefault(DBC.message_key(msg.calc_canid()), []).append(msg)
+        self._names.setdefault(msg.abbr, []).append(msg)
+        for sig in msg.signals:
+            self._index_signal(sig)
+        return msg
+
+    def add_signal(self, msg, sig):
+        """Add signal to an already added message and all indexes"""
+        sig.msg = msg
+        msg.signals.append(sig)
+        self._index_signal(sig)
+        return sig
+
+    def _index_signal(self, sig):
+        """Add signal to spn and name index"""
+        if sig.spn is not None:
+            self._spns.setdefault(sig.spn, []).append(sig)
+        self._names.setdefault(sig.name, []).append(sig)
+
+    def remove_msg(self, msg):
+        """Remove message and its signals from the database and all indexes"""
+        self.msgs.remove(msg)
+        DBC._unindex(self._pgns, msg.pgn, msg)
+        DBC._unindex(self._canids, DBC.message_key(msg.calc_canid()), msg)
+        DBC._unindex(self._names, msg.abbr, msg)
+        for sig in msg.signals:
+            DBC._unindex(self._spns, sig.spn, sig)
+            DBC._unindex(self._names, sig.name, sig)
+        return msg
+
+    @staticmethod
+    def _unindex(index, key, item):
+        """Remove item from index list of key"""
+        items = index.get(key)
+        if items is None or item not in items:
+            return
+        items.remove(item)
+        if not items:
+            del index[key]
+
+    def find_pgn(self, pgn):
+        """Return first message with pgn or None"""
+        msgs = self._pgns.get(pgn)
+        return msgs[0] if msgs else None
+
+    def find_canid(self, canid):
+        """Return first message for canid, ignoring priority, source and destination address"""
+        msgs = self._canids.get(DBC.message_key(canid))
+        return msgs[0] if msgs else None
+
+    def find_spn(self, spn):
+        """Return list of signals with spn from all messages, must not be modified
+
+        Signal spns of a lazy read dbc file are pending attributes, so it is materialized first.
+        """
+        self.materialize()
+        return self._spns.get(spn, [])
+
+    def find_name(self, name):
+        """Return list of messages and signals with the escaped name, must not be modified"""
+        return self._names.get(name, [])
+
+    def pack(self, slots=()):
+        """Pack database into nested tuples of builtin types
+
+        Every slot is packed once and referenced by its index, the given slots are
+        packed first and in order, followed by all other slots used by signals.
+        """
+        self.materialize()
+        refs, packed = {}, []
+        for slot in itertools.chain(slots, (sig.slot for msg in self.msgs for sig in msg.signals)):
+            if id(slot) not in refs:
+                refs[id(slot)] = len(packed)
+                packed.append(slot.pack())
+        return (self.name, packed, [msg.pack(refs) for msg in self.msgs],
+                self.values, self.attributes, self.attrdefs)
+
+    @classmethod
+    def unpack(cls, packed, slots=None):
+        """Create new database from pack result, slots may pass already unpacked slots"""
+        name, pslots, msgs, values, attributes, attrdefs = packed
+        if slots is None:
+            slots = [DBCSlot.from_parsed(*slot) for slot in pslots]
+        dbc = cls(name)
+        for msg in msgs:
+            dbc.add_msg(DBCMessage.unpack(msg, slots))
+        dbc.values = values
+        dbc.attributes = attributes
+        dbc.attrdefs = attrdefs
+        return dbc
+
+    def materialize(self):
+        """Parse pending comment, attribute and value statements from a lazy read dbc file"""
+        if self._pending is None:
+            return self
+
+        msgs = {}
+        sigs = {}
+        for msg in self.msgs:
+            canid = msg.calc_canid() & DBC.ID_MASK
+            msgs.setdefault(canid, []).append(msg)
+            for sig in msg.signals:
+                sigs.setdefault((canid, sig.name), []).append(sig)
+
+        pending, self._pending = self._pending, None
+        for statement in pending:
+            if statement.startswith('CM_'):
+                self._apply_comment(statement, msgs, sigs)
+            elif statement.startswith('BA_DEF_'):
+                self._apply_attribute_def(statement)
+            elif statement.startswith('BA_'):
+                self._apply_attribute(statement, sigs)
+            else:
+                self._apply_value(statement)
+
+        spn = int(self.attrdefs.get('SPN', (None, None, None))[2] or 0)
+        self._spns = {}
+        for msg in self.msgs:
+            msg.name = '' if msg.name is None else msg.name
+            for sig in msg.signals:
+                sig.spn = spn if sig.spn is None else sig.spn
+                sig.info = '' if sig.info is None else sig.info
+                self._spns.setdefault(sig.spn, []).append(sig)
+        return self
+
+    @staticmethod
+    def _first_unset(items, key, attr):
+        """Return first item from duplicated ids which has not set attr yet"""
+        for item in items.get(key, ()):
+            if item.__getattribute__(attr) is None:
+                return item
+        return None
+
+    def _apply_comment(self, statement, msgs, sigs):
+        """Apply CM_ statement to its message or signal"""
+        match = _DBC_COMMENT.match(statement)
+        if not match:
+            return
+        msgid, sigid, signame, text = match.groups()
+        if msgid is not None:
+            item = DBC._first_unset(msgs, int(msgid) & DBC.ID_MASK, 'name')
+            attr = 'name'
+        else:
+            item = DBC._first_unset(sigs, (int(sigid) & DBC.ID_MASK, signame), 'info')
+            attr = 'info'
+        if item is not None:
+            item.__setattr__(attr, text)
+
+    def _apply_attribute(self, statement, sigs):
+        """Apply BA_ statement, SPN attributes are stored into their signals"""
+        match = _DBC_ATTRIBUTE.match(statement)
+        if not match:
+            return
+        name, objtype, objid, sigtype, sigid, signame, value = match.groups()
+        value = value.strip('"')
+        if sigtype:
+            key = (sigtype, int(sigid), signame)
+            sig = DBC._first_unset(sigs, (int(sigid) & DBC.ID_MASK, signame), 'spn')
+            if name == 'SPN' and sig is not None:
+                sig.spn = int(value)
+                return
+        elif objtype:
+            key = (objtype, int(objid) if objtype == 'BO_' else objid, None)
+        else:
+            key = (None, None, None)
+        self.attributes.setdefault(key, {})[name] = value
+
+    def _apply_attribute_def(self, statement):
+        """Store BA_DEF_ and BA_DEF_DEF_ statements as (object type, definition, default)"""
+        match = _DBC_ATTRIBUTE_DEF.match(statement)
+        if not match:
+            return
+        default, objtype, name, value = match.groups()
+        objtype_, definition, default_ = self.attrdefs.get(name, (None, None, None))
+        if default:
+            self.attrdefs[name] = (objtype_, definition, value.strip('"'))
+        else:
+            self.attrdefs[name] = (objtype, value, default_)
+
+    def _apply_value(self, statement):
+        """Store VAL_ value descriptions by canid and signal name"""
+        match = _DBC_VALUE.match(statement)
+        if match:
+            canid, signame, pairs = match.groups()
+            self.values[(int(canid), signame)] = {
+                int(raw): text for raw, text in _DBC_VALUE_PAIR.findall(pairs)}
+
+    @profiling.timed('dump_dbc')
+    def dump_dbc(self, filepath, force=False, chunk_size=CHUNK_SIZE, fragments=None):
+        """Dump instance as dbc file, filepath might be a path, a file-like object or a socket
+
+        The content is streamed section by section in chunks of chunk_size characters,
+        so the memory usage does not depend on the database size. fragments is passed
+        to iter_dbc.
+        """
+        if not isinstance(filepath, (str, os.PathLike)):
+            self._write_chunked(DBC._get_writer(filepath), chunk_size, fragments)
+            return filepath
 
-    def dump_dbc(self, filepath, force=False):
-        """Dump instance as dbc file locally, uses instance name attribute for the name"""
         dst_file = Path(filepath)
         if dst_file.exists() and not force:
             logging.error(
                 'Does not support overwrite mode, please remove existing file %s ' % dst_file.resolve())
 
         with open(dst_file, 'w', encoding='utf-8') as fd:
-            payload_parts = {
-                'value': '\n',
-                'comment': '\n',
-                'atrribute': '\n'
-            }
-
-            for msg in self.msgs:
-                mvalue, mcomment, _ = msg.dbcfy()
-                payload_parts['value'] += mvalue
-                payload_parts['comment'] += mcomment
-                for sig in msg.signals:
-                    svalue, scomment, sattribute = sig.dbcfy()
-                    payload_parts['value'] += svalue
-                    payload_parts['comment'] += scomment
-                    payload_parts['atrribute'] += sattribute
-
-            fd.write(dbcconst['header'])
-            fd.write(payload_parts['value'])
-            fd.write(payload_parts['comment'])
-            fd.write(dbcconst['attributeDef'])
-            fd.write(payload_parts['atrribute'])
-            fd.write('BA_ "DBName" "johnFear";')
-            fd.write(dbcconst['footer'])
+            self._write_chunked(fd.write, chunk_size, fragments)
 
         return dst_file
 
+    def iter_dbc(self, fragments=None):
+        """Generate the dbc file content part by part
+
+        fragments is an optional callable which returns the already generated
+        dbcfy_msg result of a message, e.g. from a previous conversion.
+        """
+        self.materialize()
+        yield dbcconst['header']
+        yield '\n'
+        yield from self._iter_section(0, fragments)
+        yield '\n'
+        yield from self._iter_section(1, fragments)
+        yield dbcconst['attributeDef']
+        yield '\n'
+        yield from self._iter_section(2, fragments)
+        yield 'BA_ "DBName" "johnFear";'
+        yield dbcconst['footer']
+
+    def _iter_section(self, part, fragments=None):
+        """Generate one dbc section (0: value, 1: comment, 2: attribute) from all msgs"""
+        for msg in self.msgs:
+            if fragments is not None:
+                yield fragments(msg)[part]
+                continue
+            yield msg.dbcfy()[part]
+            for sig in msg.signals:
+                yield sig.dbcfy()[part]
+
+    @staticmethod
+    def dbcfy_msg(msg):
+        """Generate (value, comment, attribute) dbc text of message including all its signals"""
+        parts = [msg.dbcfy()] + [sig.dbcfy() for sig in msg.signals]
+        return tuple(''.join(part[idx] for part in parts) for idx in range(3))
+
+    def _write_chunked(self, write, chunk_size, fragments=None):
+        """Join generated dbc parts into chunks and pass them to write"""
+        chunk, size = [], 0
+        for part in self.iter_dbc(fragments):
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                write(''.join(chunk))
+                chunk, size = [], 0
+        if chunk:
+            write(''.join(chunk))
+
+    @staticmethod
+    def _get_writer(dst):
+        """Return str write function for text files, binary files or sockets"""
+        if hasattr(dst, 'sendall'):
+            return lambda data: dst.sendall(data.encode('utf-8'))
+        if isinstance(dst, io.TextIOBase):
+            return dst.write
+        return lambda data: dst.write(data.encode('utf-8'))
+
     def pretty(self):
         logging.info('DBCFile[%s]' % self.name)
         for msg in self.msgs:
@@ -109,6 +393,31 @@ class DBCMessage(PGN):
         """Initiated via dict"""
         return cls(**vdict)
 
+    @classmethod
+    def from_parsed(cls, edp, dp, pgnf, pgne, name, abbr, prio, length):
+        """Initialize new DBC Message instance from already parsed values"""
+        msg = cls.__new__(cls)
+        PGN.__init__(msg, edp, dp, pgnf, pgne)
+        msg.name = name
+        msg.abbr = abbr
+        msg.prio = prio
+        msg.length = length
+        msg.signals = []
+        return msg
+
+    def pack(self, slot_refs):
+        """Pack message and signals into tuples, slots are replaced by slot_refs[id(slot)]"""
+        return (self.edp, self.dp, self.pgnf, self.pgne, self.name, self.abbr, self.prio, self.length,
+                [(sig.spn, sig.pos, sig.name, sig.info, slot_refs[id(sig.slot)]) for sig in self.signals])
+
+    @classmethod
+    def unpack(cls, packed, slots):
+        """Create new message from pack result, slots resolves the slot references"""
+        msg = cls.from_parsed(*packed[:8])
+        msg.signals = [DBCSignal.from_parsed(spn, pos, name, info, slots[ref], msg)
+                       for spn, pos, name, info, ref in packed[8]]
+        return msg
+
     def calc_canid(self, src=0xFE):
         """Generate canid for current DBCMessage"""
         bcan = bytearray(self.pgn.to_bytes(3, byteorder='big'))
@@ -130,8 +439,10 @@ class DBCMessage(PGN):
         """Parse message lenght"""
         length = length.lower()
         if length == 'nan':
+            profiling.count('fallback.msg_length')
             return 1
         elif 'variable' in length:
+            profiling.count('fallback.msg_length')
             return 1
         else:
             return int(length.split(' ')[0])
@@ -141,6 +452,7 @@ class DBCMessage(PGN):
         """Parse message prio"""
         prio = prio.lower()
         if prio == 'nan':
+            profiling.count('fallback.prio')
             return 0
         else:
             return int(prio.split(' ')[0])
@@ -157,7 +469,7 @@ class DBCSignal(Stringify):
         """Initialize new PGN from canId"""
         super().__init__()
         self.spn = int(spn)
-        self.pos = DBCSignal.parse_position(pos)
+        self.pos = fields.parse_position(pos)
         self.name = DBCConverter.escape_name(name)
         self.info = DBCConverter.escape_name(info[:10])
         self.slot = slot
@@ -168,15 +480,22 @@ class DBCSignal(Stringify):
         """Initialize new pgn instance from dict"""
         cls.__init__(**vdict)
 
+    @classmethod
+    def from_parsed(cls, spn, pos, name, info, slot, msg=None):
+        """Initialize new signal instance from already parsed values"""
+        sig = cls.__new__(cls)
+        sig.spn = spn
+        sig.pos = pos
+        sig.name = name
+        sig.info = info
+        sig.slot = slot
+        sig.msg = msg
+        return sig
+
     @staticmethod
     def parse_position(pos):
         """Parse start position of dbc signal"""
-        idx = pos.split(',')[0].split('-')[0].strip()
-        if '.' in idx:
-            values = idx.split('.')
-            return (int(values[0]) - 1) * 8 + int(values[1]) - 1
-        else:
-            return (int(idx) - 1) * 8
+        return fields.parse_position(pos)
 
     def dbcfy(self):
         """Generate dbc format string from this instance"""
@@ -199,80 +518,75 @@ class DBCSlot(Stringify):
         """Initialize new slot"""
         super().__init__()
         self.idx = idx
-        self.name = DBCSlot.escape_string(name)
-        self.group = DBCSlot.escape_string(group)
-        self.offset = DBCSlot.parse_offset(offset)
-        self.length = DBCSlot.parse_length(length)
-        self.min, self.max, self.unit = DBCSlot.parse_range(limits)
-        self.scale = DBCSlot.parse_scale(scale)
+        self.name = fields.escape_string(name)
+        self.group = fields.escape_string(group)
+        self.offset = fields.parse_offset(offset)
+        self.length = fields.parse_length(length)
+        self.min, self.max, self.unit = fields.parse_range(limits)
+        self.scale = fields.parse_scale(scale)
 
     @classmethod
     def from_dict(cls, vdict):
         """Initialize new slot instance from dict"""
         cls.__init__(**vdict)
 
+    @classmethod
+    def from_parsed(cls, idx, name, group, scale, minimum, maximum, unit, offset, length):
+        """Initialize new slot instance from already parsed values"""
+        slot = cls.__new__(cls)
+        slot.idx = idx
+        slot.name = name
+        slot.group = group
+        slot.scale = scale
+        slot.min = minimum
+        slot.max = maximum
+        slot.unit = unit
+        slot.offset = offset
+        slot.length = length
+        return slot
+
+    def pack(self):
+        """Pack slot into tuple with from_parsed argument order"""
+        return (self.idx, self.name, self.group, self.scale, self.min, self.max, self.unit,
+                self.offset, self.length)
+
     @staticmethod
     def escape_string(string):
         """Escape string values"""
-        return re.sub(r'[ ,]', '_', re.sub(r'\r\n?|\n', ' ', string)) if type(string) == str else string
+        return fields.escape_string(string)
 
     @staticmethod
     def parse_length(length):
         """Parse length and return value defined in bits"""
-        if type(length) == str:
-            length = length.lower()
-            if re.match(r'^[0-9]+ bytes?$', length):
-                return int(re.sub(r'bytes?', '', length).strip()) * 8
-            elif re.match(r'^[0-9]+ bits?$', length):
-                return int(re.sub(r'bits?', '', length).strip())
-            else:
-                return 1
-        return int(length)
+        return fields.parse_length(length)
 
     @staticmethod
     def parse_offset(offset):
         """Parse offset and return"""
-        if type(offset) == str:
-            if re.match(r'[\-0-9\.,]+ [\S]+', offset):
-                return DBCSlot.parse_float(offset.split(' ')[0])
-            elif re.match(r'[\-0-9\.,]+', offset):
-                return DBCSlot.parse_float(offset)
-            return 0
-        return float(offset)
+        return fields.parse_offset(offset)
 
     @staticmethod
     def parse_float(value):
         """Try to parse variabel into float"""
-        return float(value.replace(',', '')) if type(value) == str else float(value)
+        return fields.parse_float(value)
 
     @staticmethod
     def parse_range(value):
-        value = re.sub(r'\(.*?\)', '', value.strip())
-        if re.match(r'^-?[0-9.]+ to -?[0-9.]+ [\S]+$', value):
-            v = value.split(' ')
-            return DBCSlot.parse_float(v[0]), DBCSlot.parse_float(v[2]), v[3]
-        elif re.match(r'^[0-9]+ to [0-9]+( per byte)?$', value):
-            v = value.split(' ')
-            return DBCSlot.parse_float(v[0]), DBCSlot.parse_float(v[2]), 'steps'
-        else:
-            return 0, 0, value
+        """Parse range into (min, max, unit)"""
+        return fields.parse_range(value)
 
     @staticmethod
     def parse_scale(scale):
-        scale = re.sub(r'\(.*?\)', '', scale.strip())
-        if re.match(r'^1/[0-9.]+ .*bit$', scale):
-            return float(1/DBCSlot.parse_float(scale.split(' ')[0].split('/')[1]))
-        elif re.match(r'^-?[0-9.]+ .*bit$', scale):
-            return float(DBCSlot.parse_float(scale.split(' ')[0]))
-        elif re.match(r'^-?[0-9.]+/bit$', scale):
-            return float(DBCSlot.parse_float(scale.split('/')[0]))
-        else:
-            return 1
+        """Parse scaling per bit"""
+        return fields.parse_scale(scale)
 
 
 class DBCConverter():
     """DBCConverter for reading, writing and parsing DBC files"""
 
+    # version of the compiled database cache format, increase on format changes
+    CACHE_VERSION = 1
+
     def __init__(self):
         """Create new class instance, please verify existency from each vmap key in the PGN class"""
         self.vmap = {
@@ -303,22 +617,75 @@ class DBCConverter():
         self.slots = {}
 
     @staticmethod
+    @profiling.timed('escape_name')
     def escape_name(name, num=True):
         """Prepare dbc signal name to work in dbc file later"""
-        return re.sub(r'\(.*?\)|[^a-zA-Z0-9]', '', name) if num else re.sub(r'\(.*?\)|[^a-zA-Z]', '', name)
+        return fields.escape_name(name) if num else fields.escape_alpha(name)
 
-    def read_dbc_file(self, filepath):
-        """Read new dbc file for further processing"""
-        pass
+    @profiling.timed('read_dbc_file')
+    def read_dbc_file(self, filepath, lazy=False, encoding='utf-8'):
+        """Read new dbc file for further processing
+
+        Messages and signals are parsed in a single pass, comments, attributes and
+        value tables are kept as raw statements with lazy until DBC.materialize is called.
+        """
+        dpath = Path(filepath)
+        if not dpath.is_file():
+            logging.error(
+                'Failed to load local dbc file %s, it does not exists' % (dpath.resolve()))
+            raise FileNotFoundError('No DBC file found')
+
+        dbc_file = DBC(dpath.name)
+        dbc_file._pending = []
+        slots = {}
+        msgs = []
+        msg = None
+        unsupported = 0
+        with open(dpath, 'r', encoding=encoding) as fd:
+            content = fd.read()
+
+        for match in _DBC_STATEMENT.finditer(content):
+            canid, abbr, length, name, pos, size, order, sign, scale, offset, \
+                minimum, maximum, unit, pending = match.groups()
+            if pending is not None:
+                dbc_file._pending.append(pending)
+            elif canid is not None:
+                canid = int(canid) & 0x1fffffff
+                msg = DBCMessage.from_parsed(
+                    (canid >> 25) & 0x01, (canid >> 24) & 0x01, (canid >> 16) & 0xff,
+                    (canid >> 8) & 0xff, None, abbr, (canid >> 26) & 0x07, int(length))
+                msgs.append(msg)
+            elif msg is None:
+                logging.warning('Skip signal %s without message' % name)
+            else:
+                if order == '0' or sign == '-':
+                    unsupported += 1
+                key = (int(size), float(scale), float(offset), float(minimum), float(maximum), unit)
+                slot = slots.get(key)
+                if slot is None:
+                    slot = slots[key] = DBCSlot.from_parsed(
+                        None, None, None, key[1], key[3], key[4], unit, key[2], key[0])
+                msg.signals.append(DBCSignal.from_parsed(None, int(pos), name, None, slot, msg))
+
+        for msg in msgs:
+            dbc_file.add_msg(msg)
+
+        if unsupported:
+            logging.warning(
+                '%d big endian or signed signals in %s are handled as unsigned little endian' % (unsupported, dpath.name))
+
+        return dbc_file if lazy else dbc_file.materialize()
 
     def _parse_df_row(self, row, vmap):
         """Parse all values defined in vmap and store it into a dictonary"""
         return {key: str(row[value]) for key, value in vmap.items()}
 
+    @profiling.timed('parse_dbc_msg')
     def parse_dbc_msg(self, row):
         """Parse row into cls class, this method uses stupid as it is the __init__ method"""
         return DBCMessage(**self._parse_df_row(row, self.vmap['msgMap']))
 
+    @profiling.timed('parse_dbc_signal')
     def parse_dbc_signal(self, msg, row):
         """Parse all dbc signal values and store them into msg instance"""
         sig_values = self._parse_df_row(row, self.vmap['sigMap'])
@@ -329,14 +696,114 @@ class DBCConverter():
         """Parse slot row into class object"""
         return DBCSlot(**self._parse_df_row(row, self.vmap['slotMap']))
 
-    def _read_slots(self, sfile, sep='|'):
+    @staticmethod
+    def _str_column(column):
+        """Convert column into str values, same as _parse_df_row does for single rows"""
+        return column.astype(str).fillna('nan')
+
+    @staticmethod
+    def _parse_column(column, parser):
+        """Parse each unique column value only once with a FieldParser and map results back onto the column
+
+        Fallbacks are counted once per row like the row wise parsing does.
+        """
+        import numpy as np
+        import pandas as pd
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        entries = [parser.lookup(value) for value in uniques]
+        fallbacks = np.array([fallback for _, fallback in entries], dtype=bool)
+        if fallbacks.any():
+            profiling.count(parser.fallback, int(fallbacks[codes].sum()))
+        parsed = [result for result, _ in entries]
+        return [parsed[code] for code in codes]
+
+    @staticmethod
+    def _escape_column(column):
+        """Vectorized version of escape_name"""
+        return column.str.replace(r'\(.*?\)|[^a-zA-Z0-9]', '', regex=True)
+
+    @staticmethod
+    def _first_int_column(column, default, pattern=None, counter=None):
+        """Vectorized version of DBCMessage parse_prio/parse_length, fallback values are counted as counter"""
+        column = column.str.lower()
+        fallback = column == 'nan'
+        if pattern:
+            fallback |= column.str.contains(pattern, regex=False)
+        if counter is not None and fallback.any():
+            profiling.count(counter, int(fallback.sum()))
+        first = column.str.split(' ', n=1).str[0].where(~fallback, str(default))
+        return first.astype('int64').to_numpy()
+
+    @staticmethod
+    def _position_column(column):
+        """Vectorized version of DBCSignal parse_position"""
+        idx = column.str.split(',', n=1).str[0].str.split('-', n=1).str[0].str.strip()
+        parts = idx.str.split('.', n=2)
+        byte = parts.str[0].astype('int64').to_numpy()
+        bit = parts.str[1].fillna('1').astype('int64').to_numpy()
+        return (byte - 1) * 8 + bit - 1
+
+    @staticmethod
+    def _default_engine():
+        """Return pandas as csv engine if it is installed, otherwise the stdlib csv module
+
+        Only looks pandas up without importing it, so e.g. cache hits do not pay for the import.
+        """
+        return 'pandas' if importlib.util.find_spec('pandas') is not None else 'csv'
+
+    @staticmethod
+    def _read_csv(path, sep='|'):
+        """Read csv rows as dicts with the stdlib, missing values are 'nan' like str() of pandas NaN"""
+        with open(path, 'r', encoding='utf-8', newline='') as fd:
+            for row in csv.DictReader(fd, delimiter=sep):
+                yield {key: 'nan' if value is None or value in csvconst['naValues'] else value
+                       for key, value in row.items()}
+
+    @staticmethod
+    def _parse_key(value):
+        """Parse slot key to int like pandas does for numeric columns"""
+        try:
+            return int(value)
+        except ValueError:
+            return value
+
+    def _read_slots(self, sfile, sep='|', columnar=False, engine='pandas'):
         """Read slots for futher converstion"""
+        if engine == 'csv':
+            for row in DBCConverter._read_csv(sfile, sep):
+                key = DBCConverter._parse_key(row[self.vmap['slotMap']['idx']])
+                self.slots[key] = self._parse_slot(row)
+            return
+
+        import pandas as pd
         df = pd.read_csv(sfile, sep=sep, na_filter=True)
+        if columnar:
+            self._read_slots_columnar(df)
+            return
         for _, row in df.iterrows():
             key = row[self.vmap['slotMap']['idx']]
             self.slots[key] = self._parse_slot(row)
 
-    def _prepare_slots(self, sfile):
+    def _read_slots_columnar(self, df):
+        """Read slots column wise, every distinct value is parsed only once"""
+        smap = self.vmap['slotMap']
+        cols = {key: self._str_column(df[value]) for key, value in smap.items()}
+        limits = self._parse_column(cols['limits'], fields.parse_range)
+        values = zip(
+            df[smap['idx']].tolist(),
+            cols['idx'].tolist(),
+            self._parse_column(cols['name'], fields.escape_string),
+            self._parse_column(cols['group'], fields.escape_string),
+            self._parse_column(cols['scale'], fields.parse_scale),
+            limits,
+            self._parse_column(cols['offset'], fields.parse_offset),
+            self._parse_column(cols['length'], fields.parse_length))
+        for key, idx, name, group, scale, (minimum, maximum, unit), offset, length in values:
+            self.slots[key] = DBCSlot.from_parsed(
+                idx, name, group, scale, minimum, maximum, unit, offset, length)
+
+    @profiling.timed('prepare_slots')
+    def _prepare_slots(self, sfile, columnar=False, engine='pandas'):
         """Prepare slots attribute from this instance for spn stuff"""
         spath = Path(sfile)
 
@@ -347,14 +814,81 @@ class DBCConverter():
 
         if self.slots:
             self._remove_slots()
-        self._read_slots(spath)
+        self._read_slots(spath, columnar=columnar, engine=engine)
+        profiling.count('slots', len(self.slots))
 
     def _remove_slots(self):
         """"Remove already parsed slots"""
         self.slots = {}
 
-    def read_j1939da(self, jfile, sfile):
-        """Read j1939 da csv definition for further processing"""
+    @profiling.timed('read_j1939da')
+    def read_j1939da(self, jfile, sfile, columnar=False, cache_dir=None, engine=None):
+        """Read j1939 da csv definition for further processing
+
+        columnar parses whole csv columns at once instead of walking row by row,
+        the resulting dbc instance is the same for both modes. With cache_dir the
+        parsed database is stored keyed by the content of both csv files and vmap,
+        later calls load it from there without parsing the csv files again.
+        engine selects 'pandas' or the stdlib 'csv' module for reading, by default
+        pandas is used if it is installed. columnar requires pandas.
+        """
+        engine = engine or DBCConverter._default_engine()
+        if columnar and engine != 'pandas':
+            raise ValueError('Columnar mode requires the pandas engine')
+
+        if cache_dir is None:
+            return self._convert_j1939da(jfile, sfile, columnar, engine)
+
+        cpath = Path(cache_dir).joinpath('%s.jdbc' % self._cache_key(jfile, sfile))
+        dbc_file = self._load_cache(cpath)
+        if dbc_file is None:
+            dbc_file = self._convert_j1939da(jfile, sfile, columnar, engine)
+            self._store_cache(cpath, dbc_file)
+        return dbc_file
+
+    def _cache_key(self, jfile, sfile):
+        """Generate cache key from csv file contents, vmap and cache version"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([DBCConverter.CACHE_VERSION, self.vmap], sort_keys=True).encode('utf-8'))
+        for path in (jfile, sfile):
+            with open(path, 'rb') as fd:
+                for chunk in iter(lambda: fd.read(1 << 20), b''):
+                    digest.update(chunk)
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @profiling.timed('load_cache')
+    def _load_cache(self, cpath):
+        """Load compiled database and slots from cache file, returns None if not available"""
+        if not cpath.is_file():
+            return None
+        try:
+            with open(cpath, 'rb') as fd:
+                version, keys, packed = pickle.load(fd)
+        except Exception as err:
+            logging.warning('Failed to load cache file %s: %s' % (cpath.resolve(), err))
+            return None
+        if version != DBCConverter.CACHE_VERSION:
+            return None
+
+        logging.info('Load j1939da definition from cache %s' % cpath.resolve())
+        slots = [DBCSlot.from_parsed(*slot) for slot in packed[1]]
+        self.slots = dict(zip(keys, slots))
+        return DBC.unpack(packed, slots)
+
+    @profiling.timed('store_cache')
+    def _store_cache(self, cpath, dbc_file):
+        """Store compiled database and slots atomically into cache file"""
+        cpath.parent.mkdir(parents=True, exist_ok=True)
+        keys = [key.item() if hasattr(key, 'item') else key for key in self.slots]
+        tmp = cpath.with_name('%s.%d.tmp' % (cpath.name, os.getpid()))
+        with open(tmp, 'wb') as fd:
+            pickle.dump((DBCConverter.CACHE_VERSION, keys, dbc_file.pack(self.slots.values())),
+                        fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cpath)
+
+    def _convert_j1939da(self, jfile, sfile, columnar, engine):
+        """Convert j1939 da csv definition into new dbc instance"""
         jpath = Path(jfile)
 
         logging.info('Start to read j1939da definition %s' % jpath.resolve())
@@ -362,20 +896,87 @@ class DBCConverter():
             logging.error(
                 'Failed to load local csv file %s, it does not exists' % (jpath.resolve()))
 
-        self._prepare_slots(sfile)
+        self._prepare_slots(sfile, columnar=columnar, engine=engine)
 
         # start dbc stuff
-        dbc_file = DBC(jfile.name)
-
-        df = pd.read_csv(jpath.resolve(), sep='|', na_filter=True, dtype=str)
-        pgns = df[self.vmap['msgMap']['pgn']].unique()
-        groups = df.groupby(self.vmap['msgMap']['pgn'])
-        for key in pgns:
-            logging.debug('Start to process msg/pgn: %s' % key)
-            group = groups.get_group(key)
-            msg = self.parse_dbc_msg(group.iloc[0])
-            dbc_file.msgs.append(msg)
-            for idx in range(group.shape[0]):
-                self.parse_dbc_signal(msg, group.iloc[idx])
+        dbc_file = DBC(jpath.name)
+
+        if engine == 'csv':
+            groups = {}
+            with profiling.span('read_csv'):
+                for row in DBCConverter._read_csv(jpath):
+                    if row[self.vmap['msgMap']['pgn']] != 'nan':
+                        groups.setdefault(row[self.vmap['msgMap']['pgn']], []).append(row)
+            with profiling.span('parse_groups'):
+                for key, rows in groups.items():
+                    logging.debug('Start to process msg/pgn: %s' % key)
+                    dbc_file.add_msg(self._parse_group(rows))
+            profiling.count('pgns', len(groups))
+            return dbc_file
+
+        import pandas as pd
+        with profiling.span('read_csv'):
+            df = pd.read_csv(jpath.resolve(), sep='|', na_filter=True, dtype=str)
+        if columnar:
+            with profiling.span('parse_columns'):
+                for msg in self._parse_columns(df):
+                    dbc_file.add_msg(msg)
+            profiling.count('pgns', len(dbc_file.msgs))
+            return dbc_file
+
+        with profiling.span('groupby'):
+            pgns = df[self.vmap['msgMap']['pgn']].unique()
+            groups = df.groupby(self.vmap['msgMap']['pgn'])
+        with profiling.span('parse_groups'):
+            for key in pgns:
+                logging.debug('Start to process msg/pgn: %s' % key)
+                group = groups.get_group(key)
+                dbc_file.add_msg(self._parse_group([group.iloc[idx] for idx in range(group.shape[0])]))
+        profiling.count('pgns', len(pgns))
 
         return dbc_file
+
+    def _parse_group(self, rows):
+        """Parse message from the first row and signals from all rows of one pgn group"""
+        msg = self.parse_dbc_msg(rows[0])
+        for row in rows:
+            self.parse_dbc_signal(msg, row)
+        return msg
+
+    def _parse_columns(self, df):
+        """Parse all messages and signals column wise, keeps pgn and row order from the csv"""
+        import numpy as np
+        import pandas as pd
+        mmap, smap = self.vmap['msgMap'], self.vmap['sigMap']
+        df = df[df[mmap['pgn']].notna()]
+        codes, _ = pd.factorize(df[mmap['pgn']])
+        order = np.argsort(codes, kind='stable')
+        df, codes = df.take(order), codes[order]
+        heads = df.iloc[np.flatnonzero(np.diff(codes, prepend=-1))]
+
+        pgns = heads[mmap['pgn']].astype('int64').to_numpy()
+        head = (pgns >> 24) & 0xff
+        msgs = list(map(DBCMessage.from_parsed,
+                        (head & 0x02).tolist(),
+                        (head & 0x01).tolist(),
+                        ((pgns >> 8) & 0xff).tolist(),
+                        (pgns & 0xff).tolist(),
+                        self._str_column(heads[mmap['name']]).tolist(),
+                        self._escape_column(self._str_column(heads[mmap['abbr']])).tolist(),
+                        self._first_int_column(self._str_column(heads[mmap['prio']]), 0,
+                                               counter='fallback.prio').tolist(),
+                        self._first_int_column(self._str_column(heads[mmap['length']]), 1, 'variable',
+                                               'fallback.msg_length').tolist()))
+
+        values = zip(
+            codes.tolist(),
+            df[smap['spn']].astype('int64').tolist(),
+            self._position_column(self._str_column(df[smap['pos']])).tolist(),
+            self._escape_column(self._str_column(df[smap['name']])).tolist(),
+            self._escape_column(self._str_column(df[smap['info']]).str[:10]).tolist(),
+            df[smap['slot']].astype('int64').tolist())
+        for code, spn, pos, name, info, slot in values:
+            msg = msgs[code]
+            msg.signals.append(DBCSignal.from_parsed(spn, pos, name, info, self.slots[slot], msg))
+
+        return msgs
@@ -0,0 +1,222 @@
+#!/usr/bin/python
+
+import logging
+from .base import CanIdCache
+from .dbc import DBC
+
+__all__ = ['DBCDecoder']
+
+
+class DBCDecoder():
+    """DBCDecoder compiles every DBCMessage into a specialized decode function"""
+
+    # maximum number of canids kept in the canid -> decode function cache
+    CACHE_SIZE = 4096
+
+    def __init__(self, dbc):
+        """Create new decoder for the given dbc instance, messages are compiled on first use"""
+        self.dbc = dbc.materialize()
+        self._compiled = {}
+        self._plans = {}
+        self._cache = CanIdCache(self._lookup_decoder, DBCDecoder.CACHE_SIZE)
+
+    @staticmethod
+    def unique_signals(msg):
+        """Return the signals of msg with distinct spns, only the first signal of an spn is kept"""
+        signals, spns = [], set()
+        for sig in msg.signals:
+            if sig.spn in spns:
+                logging.warning('Skip signal %s of %s, spn %d is already decoded from an earlier signal' % (
+                    sig.name, msg.abbr, sig.spn))
+                continue
+            spns.add(sig.spn)
+            signals.append(sig)
+        return signals
+
+    @staticmethod
+    def compile_message(msg):
+        """Generate decode function for msg which returns physical values by spn
+
+        Only signals with all their bits inside data are decoded, e.g. an 8 byte payload
+        of a longer message misses the signals which cross or lie beyond its bit 64.
+        """
+        values, checks, end = [], [], 0
+        for sig in DBCDecoder.unique_signals(msg):
+            expr = '(raw >> %d & %#x)' % (sig.pos, (1 << sig.slot.length) - 1)
+            if sig.slot.scale != 1:
+                expr += ' * %r' % float(sig.slot.scale)
+            if sig.slot.offset != 0:
+                expr += ' + %r' % float(sig.slot.offset)
+            if sig.slot.scale == 1 and sig.slot.offset == 0:
+                expr = 'float(%s)' % expr
+            values.append('%d: %s' % (sig.spn, expr))
+            checks.append('    if size >= %d:\n        values[%d] = %s\n' % (
+                sig.pos + sig.slot.length, sig.spn, expr))
+            end = max(end, sig.pos + sig.slot.length)
+
+        source = 'def decode(data, from_bytes=int.from_bytes):\n' \
+                 '    raw = from_bytes(data, "little")\n' \
+                 '    if len(data) >= %d:\n' \
+                 '        return {%s}\n' \
+                 '    size, values = len(data) * 8, {}\n' \
+                 '%s' \
+                 '    return values\n' % (-(-end // 8), ', '.join(values), ''.join(checks))
+        namespace = {}
+        exec(compile(source, '<decode %s>' % msg.abbr, 'exec'), namespace)
+        return namespace['decode']
+
+    def _lookup_decoder(self, canid):
+        """Compile decode function for the message of canid, None for unknown messages"""
+        key = DBC.message_key(canid)
+        func = self._compiled.get(key)
+        if func is None:
+            msg = self.dbc.find_canid(key)
+            if msg is not None:
+                func = self._compiled[key] = DBCDecoder.compile_message(msg)
+        return func
+
+    def get_decoder(self, canid):
+        """Return cached decode function for canid or None for unknown messages"""
+        return self._cache.get(canid)
+
+    def decode(self, canid, data):
+        """Decode payload data of canid into a dict of physical values by spn"""
+        func = self.get_decoder(canid)
+        return func(data) if func is not None else None
+
+    @staticmethod
+    def message_keys(canids):
+        """Vectorized version of DBC.message_key for an array of canids"""
+        import numpy as np
+        canids = np.asarray(canids, dtype=np.uint32)
+        pdu1 = ((canids >> 16) & 0xff) < 240
+        return canids & np.where(pdu1, np.uint32(DBC.PDU1_MASK), np.uint32(DBC.PGN_MASK))
+
+    @staticmethod
+    def plan_signals(msg):
+        """Return the signals of msg in decode plan order, all their bits are inside 8 bytes"""
+        return [sig for sig in DBCDecoder.unique_signals(msg) if sig.pos + sig.slot.length <= 64]
+
+    @staticmethod
+    def plan_message(msg):
+        """Generate vectorized decode plan for msg as (spn, pos, mask, scale, offset) arrays
+
+        Batch payloads hold 8 bytes, so signals which cross or lie beyond bit 64 are
+        left out instead of decoding bits which are not part of the payload.
+        """
+        import numpy as np
+        sigs = DBCDecoder.plan_signals(msg)
+        length = np.array([sig.slot.length for sig in sigs], dtype=np.uint64)
+        return (np.array([sig.spn for sig in sigs], dtype=np.int64),
+                np.array([sig.pos for sig in sigs], dtype=np.uint64),
+                np.where(length == 64, np.uint64(0xffffffffffffffff),
+                         (np.uint64(1) << length) - np.uint64(1)),
+                np.array([sig.slot.scale for sig in sigs], dtype=np.float64),
+                np.array([sig.slot.offset for sig in sigs], dtype=np.float64))
+
+    def get_plan(self, key):
+        """Return cached decode plan for the message key or None for unknown messages"""
+        plan = self._plans.get(key)
+        if plan is None:
+            msg = self.dbc.find_canid(key)
+            if msg is not None:
+                plan = self._plans[key] = DBCDecoder.plan_message(msg)
+        return plan
+
+    def compile_plans(self):
+        """Return decode plans of all messages by message key, as used by from_plans"""
+        for msg in self.dbc.msgs:
+            key = DBC.message_key(msg.calc_canid())
+            if key not in self._plans:
+                self.get_plan(key)
+        return dict(self._plans)
+
+    @classmethod
+    def from_plans(cls, plans):
+        """Create batch decoder from compile_plans without the dbc, other canids are unknown"""
+        decoder = cls(DBC('plans'))
+        decoder._plans = dict(plans)
+        return decoder
+
+    def decode_batch(self, canids, payloads=None, timestamps=None, as_frame=False):
+        """Decode a batch of frames into one float array per spn
+
+        canids is a FrameBatch or an array of N canids, payloads an (N, 8) uint8 matrix
+        and timestamps an optional array of N timestamps (defaults to the frame index).
+        Returns a dict of spn -> (timestamps, values) or with as_frame a long pandas
+        DataFrame.
+        """
+        import numpy as np
+        from .batch import FrameBatch
+        if isinstance(canids, FrameBatch):
+            timestamps, canids, payloads = canids
+        canids = np.asarray(canids, dtype=np.uint32)
+        timestamps = np.arange(canids.shape[0], dtype=np.float64) if timestamps is None \
+            else np.asarray(timestamps)
+
+        parts = {}
+        for key, rows, values in self.decode_groups(canids, payloads):
+            if values is None:
+                continue
+            stamps = timestamps[rows]
+            for spn, row in zip(self.get_plan(key)[0].tolist(), values):
+                parts.setdefault(spn, []).append((stamps, row))
+
+        result = {spn: DBCDecoder._merge_parts(values) for spn, values in parts.items()}
+        if as_frame:
+            return DBCDecoder._to_frame(result)
+        return result
+
+    def decode_groups(self, canids, payloads):
+        """Decode a batch of frames grouped by message key
+
+        canids is an array of N canids and payloads an (N, 8) uint8 matrix. Returns a
+        generator of (key, rows, values) with the frame indexes of the message and one
+        row of values per signal of get_plan, values is None for unknown messages.
+        """
+        import numpy as np
+        canids = np.asarray(canids, dtype=np.uint32)
+        payloads = np.ascontiguousarray(payloads, dtype=np.uint8)
+        if payloads.ndim != 2 or payloads.shape[1] != 8 or payloads.shape[0] != canids.shape[0]:
+            raise ValueError('Payloads need to be a (%d, 8) matrix' % canids.shape[0])
+        return self._decode_groups(canids, payloads.view('<u8').ravel())
+
+    def _decode_groups(self, canids, raws):
+        """Generate (key, rows, values) of decode_groups from the payloads as uint64"""
+        import numpy as np
+        keys, inverse = np.unique(DBCDecoder.message_keys(canids), return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=keys.shape[0]))))
+        for idx, key in enumerate(keys.tolist()):
+            rows = order[bounds[idx]:bounds[idx + 1]]
+            plan = self.get_plan(key)
+            if plan is None:
+                yield key, rows, None
+                continue
+            _, pos, mask, scale, offset = plan
+            values = ((raws[rows][None, :] >> pos[:, None]) & mask[:, None]).astype(np.float64)
+            values *= scale[:, None]
+            values += offset[:, None]
+            yield key, rows, values
+
+    @staticmethod
+    def _merge_parts(parts):
+        """Merge (timestamps, values) parts from several pgns of one spn in timestamp order"""
+        import numpy as np
+        if len(parts) == 1:
+            return parts[0]
+        stamps = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        order = np.argsort(stamps, kind='stable')
+        return stamps[order], values[order]
+
+    @staticmethod
+    def _to_frame(result):
+        """Convert decode_batch result into a long DataFrame with timestamp, spn and value"""
+        import numpy as np
+        import pandas as pd
+        sizes = [values.shape[0] for _, values in result.values()]
+        return pd.DataFrame({
+            'timestamp': np.concatenate([stamps for stamps, _ in result.values()]) if result else [],
+            'spn': np.repeat(np.fromiter(result.keys(), dtype=np.int64, count=len(result)), sizes),
+            'value': np.concatenate([values for _, values in result.values()]) if result else []})
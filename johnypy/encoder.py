@@ -0,0 +1,129 @@
+#!/usr/bin/python
+
+import math
+from .dbc import DBC
+from .decoder import DBCDecoder
+
+__all__ = ['DBCEncoder']
+
+# j1939 fill of unset payload bits, all bits are 1 ("not available")
+NOT_AVAILABLE = 0xffffffffffffffff
+
+
+class DBCEncoder():
+    """DBCEncoder packs physical spn values into 8 byte payloads of a DBCMessage
+
+    Values are clamped to the slot range, raw values to the bits of the signal.
+    Bits of signals without value are filled with 1 (j1939 not available).
+    Encoded values decode to the nearest value of the signal resolution.
+    """
+
+    def __init__(self, dbc):
+        """Create new encoder for the given dbc instance, messages are compiled on first use"""
+        self.dbc = dbc.materialize()
+        self._compiled = {}
+        self._plans = {}
+
+    @staticmethod
+    def compile_message(msg):
+        """Return list of (spn, pos, mask, scale, offset, min, max) of the signals of msg"""
+        signals = []
+        for sig in DBCDecoder.plan_signals(msg):
+            minimum, maximum = (sig.slot.min, sig.slot.max) if sig.slot.min < sig.slot.max else \
+                (-math.inf, math.inf)
+            signals.append((sig.spn, sig.pos, (1 << sig.slot.length) - 1, float(sig.slot.scale or 1),
+                            float(sig.slot.offset), minimum, maximum))
+        return signals
+
+    def _get_signals(self, canid):
+        """Return compiled signals for the message of canid or None for unknown messages"""
+        key = DBC.message_key(canid)
+        signals = self._compiled.get(key)
+        if signals is None:
+            msg = self.dbc.find_canid(key)
+            if msg is not None:
+                signals = self._compiled[key] = DBCEncoder.compile_message(msg)
+        return signals
+
+    def encode(self, canid, values):
+        """Encode dict of physical values by spn into the 8 byte payload of canid
+
+        Missing, None and nan values are not available. Returns None for unknown messages.
+        """
+        signals = self._get_signals(canid)
+        if signals is None:
+            return None
+        raw = NOT_AVAILABLE
+        for spn, pos, mask, scale, offset, minimum, maximum in signals:
+            value = values.get(spn)
+            if value is None or value != value:
+                continue
+            value = round(min(max((min(max(value, minimum), maximum) - offset) / scale, 0), mask))
+            raw = (raw & ~(mask << pos)) | (value << pos)
+        return raw.to_bytes(8, 'little')
+
+    @staticmethod
+    def plan_message(msg):
+        """Generate vectorized encode plan for msg as (spn, pos, mask, scale, offset, min, max) arrays"""
+        import numpy as np
+        spns, pos, mask, scale, offset = DBCDecoder.plan_message(msg)
+        limits = np.array([(sig.slot.min, sig.slot.max) for sig in DBCDecoder.plan_signals(msg)],
+                          dtype=np.float64).reshape(-1, 2)
+        unbounded = limits[:, 0] >= limits[:, 1]
+        limits[unbounded] = (-np.inf, np.inf)
+        return spns, pos, mask, np.where(scale == 0, 1.0, scale), offset, limits[:, 0], limits[:, 1]
+
+    def _get_plan(self, key):
+        """Return cached encode plan for the message key or None for unknown messages"""
+        plan = self._plans.get(key)
+        if plan is None:
+            msg = self.dbc.find_canid(key)
+            if msg is not None:
+                plan = self._plans[key] = DBCEncoder.plan_message(msg)
+        return plan
+
+    def encode_batch(self, canids, values, count=None):
+        """Encode arrays of physical values into an (N, 8) uint8 payload matrix
+
+        canids is one canid or an array of N canids, values a dict of spn -> scalar or
+        array of N values, nan values are not available. N is taken from the arrays
+        or count. Rows of unknown messages are all 0xff.
+        """
+        import numpy as np
+        if count is None:
+            sizes = [np.shape(column)[0] for column in [canids] + list(values.values()) if np.ndim(column)]
+            count = sizes[0] if sizes else 1
+        canids = np.broadcast_to(np.asarray(canids, dtype=np.uint32), (count,))
+        raws = np.full(count, NOT_AVAILABLE, dtype='<u8')
+
+        keys, inverse = np.unique(DBCDecoder.message_keys(canids), return_inverse=True)
+        for idx, key in enumerate(keys.tolist()):
+            plan = self._get_plan(key)
+            if plan is None:
+                continue
+            rows = None if keys.shape[0] == 1 else np.flatnonzero(inverse == idx)
+            raw = raws if rows is None else raws[rows]
+            for spn, pos, mask, scale, offset, minimum, maximum in zip(*plan):
+                column = values.get(int(spn))
+                if column is None:
+                    continue
+                column = np.broadcast_to(np.asarray(column, dtype=np.float64), (count,))
+                column = column if rows is None else column[rows]
+                valid = ~np.isnan(column)
+                value = np.rint((np.clip(column, minimum, maximum) - offset) / scale)
+                # float64 can not hold the mask of 64 bit signals
+                value = np.clip(np.where(valid, value, 0), 0, float(min(int(mask), 1 << 63))).astype(np.uint64)
+                field = np.where(valid, value, mask) << pos
+                raw &= ~(mask << pos)
+                raw |= field
+            if rows is not None:
+                raws[rows] = raw
+        return raws.view(np.uint8).reshape(count, 8)
+
+    def encode_frames(self, canid, timestamps, values):
+        """Encode values of one message into a FrameBatch for decode_batch"""
+        import numpy as np
+        from .batch import FrameBatch
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        payloads = self.encode_batch(canid, values, timestamps.shape[0])
+        return FrameBatch(timestamps, np.full(timestamps.shape[0], canid, dtype=np.uint32), payloads)
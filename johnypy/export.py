@@ -0,0 +1,215 @@
+#!/usr/bin/python
+
+import logging
+import numpy as np
+from pathlib import Path
+from .decoder import DBCDecoder
+
+__all__ = ['SignalWriter']
+
+# file formats by suffix, arrow is written as ipc file
+FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+
+def _import_pyarrow():
+    """Import optional pyarrow dependency"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        logging.error('Failed to import pyarrow, it is required for the parquet/arrow export')
+        raise
+    return pyarrow
+
+
+class SignalWriter():
+    """Streams decoded spn values of a dbc into parquet or arrow files in row groups
+
+    The long layout writes a single (timestamp, source, spn, value, name, unit)
+    table, names and units are dictionary encoded. The wide layout writes one table
+    per message into the directory path with a timestamp, source and one column per
+    spn. Rows are buffered per table and written once a row group is full, so memory
+    stays bounded for captures of any length.
+    """
+
+    ROW_GROUP_SIZE = 1 << 18
+
+    # rows buffered over all tables, all tables are flushed beyond it
+    MAX_BUFFERED = 1 << 22
+
+    def __init__(self, dbc, path, layout='long', fmt=None, row_group_size=ROW_GROUP_SIZE, compression='zstd'):
+        """Create writer for path, fmt 'parquet' or 'arrow' defaults to the one of the path suffix"""
+        if layout not in ('long', 'wide'):
+            raise ValueError('Unknown layout %s' % layout)
+        self.pa = _import_pyarrow()
+        self.decoder = DBCDecoder(dbc)
+        self.path = Path(path)
+        self.layout = layout
+        self.format = fmt or FORMATS.get(self.path.suffix.lower(), 'parquet')
+        if self.format not in ('parquet', 'arrow'):
+            raise ValueError('Unknown format %s' % self.format)
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.stats = {'frames': 0, 'unknown': 0, 'values': 0, 'rows': 0, 'row_groups': 0}
+        self._tables = {}
+        self._buffered = 0
+        self._messages = {}
+        if layout == 'long':
+            self._init_dictionaries()
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _init_dictionaries(self):
+        """Create name and unit dictionaries over all spns of the dbc"""
+        sigs = {}
+        for msg in self.decoder.dbc.msgs:
+            for sig in msg.signals:
+                sigs.setdefault(sig.spn, sig)
+        self._spns = np.array(sorted(sigs), dtype=np.int64)
+        names, self._name_codes = np.unique([str(sigs[spn].name) for spn in self._spns.tolist()] or [''],
+                                            return_inverse=True)
+        units, self._unit_codes = np.unique([str(sigs[spn].slot.unit) for spn in self._spns.tolist()] or [''],
+                                            return_inverse=True)
+        self._names = self.pa.array(names.tolist(), self.pa.string())
+        self._units = self.pa.array(units.tolist(), self.pa.string())
+        pa = self.pa
+        self._schema = pa.schema([
+            ('timestamp', pa.float64()), ('source', pa.uint8()), ('spn', pa.int64()), ('value', pa.float64()),
+            ('name', pa.dictionary(pa.int32(), pa.string())), ('unit', pa.dictionary(pa.int32(), pa.string()))])
+
+    def _message(self, key):
+        """Return cached (msg, signals, decode plan) of the message key or None for unknown messages"""
+        if key not in self._messages:
+            plan = self.decoder.get_plan(key)
+            msg = self.decoder.dbc.find_canid(key) if plan is not None else None
+            self._messages[key] = None if msg is None else (msg, DBCDecoder.plan_signals(msg), plan)
+        return self._messages[key]
+
+    def _known(self, groups):
+        """Generate the (key, rows, values) groups of decode_groups of known messages, count the others"""
+        for key, rows, values in groups:
+            if values is None:
+                self.stats['unknown'] += rows.shape[0]
+                continue
+            yield key, rows, values
+
+    def write_batch(self, timestamps, canids=None, payloads=None):
+        """Decode and write one FrameBatch or arrays, payloads is an (n, 8) uint8 matrix"""
+        if canids is None:
+            timestamps, canids, payloads = timestamps
+        canids = np.asarray(canids, dtype=np.uint32)
+        groups = self._known(self.decoder.decode_groups(canids, payloads))
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        sources = (canids & 0xff).astype(np.uint8)
+        self.stats['frames'] += canids.shape[0]
+
+        if self.layout == 'wide':
+            for key, rows, values in groups:
+                self._append(key, [timestamps[rows], sources[rows]] + list(values))
+                self.stats['values'] += values.size
+        else:
+            parts = [(rows, self._message(key)[2][0], values) for key, rows, values in groups]
+            if parts:
+                frames = np.concatenate([np.tile(rows, values.shape[0]) for rows, _, values in parts])
+                spns = np.concatenate([np.repeat(spns, rows.shape[0]) for rows, spns, _ in parts])
+                values = np.concatenate([values.ravel() for _, _, values in parts])
+                # rows of a batch are written in frame order
+                order = np.argsort(frames, kind='stable')
+                frames, spns, values = frames[order], spns[order], values[order]
+                codes = np.searchsorted(self._spns, spns)
+                self._append(None, [timestamps[frames], sources[frames], spns, values,
+                                    self._name_codes[codes].astype(np.int32), self._unit_codes[codes].astype(np.int32)])
+                self.stats['values'] += values.shape[0]
+
+        if self._buffered > self.MAX_BUFFERED:
+            for key in list(self._tables):
+                self._flush(key, True)
+
+    def write_batches(self, batches):
+        """Write all FrameBatch or (timestamps, canids, payloads) batches, e.g. of CaptureReader or LogReader"""
+        for batch in batches:
+            self.write_batch(*batch)
+        return self.stats
+
+    def _append(self, key, columns):
+        """Buffer columns for the table of key and write its full row groups"""
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = list(self._open(key)) + [[]]
+        table[2].append(columns)
+        self._buffered += columns[0].shape[0]
+        if sum(part[0].shape[0] for part in table[2]) >= self.row_group_size:
+            self._flush(key, False)
+
+    def _flush(self, key, final):
+        """Write buffered rows of the table of key in row groups, the last partial group only if final"""
+        writer, schema, parts = self._tables[key]
+        if not parts:
+            return
+        columns = [np.concatenate(column) for column in zip(*parts)]
+        rows = columns[0].shape[0]
+        full = rows if final else rows - rows % self.row_group_size
+        for start in range(0, full, self.row_group_size):
+            stop = min(start + self.row_group_size, full)
+            self._write(writer, schema, key, [column[start:stop] for column in columns])
+        self._tables[key][2] = [[column[full:] for column in columns]] if full < rows else []
+        self._buffered -= full
+
+    def _write(self, writer, schema, key, columns):
+        """Write columns as one row group"""
+        pa = self.pa
+        if key is None:
+            arrays = [pa.array(column) for column in columns[:4]]
+            arrays += [pa.DictionaryArray.from_arrays(columns[4], self._names),
+                       pa.DictionaryArray.from_arrays(columns[5], self._units)]
+        else:
+            arrays = [pa.array(column) for column in columns]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        self.stats['rows'] += columns[0].shape[0]
+        self.stats['row_groups'] += 1
+
+    def _table_schema(self, key):
+        """Create wide table schema of message key, unit and spn are kept as field metadata"""
+        pa = self.pa
+        fields = [pa.field('timestamp', pa.float64()), pa.field('source', pa.uint8())]
+        names = {'timestamp', 'source'}
+        for sig in self._message(key)[1]:
+            name = str(sig.name) if sig.name not in names else '%s_%d' % (sig.name, sig.spn)
+            names.add(name)
+            fields.append(pa.field(name, pa.float64(), metadata={'spn': str(sig.spn), 'unit': str(sig.slot.unit)}))
+        return pa.schema(fields)
+
+    def _open(self, key):
+        """Open (file writer, schema) of the long table or the wide table of message key"""
+        if key is None:
+            path, schema = self.path, self._schema
+        else:
+            msg = self._message(key)[0]
+            pgn = (key >> 8) & 0x3ffff
+            path = self.path.joinpath('%s_%d%s' % (msg.abbr or 'pgn', pgn,
+                                                   '.parquet' if self.format == 'parquet' else '.arrow'))
+            schema = self._table_schema(key)
+        logging.info('Start to write %s %s' % (self.format, path.resolve()))
+        if self.format == 'parquet':
+            return self.pa.parquet.ParquetWriter(path, schema, compression=self.compression), schema
+        options = self.pa.ipc.IpcWriteOptions(compression=self.compression)
+        return self.pa.ipc.new_file(path, schema, options=options), schema
+
+    def close(self):
+        """Write all buffered rows and close the files"""
+        if self._tables is None:
+            return self.stats
+        for key in list(self._tables):
+            self._flush(key, True)
+            self._tables[key][0].close()
+        if self.layout == 'long' and not self._tables:
+            # empty captures still give a readable file
+            self._open(None)[0].close()
+        self._tables = None
+        return self.stats
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+
+import re
+from . import profiling
+
+__all__ = ['FieldParser']
+
+_BRACKETS = re.compile(r'\(.*?\)')
+_NAME_CHARS = re.compile(r'\(.*?\)|[^a-zA-Z0-9]')
+_ALPHA_CHARS = re.compile(r'\(.*?\)|[^a-zA-Z]')
+_LINE_BREAKS = re.compile(r'\r\n?|\n')
+_SEPARATORS = re.compile(r'[ ,]')
+_LENGTH_BYTES = re.compile(r'^[0-9]+ bytes?$')
+_LENGTH_BITS = re.compile(r'^[0-9]+ bits?$')
+_BYTES_UNIT = re.compile(r'bytes?')
+_BITS_UNIT = re.compile(r'bits?')
+_OFFSET_UNIT = re.compile(r'[\-0-9\.,]+ [\S]+')
+_OFFSET = re.compile(r'[\-0-9\.,]+')
+_RANGE_UNIT = re.compile(r'^-?[0-9.]+ to -?[0-9.]+ [\S]+$')
+_RANGE_STEPS = re.compile(r'^[0-9]+ to [0-9]+( per byte)?$')
+_SCALE_FRACTION = re.compile(r'^1/[0-9.]+ .*bit$')
+_SCALE_UNIT = re.compile(r'^-?[0-9.]+ .*bit$')
+_SCALE_BIT = re.compile(r'^-?[0-9.]+/bit$')
+
+
+class FieldParser():
+    """Bounded memo table around the parse function of one j1939 da field
+
+    parse returns (value, fallback), fallback marks default results which are
+    counted as the profiling counter fallback on every call. Only str values are
+    memoized, other values are parsed on each call.
+    """
+
+    __slots__ = ['parse', 'fallback', 'size', 'items']
+
+    SIZE = 4096
+
+    def __init__(self, parse, fallback=None, size=SIZE):
+        """Create new parser for the parse function"""
+        self.parse = parse
+        self.fallback = fallback
+        self.size = size
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __call__(self, value):
+        """Return parsed value, the table is emptied once it is full"""
+        result, fallback = self.lookup(value)
+        if fallback:
+            profiling.count(self.fallback)
+        return result
+
+    def lookup(self, value):
+        """Return (value, fallback) of value without counting the fallback"""
+        if type(value) is not str:
+            return self.parse(value)
+        try:
+            return self.items[value]
+        except KeyError:
+            entry = self.parse(value)
+            if len(self.items) >= self.size:
+                # unique values like names would only rotate through a full table
+                self.items = {}
+            self.items[value] = entry
+            return entry
+
+    def parse_many(self, values):
+        """Parse a column of values, every distinct value is parsed only once, fallbacks count per value"""
+        parsed = {}
+        results = []
+        fallbacks = 0
+        for value in values:
+            if type(value) is not str:
+                result, fallback = self.parse(value)
+            else:
+                try:
+                    result, fallback = parsed[value]
+                except KeyError:
+                    result, fallback = parsed[value] = self.lookup(value)
+            results.append(result)
+            fallbacks += fallback
+        if fallbacks:
+            profiling.count(self.fallback, fallbacks)
+        return results
+
+    def clear(self):
+        """Remove all memoized values"""
+        self.items = {}
+
+
+def parse_float(value):
+    """Try to parse variabel into float"""
+    return float(value.replace(',', '')) if type(value) == str else float(value)
+
+
+def _escape_name(name):
+    """Remove bracket texts and all but alphanumeric characters"""
+    return _NAME_CHARS.sub('', name), False
+
+
+def _escape_alpha(name):
+    """Remove bracket texts and all but alphabetic characters"""
+    return _ALPHA_CHARS.sub('', name), False
+
+
+def _escape_string(string):
+    """Replace line breaks, spaces and commas of str values"""
+    return (_SEPARATORS.sub('_', _LINE_BREAKS.sub(' ', string)) if type(string) == str else string), False
+
+
+def _parse_position(pos):
+    """Parse start bit from byte.bit position, ranges and lists use their first position"""
+    idx = pos.split(',')[0].split('-')[0].strip()
+    if '.' in idx:
+        values = idx.split('.')
+        return (int(values[0]) - 1) * 8 + int(values[1]) - 1, False
+    return (int(idx) - 1) * 8, False
+
+
+def _parse_length(length):
+    """Parse slot length in bits, unknown notations default to 1"""
+    if type(length) == str:
+        length = length.lower()
+        if _LENGTH_BYTES.match(length):
+            return int(_BYTES_UNIT.sub('', length).strip()) * 8, False
+        elif _LENGTH_BITS.match(length):
+            return int(_BITS_UNIT.sub('', length).strip()), False
+        return 1, True
+    return int(length), False
+
+
+def _parse_offset(offset):
+    """Parse offset value, unknown notations default to 0"""
+    if type(offset) == str:
+        if _OFFSET_UNIT.match(offset):
+            return parse_float(offset.split(' ')[0]), False
+        elif _OFFSET.match(offset):
+            return parse_float(offset), False
+        return 0, True
+    return float(offset), False
+
+
+def _parse_range(value):
+    """Parse range into (min, max, unit), unknown notations give (0, 0, value)"""
+    value = _BRACKETS.sub('', value.strip())
+    if _RANGE_UNIT.match(value):
+        v = value.split(' ')
+        return (parse_float(v[0]), parse_float(v[2]), v[3]), False
+    elif _RANGE_STEPS.match(value):
+        v = value.split(' ')
+        return (parse_float(v[0]), parse_float(v[2]), 'steps'), False
+    return (0, 0, value), True
+
+
+def _parse_scale(scale):
+    """Parse scaling per bit, unknown notations default to 1"""
+    scale = _BRACKETS.sub('', scale.strip())
+    if _SCALE_FRACTION.match(scale):
+        return float(1/parse_float(scale.split(' ')[0].split('/')[1])), False
+    elif _SCALE_UNIT.match(scale):
+        return float(parse_float(scale.split(' ')[0])), False
+    elif _SCALE_BIT.match(scale):
+        return float(parse_float(scale.split('/')[0])), False
+    return 1, True
+
+
+# memoized parsers of the j1939 da fields, results are the same as of the plain functions
+escape_name = FieldParser(_escape_name)
+escape_alpha = FieldParser(_escape_alpha)
+escape_string = FieldParser(_escape_string)
+parse_position = FieldParser(_parse_position)
+parse_length = FieldParser(_parse_length, 'fallback.slot_length')
+parse_offset = FieldParser(_parse_offset, 'fallback.offset')
+parse_range = FieldParser(_parse_range, 'fallback.range')
+parse_scale = FieldParser(_parse_scale, 'fallback.scale')
@@ -0,0 +1,179 @@
+#!/usr/bin/python
+
+__all__ = ['FrameFilter', 'FilterFanOut']
+
+# 18 bit pgn including extended data page and data page
+PGN_COUNT = 1 << 18
+
+CAN_SFF_MASK = 0x7ff
+
+
+def _expand(items):
+    """Generate all values of items, which are ints, ranges or inclusive (first, last) tuples"""
+    for item in items:
+        if isinstance(item, tuple):
+            yield from range(item[0], item[1] + 1)
+        elif isinstance(item, range):
+            yield from item
+        else:
+            yield item
+
+
+def _fill_table(table, items):
+    """Set table entries of all values of items"""
+    for value in _expand(items):
+        table[value] = 1
+    return table
+
+
+def split_canid(canid):
+    """Split 29 bit canid into (pgn, source, priority), pdu1 pgns are without destination address"""
+    pgn = (canid >> 8) & 0x3ffff
+    if pgn & 0xff00 < 0xf000:
+        pgn &= 0x3ff00
+    return pgn, canid & 0xff, (canid >> 26) & 0x07
+
+
+class FrameFilter():
+    """Compiled canid filter on pgns, spns, source addresses and priorities
+
+    Every criterion is compiled into a lookup table indexed by the part of the canid,
+    criteria which are None accept all values. spns are resolved into the pgns of
+    their messages in dbc. Only 29 bit canids match.
+    """
+
+    def __init__(self, pgns=None, spns=None, sources=None, priorities=None, dbc=None):
+        """Compile filter, each criterion is an iterable of ints, ranges or inclusive (first, last) tuples"""
+        if spns is not None:
+            if dbc is None:
+                raise ValueError('Filter on spns requires a dbc')
+            keys = FrameFilter.spn_pgns(dbc, spns)
+            pgns = keys if pgns is None else list(pgns) + keys
+        self.pgns = None if pgns is None else _fill_table(bytearray(PGN_COUNT), pgns)
+        self.sources = None if sources is None else _fill_table(bytearray(256), sources)
+        self.priorities = None if priorities is None else _fill_table(bytearray(8), priorities)
+        self._arrays = None
+
+    @staticmethod
+    def spn_pgns(dbc, spns):
+        """Return pgns of all messages of dbc which carry one of the spns"""
+        msgs = set()
+        for spn in _expand(spns):
+            msgs.update(id(sig.msg) for sig in dbc.find_spn(spn))
+        return [split_canid(msg.calc_canid())[0] for msg in dbc.msgs if id(msg) in msgs]
+
+    def match(self, canid):
+        """Return True if canid passes the filter"""
+        if canid <= CAN_SFF_MASK:
+            return False
+        pgn = (canid >> 8) & 0x3ffff
+        if pgn & 0xff00 < 0xf000:
+            pgn &= 0x3ff00
+        return bool((self.pgns is None or self.pgns[pgn]) and
+                    (self.sources is None or self.sources[canid & 0xff]) and
+                    (self.priorities is None or self.priorities[(canid >> 26) & 0x07]))
+
+    __call__ = match
+
+    def match_parts(self, pgn, source, priority):
+        """Return True if the canid parts of split_canid pass the filter"""
+        return bool((self.pgns is None or self.pgns[pgn]) and
+                    (self.sources is None or self.sources[source]) and
+                    (self.priorities is None or self.priorities[priority]))
+
+    def filter_frames(self, frames):
+        """Generate (timestamp, canid, data) frames which pass the filter"""
+        match = self.match
+        return (frame for frame in frames if match(frame[1]))
+
+    @staticmethod
+    def split_canids(canids):
+        """Vectorized version of split_canid, returns (pgns, sources, priorities, extended) arrays"""
+        import numpy as np
+        canids = np.asarray(canids, dtype=np.uint32)
+        pgns = (canids >> 8) & 0x3ffff
+        pgns = np.where((pgns & 0xff00) < 0xf000, pgns & 0x3ff00, pgns)
+        return pgns, canids & 0xff, (canids >> 26) & 0x07, canids > CAN_SFF_MASK
+
+    def _tables(self):
+        """Return the lookup tables as NumPy bool arrays"""
+        if self._arrays is None:
+            import numpy as np
+            self._arrays = [None if table is None else np.frombuffer(table, dtype=bool)
+                            for table in (self.pgns, self.sources, self.priorities)]
+        return self._arrays
+
+    def mask_parts(self, parts):
+        """Return bool mask of the split_canids parts which pass the filter"""
+        keep = parts[3].copy()
+        for table, values in zip(self._tables(), parts):
+            if table is not None:
+                keep &= table[values]
+        return keep
+
+    def mask(self, canids):
+        """Return bool mask of the canids which pass the filter"""
+        return self.mask_parts(FrameFilter.split_canids(canids))
+
+    def filter_batch(self, timestamps, canids=None, payloads=None):
+        """Return the rows of a FrameBatch or (timestamps, canids, payloads) which pass the filter"""
+        if canids is None:
+            return timestamps.filter(self.mask(timestamps.canids))
+        keep = self.mask(canids)
+        return timestamps[keep], canids[keep], payloads[keep]
+
+
+class FilterFanOut():
+    """Passes frames or batches in a single pass to several filtered consumers
+
+    The canid of each frame or batch is split only once, all filters test the
+    same parts. Consumers of frames are called with (timestamp, canid, data),
+    consumers of batches with (timestamps, canids, payloads) of the passing rows.
+    """
+
+    def __init__(self):
+        """Create fan out without consumers"""
+        self.routes = []
+        self.stats = {'frames': 0, 'passed': 0}
+
+    def add(self, frame_filter, consumer):
+        """Add consumer for the frames which pass frame_filter, None passes all frames"""
+        self.routes.append((frame_filter, consumer))
+        return consumer
+
+    def feed_frame(self, ts, canid, data):
+        """Pass one frame to the consumers of all matching filters"""
+        self.stats['frames'] += 1
+        parts = split_canid(canid) if canid > CAN_SFF_MASK else None
+        for frame_filter, consumer in self.routes:
+            if frame_filter is None or (parts is not None and frame_filter.match_parts(*parts)):
+                self.stats['passed'] += 1
+                consumer(ts, canid, data)
+
+    def feed_batch(self, timestamps, canids, payloads):
+        """Pass the matching rows of one batch to the consumers of all filters
+
+        Consumers are called with the (timestamps, canids, payloads) arrays of the rows.
+        """
+        self.stats['frames'] += canids.shape[0]
+        parts = FrameFilter.split_canids(canids)
+        for frame_filter, consumer in self.routes:
+            if frame_filter is None:
+                keep = None
+            else:
+                keep = frame_filter.mask_parts(parts)
+                if not keep.any():
+                    continue
+            rows = (timestamps, canids, payloads) if keep is None else \
+                (timestamps[keep], canids[keep], payloads[keep])
+            self.stats['passed'] += rows[1].shape[0]
+            consumer(*rows)
+
+    def run(self, source):
+        """Feed all frames or (timestamps, canids, payloads) batches of source, returns stats"""
+        for item in source:
+            if hasattr(item[1], 'shape'):
+                self.feed_batch(*item)
+            else:
+                self.feed_frame(*item)
+        return self.stats
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+
+import os
+import json
+import pickle
+import hashlib
+import logging
+from pathlib import Path
+from .dbc import DBC, DBCConverter, DBCMessage, DBCSlot
+
+__all__ = ['IncrementalConverter']
+
+
+class IncrementalConverter(DBCConverter):
+    """DBCConverter which only re-parses pgn groups that changed since the previous conversion
+
+    The conversion state (row hashes, packed messages and their dbc text fragments
+    per pgn) is kept in memory and optionally in state_file between runs.
+    """
+
+    # version of the state file format, increase on format changes
+    STATE_VERSION = 1
+
+    def __init__(self, state_file=None):
+        """Create new converter, the previous state is loaded from state_file if it exists"""
+        super().__init__()
+        self.state_file = Path(state_file) if state_file else None
+        self.state = self._load_state()
+        self.changes = {'added': [], 'changed': [], 'removed': []}
+        self._fragments = {}
+
+    @staticmethod
+    def _digest(rows):
+        """Generate stable digest of row value tuples"""
+        return hashlib.blake2b(repr(rows).encode('utf-8'), digest_size=16).digest()
+
+    def _vmap_digest(self):
+        """Generate digest of vmap, a changed vmap invalidates the whole state"""
+        return IncrementalConverter._digest(json.dumps(self.vmap, sort_keys=True))
+
+    def _empty_state(self):
+        """Return new empty conversion state"""
+        return {'version': IncrementalConverter.STATE_VERSION, 'vmap': self._vmap_digest(),
+                'slots': {}, 'groups': {}}
+
+    def _load_state(self):
+        """Load previous conversion state from state_file"""
+        if self.state_file is None or not self.state_file.is_file():
+            return self._empty_state()
+        try:
+            with open(self.state_file, 'rb') as fd:
+                state = pickle.load(fd)
+        except Exception as err:
+            logging.warning('Failed to load state file %s: %s' % (self.state_file.resolve(), err))
+            return self._empty_state()
+        if state.get('version') != IncrementalConverter.STATE_VERSION or state.get('vmap') != self._vmap_digest():
+            logging.info('State file %s is outdated, start full conversion' % self.state_file.resolve())
+            return self._empty_state()
+        return state
+
+    def save_state(self):
+        """Store conversion state atomically into state_file"""
+        if self.state_file is None:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_name('%s.%d.tmp' % (self.state_file.name, os.getpid()))
+        with open(tmp, 'wb') as fd:
+            pickle.dump(self.state, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.state_file)
+
+    def _update_slots(self, sfile):
+        """Read all slots, unchanged slots are taken from the state, returns changed slot keys"""
+        spath = Path(sfile)
+        if not spath.is_file():
+            logging.error(
+                'Failed to load local csv file %s, it does not exists' % (spath.resolve()))
+            raise FileNotFoundError('No Slot file found')
+
+        columns = list(self.vmap['slotMap'].values())
+        old, new, changed = self.state['slots'], {}, set()
+        self._remove_slots()
+        for row in DBCConverter._read_csv(spath):
+            key = DBCConverter._parse_key(row[self.vmap['slotMap']['idx']])
+            digest = IncrementalConverter._digest(tuple(row[col] for col in columns))
+            if key in old and old[key][0] == digest:
+                packed = old[key][1]
+                self.slots[key] = DBCSlot.from_parsed(*packed)
+            else:
+                self.slots[key] = self._parse_slot(row)
+                packed = self.slots[key].pack()
+                changed.add(key)
+            new[key] = (digest, packed)
+        changed.update(set(old) - set(new))
+        self.state['slots'] = new
+        return changed
+
+    def update_j1939da(self, jfile, sfile):
+        """Convert j1939 da csv definition, reusing all pgn groups which did not change
+
+        A group changes if one of its rows or one of the slots used by its signals
+        changes. Added, changed and removed pgns are reported in the changes attribute.
+        """
+        jpath = Path(jfile)
+        logging.info('Start to update j1939da definition %s' % jpath.resolve())
+        changed_slots = self._update_slots(sfile)
+
+        mmap, smap = self.vmap['msgMap'], self.vmap['sigMap']
+        columns = list(mmap.values()) + list(smap.values())
+        groups = {}
+        for row in DBCConverter._read_csv(jpath):
+            if row[mmap['pgn']] != 'nan':
+                groups.setdefault(row[mmap['pgn']], []).append(row)
+
+        refs = {id(slot): key for key, slot in self.slots.items()}
+        old, new = self.state['groups'], {}
+        self.changes = {'added': [], 'changed': [], 'removed': []}
+        self._fragments = {}
+        dbc_file = DBC(jpath.name)
+        for key, rows in groups.items():
+            digest = IncrementalConverter._digest([tuple(row[col] for col in columns) for row in rows])
+            entry = old.get(key)
+            if entry is not None and entry[0] == digest and not changed_slots.intersection(entry[1]):
+                msg = DBCMessage.unpack(entry[2], self.slots)
+            else:
+                logging.debug('Start to process msg/pgn: %s' % key)
+                msg = self._parse_group(rows)
+                deps = sorted(set(int(row[smap['slot']]) for row in rows))
+                entry = (digest, deps, msg.pack(refs), DBC.dbcfy_msg(msg))
+                self.changes['changed' if key in old else 'added'].append(int(key))
+            new[key] = entry
+            self._fragments[(msg.calc_canid(), msg.name)] = (msg, entry[3])
+            dbc_file.add_msg(msg)
+
+        self.changes['removed'] = [int(key) for key in old if key not in new]
+        self.state['groups'] = new
+        self.save_state()
+        logging.info('Updated j1939da definition, added: %d changed: %d removed: %d' % (
+            len(self.changes['added']), len(self.changes['changed']), len(self.changes['removed'])))
+        return dbc_file
+
+    def fragments(self, msg):
+        """Return cached dbc text fragments of msg, generated ones for other messages
+
+        Fragments are keyed by (canid, name) and only used for the very message they
+        were generated for, equal messages of other dbc instances are generated again.
+        """
+        cached = self._fragments.get((msg.calc_canid(), msg.name))
+        return cached[1] if cached is not None and cached[0] is msg else DBC.dbcfy_msg(msg)
+
+    def dump_dbc(self, dbc_file, filepath, force=False):
+        """Dump dbc instance from update_j1939da using the cached message text fragments"""
+        return dbc_file.dump_dbc(filepath, force, fragments=self.fragments)
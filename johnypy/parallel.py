@@ -0,0 +1,103 @@
+#!/usr/bin/python
+
+import os
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from .dbc import DBC, DBCConverter, DBCMessage
+
+__all__ = ['ParallelConverter']
+
+# converter of the current worker process, created by _init_worker
+_worker = None
+
+
+def _init_worker(vmap, sfile, columnar, engine):
+    """Create the worker converter and read the slots once per worker process"""
+    global _worker
+    _worker = DBCConverter()
+    _worker.vmap = vmap
+    _worker._prepare_slots(sfile, columnar=columnar, engine=engine)
+
+
+def _parse_chunk(columns, groups, columnar):
+    """Parse pgn groups of row value tuples into packed messages, slots are referenced by key"""
+    refs = {id(slot): key for key, slot in _worker.slots.items()}
+    if columnar:
+        import pandas as pd
+        df = pd.DataFrame([row for rows in groups for row in rows], columns=columns, dtype=object)
+        return [msg.pack(refs) for msg in _worker._parse_columns(df)]
+    return [_worker._parse_group([dict(zip(columns, row)) for row in rows]).pack(refs)
+            for rows in groups]
+
+
+def _convert_pair(vmap, jfile, sfile, columnar, engine):
+    """Convert one j1939 da sheet and return it packed"""
+    converter = DBCConverter()
+    converter.vmap = vmap
+    return converter.read_j1939da(jfile, sfile, columnar=columnar, engine=engine).pack()
+
+
+class ParallelConverter(DBCConverter):
+    """DBCConverter which parses pgn groups or whole sheets in a process pool
+
+    Messages come back from the workers in their packed form and are merged in
+    csv order, so the result is the same as from the serial conversion.
+    """
+
+    # number of chunks per worker, smaller chunks balance better but cost more transfers
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, workers=None):
+        """Create new converter, workers defaults to the number of cpus"""
+        super().__init__()
+        self.workers = workers or os.cpu_count() or 1
+
+    def _convert_j1939da(self, jfile, sfile, columnar, engine):
+        """Convert j1939 da csv definition by parsing the pgn groups in a process pool"""
+        if self.workers <= 1:
+            return super()._convert_j1939da(jfile, sfile, columnar, engine)
+
+        jpath = Path(jfile)
+        logging.info('Start to read j1939da definition %s with %d workers' % (jpath.resolve(), self.workers))
+        self._prepare_slots(sfile, columnar=columnar, engine=engine)
+
+        columns = list(self.vmap['msgMap'].values()) + list(self.vmap['sigMap'].values())
+        groups = list(self._read_groups(jpath, columns, engine).values())
+        size = max(1, -(-len(groups) // (self.workers * ParallelConverter.CHUNKS_PER_WORKER)))
+        chunks = [groups[idx:idx + size] for idx in range(0, len(groups), size)]
+
+        dbc_file = DBC(jpath.name)
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                 initargs=(self.vmap, Path(sfile), columnar, engine)) as pool:
+            for packed in pool.map(_parse_chunk, [columns] * len(chunks), chunks, [columnar] * len(chunks)):
+                for msg in packed:
+                    dbc_file.add_msg(DBCMessage.unpack(msg, self.slots))
+        return dbc_file
+
+    def _read_groups(self, jpath, columns, engine):
+        """Read the rows of the j1939 da sheet with engine as value tuples of columns grouped by pgn"""
+        pgn = self.vmap['msgMap']['pgn']
+        groups = {}
+        if engine == 'csv':
+            for row in DBCConverter._read_csv(jpath):
+                if row[pgn] != 'nan':
+                    groups.setdefault(row[pgn], []).append(tuple(row[col] for col in columns))
+            return groups
+
+        import pandas as pd
+        df = pd.read_csv(jpath.resolve(), sep='|', na_filter=True, dtype=str)
+        df = df[df[pgn].notna()]
+        for key, row in zip(df[pgn].tolist(), df[columns].itertuples(index=False, name=None)):
+            groups.setdefault(key, []).append(row)
+        return groups
+
+    def read_many(self, files, columnar=False, engine=None):
+        """Convert list of (j1939 da sheet, slot file) pairs concurrently, returns list of dbc instances"""
+        dbc_files = []
+        with ProcessPoolExecutor(min(self.workers, max(1, len(files)))) as pool:
+            futures = [pool.submit(_convert_pair, self.vmap, Path(jfile), Path(sfile), columnar, engine)
+                       for jfile, sfile in files]
+            for future in futures:
+                dbc_files.append(DBC.unpack(future.result()))
+        return dbc_files
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+import time
+import functools
+
+__all__ = ['Profiler']
+
+# profiler of the instrumented stages, None disables the instrumentation
+active = None
+
+
+class Profiler():
+    """Collects timing spans and counters of the instrumented conversion stages
+
+    The profiler records while it is used as context manager or between enable and
+    disable. Disabled instrumentation costs one global lookup per instrumented call.
+    Spans are inclusive, the time of nested stages is also part of the outer stage.
+    callback is called with (name, seconds) at the end of every span.
+    """
+
+    def __init__(self, callback=None):
+        """Create new profiler with empty spans and counters"""
+        self.callback = callback
+        self.spans = {}
+        self.counters = {}
+        self._previous = None
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def enable(self):
+        """Make this the active profiler"""
+        global active
+        self._previous, active = active, self
+        return self
+
+    def disable(self):
+        """Restore the previously active profiler"""
+        global active
+        active, self._previous = self._previous, None
+
+    def reset(self):
+        """Remove all recorded spans and counters"""
+        self.spans = {}
+        self.counters = {}
+
+    def add_span(self, name, seconds):
+        """Record one span of stage name"""
+        span = self.spans.get(name)
+        if span is None:
+            span = self.spans[name] = [0, 0.0]
+        span[0] += 1
+        span[1] += seconds
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def count(self, name, value=1):
+        """Increase counter name by value"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def stats(self):
+        """Return recorded spans as {name: {calls, seconds}} and counters as dict"""
+        return {'spans': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.spans.items()},
+                'counters': dict(self.counters)}
+
+    def report(self):
+        """Return spans sorted by time and counters as text table"""
+        lines = ['%-32s %10s %12s' % ('stage', 'calls', 'seconds')]
+        for name, (calls, seconds) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+            lines.append('%-32s %10d %12.6f' % (name, calls, seconds))
+        lines += ['%-32s %10d' % (name, value) for name, value in sorted(self.counters.items())]
+        return '\n'.join(lines)
+
+
+class _Span():
+    """Context manager which records its duration on a profiler"""
+
+    __slots__ = ['profiler', 'name', 'start']
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add_span(self.name, time.perf_counter() - self.start)
+
+
+class _NoSpan():
+    """Context manager used while profiling is disabled"""
+
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Return context manager which times stage name on the active profiler"""
+    return _NO_SPAN if active is None else _Span(active, name)
+
+
+def count(name, value=1):
+    """Increase counter name of the active profiler"""
+    if active is not None:
+        active.count(name, value)
+
+
+def timed(name):
+    """Decorator which times every call of the function as stage name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = active
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.add_span(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
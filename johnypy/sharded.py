@@ -0,0 +1,184 @@
+#!/usr/bin/python
+
+import os
+import logging
+import numpy as np
+from pathlib import Path
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor
+from .decoder import DBCDecoder
+from .capture import CaptureReader
+from .canlog import open_log
+
+__all__ = ['ShardedDecoder']
+
+# (decoder, frame filter) of the current worker process, created by _init_worker
+_worker = None
+
+CAPTURE_SUFFIXES = ('.pcap', '.pcapng', '.cap')
+
+
+def _init_worker(plans, frame_filter):
+    """Create the worker decoder from the compiled plans once per worker process"""
+    global _worker
+    _worker = (DBCDecoder.from_plans(plans), frame_filter)
+
+
+def _open_reader(path, options):
+    """Open capture or log reader of path, options are the reader arguments of ShardedDecoder.shards"""
+    if 'id_byteorder' in options:
+        return CaptureReader(path, options['id_byteorder'])
+    return open_log(path, options['start'], options['end'], options['pgns'])
+
+
+def _decode_parts(decoder, frame_filter, path, options, shard, size):
+    """Decode one shard into a dict of spn -> (timestamps, values)"""
+    parts = {}
+    reader = _open_reader(path, options)
+    try:
+        for batch in reader.read_shard(shard, size):
+            if frame_filter is not None:
+                batch = frame_filter.filter_batch(batch)
+            for spn, part in decoder.decode_batch(batch).items():
+                parts.setdefault(spn, []).append(part)
+    finally:
+        if hasattr(reader, 'close'):
+            reader.close()
+    return {spn: (np.concatenate([stamps for stamps, _ in part]), np.concatenate([values for _, values in part]))
+            for spn, part in parts.items()}
+
+
+def _decode_shard(path, options, shard, size):
+    """Decode one shard into a shared memory block, returns (name, spns, counts)
+
+    The block holds the timestamps of all spns followed by their values, both
+    float64 in the order of spns.
+    """
+    result = _decode_parts(*_worker, path, options, shard, size)
+    counts = [stamps.shape[0] for stamps, _ in result.values()]
+    total = sum(counts)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total * 16))
+    try:
+        columns = np.ndarray((2, total), dtype=np.float64, buffer=shm.buf)
+        pos = 0
+        for (stamps, values), count in zip(result.values(), counts):
+            columns[0, pos:pos + count] = stamps
+            columns[1, pos:pos + count] = values
+            pos += count
+        del columns
+    finally:
+        shm.close()
+    return shm.name, list(result.keys()), counts
+
+
+class ShardedDecoder():
+    """Decodes a capture or log file in independent byte range shards on a process pool
+
+    Captures are split at record boundaries and logs at line boundaries. The decode
+    plans of all messages are compiled once and passed to every worker by the pool
+    initializer. Workers write their columns into shared memory and return only its
+    name and layout, the shards are merged in timestamp order per spn.
+    """
+
+    # number of shards per worker, smaller shards balance better but cost more merging
+    SHARDS_PER_WORKER = 4
+    BATCH_SIZE = 1 << 16
+
+    def __init__(self, dbc, workers=None, frame_filter=None):
+        """Create new decoder, workers defaults to the number of cpus"""
+        self.decoder = DBCDecoder(dbc)
+        self.workers = workers or os.cpu_count() or 1
+        self.frame_filter = frame_filter
+        self.stats = {'shards': 0, 'values': 0}
+
+    def shards(self, filepath, count, start=None, end=None, pgns=None):
+        """Split filepath into up to count shards, returns (reader options, shards)
+
+        Files with a capture suffix are read by CaptureReader, all others by open_log
+        with the time window and pgn filter.
+        """
+        path = Path(filepath)
+        if path.suffix.lower() in CAPTURE_SUFFIXES:
+            with CaptureReader(path) as reader:
+                return {'id_byteorder': reader.id_byteorder}, reader.shards(count)
+        options = {'start': start, 'end': end, 'pgns': pgns}
+        return options, _open_reader(path, options).shards(count)
+
+    def decode(self, filepath, start=None, end=None, pgns=None, as_frame=False):
+        """Decode all frames of filepath into one float array per spn
+
+        Returns a dict of spn -> (timestamps, values) like DBCDecoder.decode_batch
+        or with as_frame a long pandas DataFrame.
+        """
+        path = Path(filepath)
+        count = 1 if self.workers <= 1 else self.workers * ShardedDecoder.SHARDS_PER_WORKER
+        options, shards = self.shards(path, count, start, end, pgns)
+        self.stats['shards'] = len(shards)
+        logging.info('Decode %s in %d shards with %d workers' % (path.name, len(shards), self.workers))
+
+        if self.workers <= 1 or len(shards) <= 1:
+            result = {}
+            for shard in shards:
+                for spn, part in _decode_parts(self.decoder, self.frame_filter, path, options, shard,
+                                               ShardedDecoder.BATCH_SIZE).items():
+                    result.setdefault(spn, []).append(part)
+            result = {spn: ShardedDecoder._concat(parts) for spn, parts in result.items()}
+        else:
+            # workers share the tracker of this process, their blocks outlive them until merged
+            resource_tracker.ensure_running()
+            with ProcessPoolExecutor(min(self.workers, len(shards)), initializer=_init_worker,
+                                     initargs=(self.decoder.compile_plans(), self.frame_filter)) as pool:
+                blocks = list(pool.map(_decode_shard, [path] * len(shards), [options] * len(shards), shards,
+                                       [ShardedDecoder.BATCH_SIZE] * len(shards)))
+            result = ShardedDecoder._merge(blocks)
+
+        self.stats['values'] = sum(values.shape[0] for _, values in result.values())
+        if as_frame:
+            return DBCDecoder._to_frame(result)
+        return result
+
+    @staticmethod
+    def _concat(parts):
+        """Concatenate (timestamps, values) parts of shards in file order, sorted if out of order"""
+        if len(parts) == 1:
+            return parts[0]
+        stamps = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        return ShardedDecoder._sort(stamps, values)
+
+    @staticmethod
+    def _sort(stamps, values):
+        """Sort columns by timestamp, time ordered columns are returned as they are"""
+        if stamps.shape[0] > 1 and (stamps[1:] < stamps[:-1]).any():
+            order = np.argsort(stamps, kind='stable')
+            return stamps[order], values[order]
+        return stamps, values
+
+    @staticmethod
+    def _merge(blocks):
+        """Copy the shared memory blocks of all shards into one column pair per spn and release them"""
+        sizes = {}
+        for _, spns, counts in blocks:
+            for spn, count in zip(spns, counts):
+                sizes[spn] = sizes.get(spn, 0) + count
+        result = {spn: (np.empty(size, dtype=np.float64), np.empty(size, dtype=np.float64))
+                  for spn, size in sizes.items()}
+        fill = dict.fromkeys(sizes, 0)
+
+        for name, spns, counts in blocks:
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                total = sum(counts)
+                columns = np.ndarray((2, total), dtype=np.float64, buffer=shm.buf)
+                pos = 0
+                for spn, count in zip(spns, counts):
+                    stamps, values = result[spn]
+                    stamps[fill[spn]:fill[spn] + count] = columns[0, pos:pos + count]
+                    values[fill[spn]:fill[spn] + count] = columns[1, pos:pos + count]
+                    fill[spn] += count
+                    pos += count
+                del columns
+            finally:
+                shm.close()
+                shm.unlink()
+        return {spn: ShardedDecoder._sort(*columns) for spn, columns in result.items()}
@@ -0,0 +1,288 @@
+#!/usr/bin/python
+
+import numpy as np
+from .decoder import DBCDecoder
+
+__all__ = ['SignalStore', 'SignalRing']
+
+
+class SignalRing():
+    """Preallocated ring buffer of the timestamps and values of one signal
+
+    The latest update is also kept as floats, so reading it costs no array access.
+    """
+
+    __slots__ = ['stamps', 'values', 'count', 'time', 'value']
+
+    def __init__(self, capacity):
+        """Create empty ring with room for the last capacity updates"""
+        self.stamps = np.empty(capacity, dtype=np.float64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.count = 0
+        self.time = None
+        self.value = None
+
+    def __len__(self):
+        return min(self.count, self.stamps.shape[0])
+
+    def push(self, timestamp, value):
+        """Append one update, the oldest update is overwritten once the ring is full"""
+        pos = self.count % self.stamps.shape[0]
+        self.stamps[pos] = timestamp
+        self.values[pos] = value
+        self.count += 1
+        self.time, self.value = timestamp, value
+
+    def extend(self, stamps, values):
+        """Append arrays of updates in time order"""
+        size, capacity = stamps.shape[0], self.stamps.shape[0]
+        if not size:
+            return
+        pos = self.count % capacity
+        if pos + size <= capacity:
+            self.stamps[pos:pos + size] = stamps
+            self.values[pos:pos + size] = values
+            self.count += size
+            self.time, self.value = float(stamps[-1]), float(values[-1])
+            return
+        skip = max(0, size - capacity)
+        pos = (self.count + skip) % capacity
+        first = min(size - skip, capacity - pos)
+        self.stamps[pos:pos + first] = stamps[skip:skip + first]
+        self.values[pos:pos + first] = values[skip:skip + first]
+        self.stamps[:size - skip - first] = stamps[skip + first:]
+        self.values[:size - skip - first] = values[skip + first:]
+        self.count += size
+        self.time, self.value = float(stamps[-1]), float(values[-1])
+
+    def history(self, count=None):
+        """Return copies of the last count (timestamps, values) in time order"""
+        size = len(self)
+        count = size if count is None else min(count, size)
+        idx = np.arange(self.count - count, self.count) % self.stamps.shape[0]
+        return self.stamps[idx], self.values[idx]
+
+
+class _Subscription():
+    """Callback with its spn and source filter, deadband and the last notified value per signal"""
+
+    __slots__ = ['callback', 'spns', 'sources', 'deadband', 'notified']
+
+    def __init__(self, callback, spns, sources, deadband):
+        self.callback = callback
+        self.spns = None if spns is None else frozenset(spns)
+        self.sources = None if sources is None else frozenset(sources)
+        self.deadband = deadband
+        self.notified = {}
+
+    def wants(self, spn, source):
+        """Return True if the subscription covers the signal"""
+        return (self.spns is None or spn in self.spns) and (self.sources is None or source in self.sources)
+
+    def hit(self, key, value):
+        """Return True if value changes more than the deadband from the last notified value"""
+        if value != value:
+            return False
+        ref = self.notified.get(key)
+        if ref is None or (abs(value - ref) > self.deadband if self.deadband > 0 else value != ref):
+            self.notified[key] = value
+            return True
+        return False
+
+    def hits(self, key, values):
+        """Return indexes of values which change more than the deadband from the last notified value"""
+        ref = self.notified.get(key)
+        valid = np.flatnonzero(~np.isnan(values))
+        if not valid.size:
+            return valid
+        if self.deadband <= 0:
+            current = values[valid]
+            changed = np.empty(valid.size, dtype=bool)
+            changed[0] = ref is None or current[0] != ref
+            changed[1:] = current[1:] != current[:-1]
+            hits = valid[changed]
+        else:
+            hits = self._deadband_hits(values, valid, ref)
+        if hits.size:
+            self.notified[key] = float(values[hits[-1]])
+        return hits
+
+    def _deadband_hits(self, values, valid, ref):
+        """Scan valid values in growing windows, each hit becomes the new reference"""
+        hits, pos, window = [], 0, 64
+        if ref is None:
+            hits.append(valid[0])
+            ref, pos = values[valid[0]], 1
+        while pos < valid.size:
+            rows = valid[pos:pos + window]
+            over = np.abs(values[rows] - ref) > self.deadband
+            if not over.any():
+                pos += rows.size
+                window *= 2
+                continue
+            idx = int(np.argmax(over))
+            hits.append(rows[idx])
+            ref, pos, window = values[rows[idx]], pos + idx + 1, 64
+        return np.array(hits, dtype=np.intp)
+
+
+class SignalStore():
+    """Latest values and recent history of the signals of a DBC by (spn, source address)
+
+    Every tracked signal gets a SignalRing of fixed capacity on its first update,
+    so memory only grows with the number of signals, not with the runtime.
+    Subscribers are notified of changes, or with a deadband of changes larger
+    than the deadband against the last notified value. nan values are stored but
+    never notified.
+    """
+
+    CAPACITY = 1024
+
+    def __init__(self, dbc, capacity=CAPACITY, spns=None):
+        """Create empty store for the signals of dbc, spns limits the tracked signals"""
+        self.decoder = DBCDecoder(dbc)
+        self.capacity = capacity
+        self.spns = None if spns is None else frozenset(spns)
+        self.signals = {}
+        self._sources = {}
+        # rings of the plan signals by (message key, source), None for untracked spns
+        self._groups = {}
+        self._subscriptions = []
+        self.stats = {'updates': 0, 'notifications': 0}
+
+    def __len__(self):
+        return len(self.signals)
+
+    def __contains__(self, key):
+        return key in self.signals
+
+    def keys(self):
+        """Return the tracked (spn, source) keys"""
+        return self.signals.keys()
+
+    def sources(self, spn):
+        """Return source addresses of spn"""
+        return list(self._sources.get(spn, {}))
+
+    def subscribe(self, callback, spns=None, sources=None, deadband=0.0):
+        """Call callback(spn, source, timestamp, value) on changes of the selected signals
+
+        A deadband of 0 notifies every change, larger deadbands only changes beyond it.
+        Returns the subscription for unsubscribe.
+        """
+        subscription = _Subscription(callback, spns, sources, deadband)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove subscription"""
+        self._subscriptions.remove(subscription)
+
+    def _ring(self, spn, source):
+        """Return ring of the signal, created on first use, or None for untracked spns"""
+        ring = self.signals.get((spn, source))
+        if ring is None:
+            if self.spns is not None and spn not in self.spns:
+                return None
+            ring = self.signals[(spn, source)] = SignalRing(self.capacity)
+            self._sources.setdefault(spn, {})[source] = ring
+        return ring
+
+    def update(self, spn, source, timestamp, value):
+        """Store one value of the signal (spn, source)"""
+        ring = self._ring(spn, source)
+        if ring is None:
+            return
+        ring.push(timestamp, value)
+        self.stats['updates'] += 1
+        for subscription in self._subscriptions:
+            if subscription.wants(spn, source) and subscription.hit((spn, source), value):
+                self.stats['notifications'] += 1
+                subscription.callback(spn, source, timestamp, value)
+
+    def update_frame(self, timestamp, canid, data):
+        """Decode one frame and store its values, returns False for unknown messages"""
+        values = self.decoder.decode(canid, data)
+        if values is None:
+            return False
+        for spn, value in values.items():
+            self.update(spn, canid & 0xff, timestamp, value)
+        return True
+
+    def update_decoded(self, decoded, source):
+        """Store the spn -> (timestamps, values) result of DBCDecoder.decode_batch of one source"""
+        for spn, (stamps, values) in decoded.items():
+            self.update_arrays(spn, source, stamps, values)
+
+    def update_arrays(self, spn, source, stamps, values):
+        """Store arrays of values of the signal (spn, source) in time order"""
+        ring = self._ring(spn, source)
+        if ring is None:
+            return
+        stamps = np.asarray(stamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        ring.extend(stamps, values)
+        self.stats['updates'] += values.shape[0]
+        if self._subscriptions:
+            self._notify(spn, source, stamps, values)
+
+    def update_batch(self, timestamps, canids=None, payloads=None):
+        """Decode a FrameBatch or (timestamps, canids, payloads) and store the values of all sources
+
+        payloads is an (n, 8) uint8 matrix, other shapes raise ValueError.
+        """
+        if canids is None:
+            timestamps, canids, payloads = timestamps
+        canids = np.asarray(canids, dtype=np.uint32)
+        groups = self.decoder.decode_groups(canids, payloads)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        for key, rows, decoded in groups:
+            if decoded is None:
+                continue
+            sources = canids[rows] & 0xff
+            if (sources == sources[0]).all():
+                parts = [(int(sources[0]), rows, decoded)]
+            else:
+                masks = [(source, sources == source) for source in np.unique(sources).tolist()]
+                parts = [(source, rows[mask], decoded[:, mask]) for source, mask in masks]
+            spns = self.decoder.get_plan(key)[0]
+            for source, selected, values in parts:
+                stamps = timestamps[selected]
+                rings = self._groups.get((key, source))
+                if rings is None:
+                    rings = self._groups[(key, source)] = [self._ring(spn, source) for spn in spns.tolist()]
+                for spn, ring, row in zip(spns.tolist(), rings, values):
+                    if ring is not None:
+                        ring.extend(stamps, row)
+                        self.stats['updates'] += row.shape[0]
+                        if self._subscriptions:
+                            self._notify(spn, source, stamps, row)
+
+    def _notify(self, spn, source, stamps, values):
+        """Call the subscribers of the signal for the updates which pass their deadband"""
+        key = (spn, source)
+        for subscription in self._subscriptions:
+            if not subscription.wants(spn, source):
+                continue
+            for idx in subscription.hits(key, values).tolist():
+                self.stats['notifications'] += 1
+                subscription.callback(spn, source, float(stamps[idx]), float(values[idx]))
+
+    def latest(self, spn, source=None):
+        """Return (timestamp, value) of the last update or None, source None takes the newest of all sources"""
+        if source is not None:
+            ring = self.signals.get((spn, source))
+            return None if ring is None or ring.time is None else (ring.time, ring.value)
+        rings = [ring for ring in self._sources.get(spn, {}).values() if ring.time is not None]
+        if not rings:
+            return None
+        ring = max(rings, key=lambda ring: ring.time)
+        return ring.time, ring.value
+
+    def history(self, spn, source, count=None):
+        """Return the last count (timestamps, values) of the signal in time order"""
+        ring = self.signals.get((spn, source))
+        if ring is None:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+        return ring.history(count)
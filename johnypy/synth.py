@@ -0,0 +1,151 @@
+#!/usr/bin/python
+
+import struct
+import random
+from pathlib import Path
+from .dbc import DBCConverter
+
+__all__ = ['SynthGenerator']
+
+# slot column values in the notations of the j1939 da sheets, (scaling, range, offset)
+SLOT_KINDS = [
+    ('0.125 rpm/bit', '0 to 8031.875 rpm', '0 rpm'),
+    ('1/128 %/bit', '-250 to 251.99 %', '-250 %'),
+    ('0.03125 deg C/bit', '-273 to 1734.96875 deg C', '-273 deg C'),
+    ('1 %/bit', '-125 to 125 %', '-125 %'),
+    ('0.05 V/bit', '0 to 3212.75 V', '0 V'),
+    ('1/256 km/h per bit', '0 to 250.996 km/h', '0 km/h'),
+    ('5 m/bit', '0 to 21,055,406 km', '0 m'),
+    ('1 count/bit', '0 to 250 per byte', '0'),
+    ('Binary', '0 to 1', '0')
+]
+
+# slot lengths in bits and their notations
+SLOT_LENGTHS = [(8, '1 byte'), (16, '2 bytes'), (32, '4 bytes'), (2, '2 bits'), (4, '4 bits'), (1, '1 bit')]
+
+# socketcan pcap record with big endian canid like captured by libpcap
+PCAP_HEADER = struct.Struct('<IHHiIII')
+PCAP_RECORD = struct.Struct('<IIII')
+SOCKETCAN_FRAME = struct.Struct('>IB3x8s')
+
+CAN_EFF_FLAG = 0x80000000
+
+
+class SynthGenerator():
+    """Generator of reproducible synthetic j1939 da sheets and can traffic
+
+    The sheets use the column names of DBCConverter.vmap and the value notations
+    of the j1939 da, the traffic uses the pgns and source addresses of a dbc.
+    """
+
+    def __init__(self, seed=0, vmap=None):
+        """Create new generator, the same seed generates the same files"""
+        self.seed = seed
+        self.vmap = vmap or DBCConverter().vmap
+
+    def slot_rows(self, slots):
+        """Generate slot rows as dicts keyed by the slotMap column names"""
+        rnd = random.Random(self.seed)
+        for idx in range(1, slots + 1):
+            scale, limits, offset = rnd.choice(SLOT_KINDS)
+            bits, length = SLOT_LENGTHS[idx % len(SLOT_LENGTHS)]
+            if scale == 'Binary':
+                bits, length = 1, '1 bit'
+            yield SynthGenerator._columns(self.vmap['slotMap'], {
+                'idx': idx, 'name': 'SAEslot%d, type %d' % (idx, bits), 'group': 'Type %d' % (idx % 7),
+                'scale': scale, 'limits': limits, 'offset': offset, 'length': length})
+
+    def j1939da_rows(self, pgns, signals, slots):
+        """Generate pgn/spn rows as dicts keyed by the msgMap and sigMap column names
+
+        Signals of a pgn are packed without overlap into its 8 bytes, the
+        positions use the byte.bit notation of the j1939 da.
+        """
+        rnd = random.Random(self.seed + 1)
+        bits = {length: size for size, length in SLOT_LENGTHS}
+        smap = self.vmap['slotMap']
+        lengths = {row[smap['idx']]: bits[row[smap['length']]] for row in self.slot_rows(slots)}
+        pdu1 = rnd.sample(range(0x00, 0xf0), min(pgns // 4, 0xf0))
+        pdu2 = rnd.sample(range(0xf000, 0x10000), pgns - len(pdu1))
+        spn = 100
+        for pgn in sorted([pf << 8 for pf in pdu1] + pdu2):
+            msg = SynthGenerator._columns(self.vmap['msgMap'], {
+                'pgn': pgn, 'abbr': 'SYN%d' % pgn, 'prio': '%d' % rnd.choice((3, 6, 7)),
+                'length': '8 bytes', 'name': 'Synthetic parameter group %d' % pgn})
+            bit = 0
+            for _ in range(signals):
+                slot = rnd.randint(1, slots)
+                size = lengths[slot]
+                if size >= 8:
+                    bit = -(-bit // 8) * 8
+                if bit + size > 64:
+                    break
+                if size >= 8:
+                    pos = '%d' % (bit // 8 + 1) if size == 8 else '%d-%d' % (bit // 8 + 1, (bit + size) // 8)
+                else:
+                    pos = '%d.%d' % (bit // 8 + 1, bit % 8 + 1)
+                spn += rnd.randint(1, 3)
+                yield dict(msg, **SynthGenerator._columns(self.vmap['sigMap'], {
+                    'spn': spn, 'pos': pos, 'name': 'Synthetic signal %d (syn)' % spn,
+                    'info': 'Synthetic spn %d' % spn, 'slot': slot}))
+                bit += size
+
+    @staticmethod
+    def _columns(vmap, values):
+        """Rename value keys to the column names of vmap"""
+        return {vmap[key]: value for key, value in values.items()}
+
+    @staticmethod
+    def _write_rows(path, columns, rows):
+        """Write rows as | separated csv with the given columns"""
+        with open(path, 'w', encoding='utf-8', newline='') as fd:
+            fd.write('|'.join(columns) + '\n')
+            for row in rows:
+                fd.write('|'.join(str(row[column]) for column in columns) + '\n')
+
+    def write_j1939da(self, directory, pgns=500, signals=8, slots=200):
+        """Write pgn_spn.csv and slots.csv into directory, returns (jfile, sfile)"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        jfile, sfile = directory.joinpath('pgn_spn.csv'), directory.joinpath('slots.csv')
+        SynthGenerator._write_rows(sfile, list(self.vmap['slotMap'].values()), self.slot_rows(slots))
+        SynthGenerator._write_rows(jfile, list(self.vmap['msgMap'].values()) + list(self.vmap['sigMap'].values()),
+                                   self.j1939da_rows(pgns, signals, slots))
+        return jfile, sfile
+
+    def frames(self, dbc, count, sources=8, start=1600000000.0, period=0.0005):
+        """Generate count (timestamp, canid, data) frames of the messages of dbc"""
+        rnd = random.Random(self.seed + 2)
+        canids = [msg.calc_canid(0) for msg in dbc.msgs]
+        addresses = rnd.sample(range(0x00, 0xfe), sources)
+        for idx in range(count):
+            yield start + idx * period, rnd.choice(canids) | rnd.choice(addresses), \
+                rnd.getrandbits(64).to_bytes(8, 'little')
+
+    def batch(self, dbc, count, sources=8, start=1600000000.0, period=0.0005):
+        """Return the frames of frames() as FrameBatch"""
+        from .batch import FrameBatch
+        return FrameBatch.from_frames(self.frames(dbc, count, sources, start, period))
+
+    @staticmethod
+    def write_pcap(path, frames):
+        """Write frames as socketcan pcap capture, returns the number of frames"""
+        count = 0
+        with open(path, 'wb') as fd:
+            fd.write(PCAP_HEADER.pack(0xa1b2c3d4, 2, 4, 0, 0, 65535, 227))
+            for ts, canid, data in frames:
+                sec = int(ts)
+                fd.write(PCAP_RECORD.pack(sec, int((ts - sec) * 1e6), 16, 16))
+                fd.write(SOCKETCAN_FRAME.pack(canid | CAN_EFF_FLAG, len(data), data))
+                count += 1
+        return count
+
+    @staticmethod
+    def write_candump(path, frames, interface='can0'):
+        """Write frames as candump log, returns the number of frames"""
+        count = 0
+        with open(path, 'w', encoding='ascii') as fd:
+            for ts, canid, data in frames:
+                fd.write('(%.6f) %s %08X#%s\n' % (ts, interface, canid, data.hex().upper()))
+                count += 1
+        return count
@@ -0,0 +1,156 @@
+#!/usr/bin/python
+
+import logging
+from .base import Stringify
+
+__all__ = ['TPSession', 'TransportReassembler']
+
+# transport protocol connection management and data transfer pdu formats
+TP_CM = 0xec
+TP_DT = 0xeb
+
+# connection management control bytes
+TP_CM_RTS = 16
+TP_CM_CTS = 17
+TP_CM_EOMA = 19
+TP_CM_BAM = 32
+TP_CM_ABORT = 255
+
+GLOBAL_ADDRESS = 0xff
+
+
+class TPSession(Stringify):
+    """Active BAM or RTS/CTS transfer between source and destination"""
+
+    __slots__ = ['src', 'dst', 'pgn', 'prio', 'size', 'packets', 'data', 'received', 'timestamp']
+
+    STRINGIFY = __slots__
+
+    def __init__(self, src, dst, pgn, prio, size, packets, timestamp):
+        """Create new session with a preallocated buffer for size bytes"""
+        super().__init__()
+        self.src = src
+        self.dst = dst
+        self.pgn = pgn
+        self.prio = prio
+        self.size = size
+        self.packets = packets
+        self.data = bytearray(packets * 7)
+        self.received = 0
+        self.timestamp = timestamp
+
+    def add_packet(self, seq, payload):
+        """Store data transfer packet, returns True when all packets are received"""
+        if not 0 < seq <= self.packets:
+            return False
+        self.data[(seq - 1) * 7:seq * 7] = bytes(payload[1:8]).ljust(7, b'\xff')
+        self.received |= 1 << seq
+        return self.received == (1 << (self.packets + 1)) - 2
+
+    def calc_canid(self):
+        """Generate canid of the reassembled message, pdu1 pgns carry the destination"""
+        canid = (self.prio << 26) | (self.pgn << 8) | self.src
+        if (self.pgn >> 8) & 0xff < 240:
+            canid = (canid & ~0xff00) | (self.dst << 8)
+        return canid
+
+
+class TransportReassembler():
+    """J1939 transport protocol (BAM and RTS/CTS) reassembly
+
+    Sessions are tracked per (source, destination), as TP.DT frames do not carry
+    the pgn. Single frames which are not part of the transport protocol are passed
+    through with a single pdu format check.
+    """
+
+    # receiver timeout T1 between data transfer packets in seconds
+    TIMEOUT = 0.75
+
+    MAX_SESSIONS = 256
+
+    def __init__(self, timeout=TIMEOUT, max_sessions=MAX_SESSIONS):
+        """Create new reassembler, timeouts use the frame timestamps"""
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.stats = {'completed': 0, 'aborted': 0, 'expired': 0, 'dropped': 0}
+
+    def reassemble(self, frames):
+        """Generate (timestamp, canid, data) frames, transport frames are replaced by their messages"""
+        for frame in frames:
+            pf = (frame[1] >> 16) & 0xff
+            if pf != TP_DT and pf != TP_CM:
+                yield frame
+                continue
+            msg = self.feed(*frame)
+            if msg is not None:
+                yield msg
+
+    def feed(self, timestamp, canid, data):
+        """Process one transport frame, returns the reassembled (timestamp, canid, data) or None"""
+        pf = (canid >> 16) & 0xff
+        src, dst = canid & 0xff, (canid >> 8) & 0xff
+        if pf == TP_DT:
+            return self._data_transfer(timestamp, src, dst, data)
+        if pf == TP_CM and len(data) >= 8:
+            self._connection_management(timestamp, (canid >> 26) & 0x07, src, dst, data)
+        return None
+
+    def _data_transfer(self, timestamp, src, dst, data):
+        """Add TP.DT packet to its session and return the message when complete"""
+        session = self.sessions.get((src, dst))
+        if session is None or not data:
+            return None
+        if timestamp - session.timestamp > self.timeout:
+            self._close((src, dst), 'expired')
+            return None
+        session.timestamp = timestamp
+        if not session.add_packet(data[0], data):
+            return None
+        self._close((src, dst), 'completed')
+        return timestamp, session.calc_canid(), bytes(session.data[:session.size])
+
+    def _connection_management(self, timestamp, prio, src, dst, data):
+        """Open, close or abort sessions from TP.CM frames"""
+        control = data[0]
+        pgn = data[5] | (data[6] << 8) | (data[7] << 16)
+        if control == TP_CM_BAM or control == TP_CM_RTS:
+            if control == TP_CM_BAM:
+                dst = GLOBAL_ADDRESS
+            size, packets = data[1] | (data[2] << 8), data[3]
+            if packets == 0 or size > packets * 7:
+                logging.debug('Skip invalid transport session %02x -> %02x' % (src, dst))
+                return
+            self._open(TPSession(src, dst, pgn, prio, size, packets, timestamp))
+        else:
+            # abort and cts might be send from either side of the connection, cts holds
+            # with 0 packets and all other control frames keep the session of their pgn alive
+            for key in ((src, dst), (dst, src)):
+                session = self.sessions.get(key)
+                if session is None or session.pgn != pgn:
+                    continue
+                if control == TP_CM_ABORT:
+                    self._close(key, 'aborted')
+                else:
+                    session.timestamp = max(session.timestamp, timestamp)
+
+    def _open(self, session):
+        """Register new session, replaces a running one and keeps the table bounded"""
+        key = (session.src, session.dst)
+        if key in self.sessions:
+            self._close(key, 'aborted')
+        self.expire(session.timestamp)
+        if len(self.sessions) >= self.max_sessions:
+            self._close(next(iter(self.sessions)), 'dropped')
+        self.sessions[key] = session
+
+    def _close(self, key, reason):
+        """Remove session and count the reason"""
+        del self.sessions[key]
+        self.stats[reason] += 1
+
+    def expire(self, timestamp):
+        """Remove all sessions without traffic within timeout before timestamp"""
+        for key in [key for key, session in self.sessions.items()
+                    if timestamp - session.timestamp > self.timeout]:
+            self._close(key, 'expired')
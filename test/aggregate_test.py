@@ -0,0 +1,36 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        gen = johnypy.SynthGenerator(0)
+        jfile, sfile = gen.write_j1939da(tmp, 20, 4, 20)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+    frames = list(gen.frames(dbc, 20000))
+    stamps = np.array([ts for ts, _, _ in frames])
+    canids = np.array([canid for _, canid, _ in frames], dtype=np.uint32)
+    payloads = np.frombuffer(b''.join(data for _, _, data in frames), dtype=np.uint8).reshape(-1, 8)
+    decoded = johnypy.DBCDecoder(dbc).decode_batch(canids, payloads, stamps)
+
+    unit = dbc.msgs[0].signals[0].slot.unit
+    agg = johnypy.WindowAggregator(1.0, 0.5, dbc=dbc, units=[unit], valid_only=True)
+    records = np.concatenate([agg.update_decoded(decoded), agg.flush()])
+    print(unit, agg.stats, records[:3])
+    assert set(records['spn'].tolist()) <= agg.spns
+    assert (records['min'] <= records['mean']).all() and (records['mean'] <= records['max']).all()
+
+    # tumbling windows over a ramp
+    agg = johnypy.WindowAggregator(10.0)
+    records = np.concatenate([agg.update(1, np.arange(100.0), np.arange(100.0)), agg.flush()])
+    assert records['count'].tolist() == [10] * 10
+    assert records['last'].tolist() == list(range(9, 100, 10))
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+import sys
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+FRAMES = 20000
+
+# EEC1 and DM1 of source 0xfe, DM1 is longer than one frame and sent by BAM
+DBC_TEXT = '''VERSION ""
+
+BO_ 2364540158 EEC1: 8 Vector__XXX
+ SG_ EngSpeed : 24|16@1+ (0.125,0) [0|8031.875] "rpm" Vector__XXX
+ SG_ EngTorqueMode : 0|4@1+ (1,0) [0|15] "" Vector__XXX
+
+BO_ 2566834942 DM1: 14 Vector__XXX
+ SG_ LampStatus : 0|8@1+ (1,0) [0|255] "" Vector__XXX
+ SG_ ActiveSPN : 16|19@1+ (1,0) [0|524287] "" Vector__XXX
+
+BA_ "SPN" SG_ 2364540158 EngSpeed 190;
+BA_ "SPN" SG_ 2364540158 EngTorqueMode 899;
+BA_ "SPN" SG_ 2566834942 LampStatus 1213;
+BA_ "SPN" SG_ 2566834942 ActiveSPN 1214;
+'''
+
+
+def read_inline_dbc():
+    """Read DBC_TEXT through a temporary file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp).joinpath('inline.dbc')
+        path.write_text(DBC_TEXT)
+        return johnypy.DBCConverter().read_dbc_file(path)
+
+
+def bam_frames(start, payload, src=0x00):
+    """Return TP.CM BAM and TP.DT frames which transport payload as DM1"""
+    packets = -(-len(payload) // 7)
+    frames = [(start, 0x1cecff00 | src, bytes([32, len(payload), 0, packets, 0xff, 0xca, 0xfe, 0x00]))]
+    for seq in range(packets):
+        frames.append((start + (seq + 1) * 0.05, 0x1cebff00 | src,
+                       bytes([seq + 1]) + payload[seq * 7:seq * 7 + 7].ljust(7, b'\xff')))
+    return frames
+
+
+async def stand_in_server(frames):
+    """Serve frames as candump lines on a local tcp port"""
+    async def handle(reader, writer):
+        for ts, canid, data in frames:
+            writer.write(b'(%.6f) can0 %08X#%s\n' % (ts, canid, data.hex().upper().encode('ascii')))
+            await writer.drain()
+        writer.close()
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def decode_stream():
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 50, 6, 40)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+    frames = list(johnypy.SynthGenerator(0).frames(dbc, FRAMES, period=0.001))
+
+    values = []
+
+    async def collect(batch):
+        values.extend(batch)
+
+    async def slow(batch):
+        await asyncio.sleep(0.05)
+
+    pipeline = johnypy.DecodePipeline(dbc, queue_size=4)
+    pipeline.add_consumer(collect)
+    pipeline.add_consumer(slow, policy='drop')
+
+    server = await stand_in_server(frames)
+    reader, writer = await johnypy.open_stream(server.sockets[0].getsockname()[:2])
+    stats = await pipeline.run(johnypy.read_candump(reader))
+    writer.close()
+    server.close()
+
+    decoder = johnypy.DBCDecoder(dbc)
+    assert len(values) == sum(len(decoder.decode(canid, data) or ()) for _, canid, data in frames)
+    print(stats)
+    print(pipeline.rates())
+
+
+async def decode_filtered_transport():
+    dbc = read_inline_dbc()
+    payload = bytes([0x04, 0xff, 0x9e, 0x04, 0x03, 0x01, 0xbe, 0x04, 0x04, 0x01])
+    frames = bam_frames(0.0, payload) + [(0.3, 0x0cf00400, bytes(8))] + bam_frames(1.0, payload, 0x17)
+
+    values = []
+
+    async def collect(batch):
+        values.extend(batch)
+
+    reassembler = johnypy.TransportReassembler()
+    pipeline = johnypy.DecodePipeline(dbc, reassembler=reassembler,
+                                      frame_filter=johnypy.FrameFilter(pgns=[65226], sources=[0x00]))
+    pipeline.add_consumer(collect)
+    stats = await pipeline.run(johnypy.iter_chunks(frames))
+    print(stats, reassembler.stats)
+    # both DM1 are reassembled, EEC1 and the DM1 of source 0x17 are filtered afterwards
+    assert reassembler.stats['completed'] == 2 and stats['filtered'] == 2
+    assert sorted(spn for _, _, spn, _ in values) == [1213, 1214]
+    assert {spn: value for _, _, spn, value in values} == johnypy.DBCDecoder(dbc).decode(0x18feca00, payload)
+
+
+async def failing_stage():
+    dbc = read_inline_dbc()
+
+    class Broken():
+        def reassemble(self, frames):
+            raise RuntimeError('broken stage')
+
+    async def endless():
+        while True:
+            yield [(0.0, 0x0cf00400, bytes(8))]
+
+    pipeline = johnypy.DecodePipeline(dbc, queue_size=1, reassembler=Broken())
+    try:
+        await asyncio.wait_for(pipeline.run(endless()), 5)
+    except RuntimeError as err:
+        print('stage failure raised:', err)
+    else:
+        raise AssertionError('failing stage did not end the run')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(decode_filtered_transport())
+    asyncio.run(failing_stage())
+    asyncio.run(decode_stream())
@@ -0,0 +1,46 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    frames = [(0.1, 0x18fef100, b'\x01\x02\x03\x04\x05\x06\x07\x08'), (0.2, 0x0cf00400, b'\xff\xff'),
+              (0.3, 0x18fef117, b'\x0a'), (0.4, 0x123, b'')]
+    batch = johnypy.FrameBatch.from_frames(frames)
+    print(batch, batch.dlcs, batch.split_canids()['sa'])
+    assert list(batch.frames()) == frames
+
+    # tuple compatible unpacking, slices are views
+    stamps, canids, payloads = batch
+    assert batch[1] is canids and len(batch) == 4
+    head = batch[:2]
+    assert np.shares_memory(head.payloads, batch.payloads)
+    assert list(batch.filter(batch.canids > 0x7ff).frames()) == frames[:3]
+    assert list(johnypy.FrameBatch.concat([batch[2:], head]).frames()) == frames[2:] + frames[:2]
+    # single bools select rows like a mask, they are no tuple index
+    assert list(batch[True].frames()) == frames and len(batch[np.bool_(False)]) == 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp).joinpath('frames.bin')
+        batch.save(path)
+        batch.save(path, append=True)
+        mapped = johnypy.FrameBatch.load(path)
+        assert list(mapped.frames()) == frames * 2
+        assert list(mapped[::-1].sort().frames())[0] == frames[0]
+
+        path = Path(tmp).joinpath('empty.bin')
+        johnypy.FrameBatch.empty().save(path)
+        assert len(johnypy.FrameBatch.load(path)) == 0
+
+        capture = Path(tmp).joinpath('frames.pcap')
+        johnypy.SynthGenerator.write_pcap(capture, frames)
+        read = johnypy.FrameBatch.concat(johnypy.CaptureReader(capture).batches())
+        assert [frame[1:] for frame in read.frames()] == [frame[1:] for frame in frames]
@@ -0,0 +1,184 @@
+#!/usr/bin/python
+
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+# (pgns, signals per pgn, slots, frames) of the synthetic data
+SCALES = {
+    'small': (200, 8, 100, 100000),
+    'medium': (2000, 8, 400, 1000000),
+    'large': (8000, 8, 1000, 4000000)
+}
+
+# slowdown against the baseline which counts as regression
+TOLERANCE = 0.2
+
+
+def measure(func, repeat):
+    """Return best time of repeat runs and the peak traced memory of an extra run"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def has_pandas():
+    """Return True if the optional pandas engine is installed"""
+    try:
+        import pandas
+    except ImportError:
+        return False
+    return True
+
+
+def create_cases(tmp, scale, seed):
+    """Generate synthetic data into tmp, returns list of (name, func, count, unit)"""
+    pgns, signals, slots, count = SCALES[scale]
+    gen = johnypy.SynthGenerator(seed)
+    jfile, sfile = gen.write_j1939da(tmp, pgns, signals, slots)
+    with open(jfile, encoding='utf-8') as fd:
+        rows = sum(1 for _ in fd) - 1
+
+    dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+    frames = list(gen.frames(dbc, count))
+    pcap, log = Path(tmp).joinpath('traffic.pcap'), Path(tmp).joinpath('traffic.log')
+    gen.write_pcap(pcap, frames)
+    gen.write_candump(log, frames)
+    canids = [canid for _, canid, _ in frames]
+    batch = johnypy.FrameBatch.from_frames(frames)
+    stamps, ids, payloads = batch
+    decoder = johnypy.DBCDecoder(dbc)
+    encoder = johnypy.DBCEncoder(dbc)
+    values = {spn: stamps for spn in list(decoder.decode_batch(ids[:1000], payloads[:1000]))[:16]}
+    # read_dbc_file reads the dump of the synthetic dbc
+    dbc.dump_dbc(Path(tmp).joinpath('out.dbc'), True)
+
+    def decode():
+        for _, canid, data in frames:
+            decoder.decode(canid, data)
+
+    smap = johnypy.DBCConverter().vmap['slotMap']
+    slot_rows = [[str(row[smap[key]]) for key in ('idx', 'name', 'group', 'scale', 'limits', 'offset', 'length')]
+                 for row in gen.slot_rows(slots)]
+
+    def parse_slots():
+        for idx in range(count):
+            johnypy.dbc.DBCSlot(*slot_rows[idx % len(slot_rows)])
+
+    def parse_canids():
+        for canid in canids:
+            johnypy.PGN.parse_canid(canid)
+
+    def read_capture():
+        with johnypy.CaptureReader(pcap) as reader:
+            return sum(1 for _ in reader.batches())
+
+    def read_slots(engine):
+        con = johnypy.DBCConverter()
+        return lambda: con._read_slots(sfile, engine=engine)
+
+    engines = ['csv'] + (['pandas'] if has_pandas() else [])
+    cases = [('read_j1939da[%s]' % engine, lambda engine=engine: johnypy.DBCConverter().read_j1939da(
+        jfile, sfile, engine=engine), rows, 'rows') for engine in engines]
+    if has_pandas():
+        cases.append(('read_j1939da[columnar]', lambda: johnypy.DBCConverter().read_j1939da(
+            jfile, sfile, columnar=True), rows, 'rows'))
+    cases += [('_read_slots[%s]' % engine, read_slots(engine), slots, 'slots') for engine in engines]
+    cases += [
+        ('dump_dbc', lambda: dbc.dump_dbc(Path(tmp).joinpath('out.dbc'), True), len(dbc.msgs), 'msgs'),
+        ('read_dbc_file', lambda: johnypy.DBCConverter().read_dbc_file(Path(tmp).joinpath('out.dbc')),
+         len(dbc.msgs), 'msgs'),
+        ('DBCSlot', parse_slots, count, 'slots'),
+        ('PGN.parse_canid', parse_canids, count, 'canids'),
+        ('PGN.split_canids', lambda: johnypy.PGN.split_canids(ids), count, 'canids'),
+        ('DBCDecoder.decode', decode, count, 'frames'),
+        ('DBCDecoder.decode_batch', lambda: decoder.decode_batch(ids, payloads, stamps), count, 'frames'),
+        ('FrameBatch.filter', lambda: batch.filter(batch.canids & 0xff == canids[0] & 0xff), count, 'frames'),
+        ('DBCEncoder.encode_batch', lambda: encoder.encode_batch(ids, values), count, 'frames'),
+        ('CaptureReader.batches', read_capture, count, 'frames'),
+        ('CandumpReader.batches', lambda: sum(1 for _ in johnypy.CandumpReader(log).batches()), count, 'frames'),
+        ('ShardedDecoder.decode', lambda: johnypy.ShardedDecoder(dbc).decode(pcap), count, 'frames')
+    ]
+    return cases
+
+
+def compare(results, baseline, tolerance):
+    """Add baseline ratios to results, returns names of regressed cases"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        result['baseline'] = base['seconds']
+        result['ratio'] = result['seconds'] / base['seconds']
+        if result['ratio'] > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark johnypy on synthetic j1939 data')
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--filter', default='', help='only run cases containing this text')
+    parser.add_argument('--output', help='write json results, usable as later baseline')
+    parser.add_argument('--baseline', help='json results to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--profile', action='store_true', help='print the stage profile of every case')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    import numpy as np
+    report = {
+        'meta': {'scale': args.scale, 'seed': args.seed, 'repeat': args.repeat, 'python': platform.python_version(),
+                 'numpy': np.__version__, 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': {}
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, func, count, unit in create_cases(tmp, args.scale, args.seed):
+            if args.filter not in name:
+                continue
+            seconds, peak = measure(func, args.repeat)
+            report['results'][name] = {'seconds': seconds, 'count': count, 'unit': unit,
+                                       'throughput': count / seconds, 'peak_mb': peak / 1e6}
+            print('%-28s %10.4fs %14.0f %s/s %9.1f MB' % (name, seconds, count / seconds, unit, peak / 1e6))
+            if args.profile:
+                with johnypy.Profiler() as profiler:
+                    func()
+                print(profiler.report())
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as fd:
+            baseline = json.load(fd)
+        if baseline['meta']['scale'] != args.scale:
+            logging.warning('Baseline scale %s differs from %s' % (baseline['meta']['scale'], args.scale))
+        regressions = compare(report['results'], baseline, args.tolerance)
+        for name, result in report['results'].items():
+            if 'ratio' in result:
+                print('%-28s %6.2fx %s' % (name, result['ratio'], 'REGRESSION' if name in regressions else ''))
+        report['regressions'] = regressions
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fd:
+            json.dump(report, fd, indent=2)
+    sys.exit(1 if regressions else 0)
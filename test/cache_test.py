@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import subprocess
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+def dump(dbc):
+    """Return the dbc text of dbc"""
+    return ''.join(dbc.iter_dbc())
+
+
+def cached(cache_dir, jfile, sfile, **options):
+    """Convert with a new converter which must be served from cache_dir, returns (dbc text, slots)"""
+    converter = johnypy.DBCConverter()
+
+    def convert(*args):
+        raise AssertionError('Expected a cache hit')
+    converter._convert_j1939da = convert
+    dbc = converter.read_j1939da(jfile, sfile, cache_dir=cache_dir, **options)
+    return dump(dbc), {key: slot.pack() for key, slot in converter.slots.items()}
+
+
+# warm load in a fresh process, prints the dbc text and the imported heavy modules
+WARM_LOAD = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+import johnypy
+dbc = johnypy.DBCConverter().read_j1939da(sys.argv[2], sys.argv[3], cache_dir=sys.argv[4])
+sys.stdout.write(repr(sorted(name for name in ('pandas', 'numpy') if name in sys.modules)) + '\\n')
+sys.stdout.write(''.join(dbc.iter_dbc()))
+'''
+
+
+def warm_load(cache_dir, jfile, sfile):
+    """Load from cache_dir in a new interpreter, returns (dbc text, imported heavy modules)"""
+    output = subprocess.run([sys.executable, '-c', WARM_LOAD, str(libpath.resolve()), str(jfile), str(sfile),
+                             str(cache_dir)], check=True, capture_output=True, text=True).stdout
+    modules, text = output.split('\n', 1)
+    return text, modules
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(4).write_j1939da(Path(tmp).joinpath('csv'), 150, 6, 60)
+        cache_dir = Path(tmp).joinpath('cache')
+
+        for engine in ('pandas', 'csv'):
+            converter = johnypy.DBCConverter()
+            expected = dump(converter.read_j1939da(jfile, sfile, engine=engine))
+            slots = {key: slot.pack() for key, slot in converter.slots.items()}
+
+            converter = johnypy.DBCConverter()
+            assert dump(converter.read_j1939da(jfile, sfile, cache_dir=cache_dir, engine=engine)) == expected
+            assert len(list(cache_dir.glob('*.jdbc'))) == 1
+            # the cache holds the database and slots, whatever engine wrote it
+            for option in ({'engine': 'pandas'}, {'engine': 'csv'}, {'columnar': True}):
+                assert cached(cache_dir, jfile, sfile, **option) == (expected, slots), option
+            next(cache_dir.glob('*.jdbc')).unlink()
+        print(len(expected), 'bytes cached')
+
+        converter = johnypy.DBCConverter()
+        converter.read_j1939da(jfile, sfile, cache_dir=cache_dir)
+        keys = {converter._cache_key(jfile, sfile)}
+
+        # warm starts neither import pandas nor numpy
+        assert warm_load(cache_dir, jfile, sfile) == (expected, '[]')
+
+        # changed csv files and vmap invalidate the cache
+        for path, old, new, marker in ((jfile, 'Synthetic parameter group', 'Changed group', 'Changed group'),
+                                       (sfile, '5 m/bit', '7 m/bit', '(7.0000,')):
+            path.write_text(path.read_text().replace(old, new))
+            converter = johnypy.DBCConverter()
+            expected = dump(converter.read_j1939da(jfile, sfile))
+            assert marker in expected and converter._cache_key(jfile, sfile) not in keys, path
+            assert dump(johnypy.DBCConverter().read_j1939da(jfile, sfile, cache_dir=cache_dir)) == expected
+            assert cached(cache_dir, jfile, sfile)[0] == expected
+            keys.add(converter._cache_key(jfile, sfile))
+        assert len(list(cache_dir.glob('*.jdbc'))) == len(keys) == 3
+
+        converter = johnypy.DBCConverter()
+        converter.vmap['msgMap']['name'] = 'PGNAccro'
+        assert converter._cache_key(jfile, sfile) not in keys
+
+        # broken cache files are converted again and replaced
+        cpath = cache_dir.joinpath('%s.jdbc' % johnypy.DBCConverter()._cache_key(jfile, sfile))
+        cpath.write_bytes(b'broken')
+        assert dump(johnypy.DBCConverter().read_j1939da(jfile, sfile, cache_dir=cache_dir)) == expected
+        assert cached(cache_dir, jfile, sfile)[0] == expected
@@ -0,0 +1,143 @@
+#!/usr/bin/python
+
+import sys
+import struct
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+def can_frames(count):
+    """Return (timestamp, canid, dlc, data) frames of uniform runs, can fd, error and truncated frames"""
+    frames = []
+    for idx in range(count):
+        ts = 100 + idx * 0.001
+        if idx % 97 == 50:
+            # can fd frame of 64 bytes
+            frames.append((ts, 0x98feca00 | idx & 0xff, 64, bytes(range(64)), None))
+        elif idx % 89 == 40:
+            # error frame, dropped by the reader
+            frames.append((ts, 0x20000004, 8, bytes(8), None))
+        elif idx % 83 == 30:
+            # capture cut after 4 of 8 data bytes
+            frames.append((ts, 0x98fef100, 8, bytes([1, 2, 3, 4, 5, 6, 7, 8]), 12))
+        else:
+            frames.append((ts, (0x98f00400 | idx & 0xff) if idx % 3 else 0x123, idx % 9,
+                           bytes((idx + b) & 0xff for b in range(8)), None))
+    return frames
+
+
+def expected(frames):
+    """Return (canid, data) the reader yields for frames"""
+    result = []
+    for _, canid, dlc, data, caplen in frames:
+        if canid & 0x20000000:
+            continue
+        canid &= 0x1fffffff if canid & 0x80000000 else 0x7ff
+        dlc = min(dlc, len(data), 8 if caplen is None else caplen - 8)
+        result.append((canid, data[:dlc]))
+    return result
+
+
+def body(canid, dlc, data, caplen):
+    """Return socketcan record body, canid in network byte order"""
+    raw = struct.pack('>IBxxx', canid, dlc) + data
+    return raw if caplen is None else raw[:caplen]
+
+
+def write_pcap(path, frames, endian):
+    with open(path, 'wb') as fd:
+        fd.write(struct.pack(endian + 'IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 227))
+        for ts, canid, dlc, data, caplen in frames:
+            raw = body(canid, dlc, data, caplen)
+            fd.write(struct.pack(endian + 'IIII', int(ts), round(ts % 1 * 1e6), len(raw), len(raw)) + raw)
+
+
+def pcapng_block(endian, btype, content):
+    content += bytes(-len(content) % 4)
+    return struct.pack(endian + 'II', btype, len(content) + 12) + content + struct.pack(endian + 'I', len(content) + 12)
+
+
+def write_pcapng(path, frames, endian):
+    with open(path, 'wb') as fd:
+        for section in (frames[:len(frames) // 2], frames[len(frames) // 2:]):
+            fd.write(pcapng_block(endian, 0x0a0d0d0a, struct.pack(endian + 'IHHq', 0x1a2b3c4d, 1, 0, -1)))
+            # nanosecond interface, then a microsecond one for the records of odd canids
+            fd.write(pcapng_block(endian, 1, struct.pack(endian + 'HHI', 227, 0, 0) +
+                                  struct.pack(endian + 'HHBxxx', 9, 1, 9) + struct.pack(endian + 'HH', 0, 0)))
+            fd.write(pcapng_block(endian, 1, struct.pack(endian + 'HHI', 227, 0, 0)))
+            for idx, (ts, canid, dlc, data, caplen) in enumerate(section):
+                raw = body(canid, dlc, data, caplen)
+                ifid = 1 if idx % 211 > 180 else 0
+                ticks = round(ts * (1e6 if ifid else 1e9))
+                options = b''
+                if idx % 7 == 3:
+                    # epb_flags option makes the block longer than a uniform record
+                    options = struct.pack(endian + 'HHI', 2, 4, 1) + struct.pack(endian + 'HH', 0, 0)
+                fd.write(pcapng_block(endian, 6, struct.pack(endian + 'IIIII', ifid, ticks >> 32, ticks & 0xffffffff,
+                                                             len(raw), len(raw)) +
+                                      raw + bytes(-len(raw) % 4) + options))
+
+
+def check(path, frames):
+    with johnypy.CaptureReader(path) as reader:
+        assert reader.id_byteorder == 'big'
+        batches = list(reader.batches(100))
+        batch = johnypy.FrameBatch.concat(batches)
+        read = [frame[1:] for frame in batch.frames()]
+        assert read == expected(frames), path.name
+        assert np.allclose(batch.timestamps, [ts for ts, canid, *_ in frames if not canid & 0x20000000])
+        # frames keeps can fd payloads, batches truncate them to 8 bytes
+        assert [(canid, bytes(data[:8])) for _, canid, data in reader.frames()] == read
+        for count in (1, 3, 8, 50):
+            shards = reader.shards(count)
+            parts = [part for shard in shards for part in reader.read_shard(shard, 64)]
+            assert [frame[1:] for frame in johnypy.FrameBatch.concat(parts).frames()] == read, (path.name, count)
+        print(path.name, len(batch), 'frames in', len(batches), 'batches')
+
+
+if __name__ == "__main__":
+    frames = can_frames(2000)
+    with tempfile.TemporaryDirectory() as tmp:
+        for endian, name in (('<', 'le'), ('>', 'be')):
+            path = Path(tmp).joinpath('frames_%s.pcap' % name)
+            write_pcap(path, frames, endian)
+            check(path, frames)
+            path = Path(tmp).joinpath('frames_%s.pcapng' % name)
+            write_pcapng(path, frames, endian)
+            check(path, frames)
+
+        # alternating classic and can fd records never enter the uniform path
+        mixed = [(idx * 0.001, 0x98fef100, 64 if idx % 2 else 8, bytes(range(64 if idx % 2 else 8)), None)
+                 for idx in range(1000)]
+        path = Path(tmp).joinpath('mixed.pcap')
+        write_pcap(path, mixed, '<')
+        check(path, mixed)
+
+        # packet blocks with a length of 0 or beyond the end of the file are rejected
+        for blen in (0, 16, 64):
+            path = Path(tmp).joinpath('broken_%d.pcapng' % blen)
+            epb = pcapng_block('<', 6, struct.pack('<IIIII', 0, 0, 0, 16, 16) + body(0x98fef100, 8, bytes(8), None))
+            path.write_bytes(pcapng_block('<', 0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1)) +
+                             pcapng_block('<', 1, struct.pack('<HHI', 227, 0, 0)) +
+                             epb[:4] + struct.pack('<I', blen) + epb[8:])
+            for byteorder in (None, 'big'):
+                try:
+                    with johnypy.CaptureReader(path, byteorder) as reader:
+                        list(reader.batches(100))
+                except ValueError as err:
+                    print(path.name, err)
+                else:
+                    raise AssertionError('Expected invalid block length %d to fail' % blen)
+            with johnypy.CaptureReader(path, 'big') as reader:
+                try:
+                    list(reader.frames())
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError('Expected invalid block length %d to fail' % blen)
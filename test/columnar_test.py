@@ -0,0 +1,45 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+def dump(dbc):
+    """Return the dbc text of dbc"""
+    return ''.join(dbc.iter_dbc())
+
+
+def damage(line, idx):
+    """Blank prio and length of some rows like in real sheets"""
+    if idx % 5 == 0:
+        return line.replace('|3|8 bytes|', '|||').replace('|6|8 bytes|', '|||')
+    if idx % 7 == 0:
+        return line.replace('|8 bytes|', '|Variable|')
+    return line
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(1).write_j1939da(tmp, 300, 8, 120)
+        lines = Path(jfile).read_text().split('\n')
+        Path(jfile).write_text('\n'.join([lines[0]] + [damage(line, idx) for idx, line in enumerate(lines[1:], 1)]))
+
+        rows = dump(johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='pandas'))
+        columnar = dump(johnypy.DBCConverter().read_j1939da(jfile, sfile, columnar=True, engine='pandas'))
+        stdlib = dump(johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv'))
+        print(len(rows), 'bytes')
+        assert columnar == rows
+        assert stdlib == rows
+
+    try:
+        johnypy.DBCConverter().read_j1939da(jfile, sfile, columnar=True, engine='csv')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('columnar mode needs pandas')
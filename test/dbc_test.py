@@ -17,7 +17,14 @@ def convert_csv_to_dbc():
     dbc = con.read_j1939da(jfile, sfile)
     dbc.dump_dbc(home.joinpath('Downloads/JohnFear/dbcGeneration/johnFear.dbc'), True)
 
+def read_dbc():
+    home = Path.home()
+    con = johnypy.DBCConverter()
+    dbc = con.read_dbc_file(home.joinpath('Downloads/JohnFear/dbcGeneration/johnFear.dbc'))
+    dbc.dump_dbc(home.joinpath('Downloads/JohnFear/dbcGeneration/johnFearRead.dbc'), True)
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     convert_csv_to_dbc()
+    read_dbc()
     
\ No newline at end of file
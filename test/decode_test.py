@@ -0,0 +1,150 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+FRAMES = 5000
+
+# DM1 of 14 bytes with signals across and beyond bit 64 like transported messages
+DBC_TEXT = '''VERSION ""
+
+BO_ 2566834942 DM1: 14 Vector__XXX
+ SG_ LampStatus : 0|8@1+ (1,0) [0|255] "" Vector__XXX
+ SG_ ActiveSPN : 16|19@1+ (1,0) [0|524287] "" Vector__XXX
+ SG_ OccurrenceCount : 56|16@1+ (0.5,-2) [0|1000] "" Vector__XXX
+ SG_ SecondSPN : 64|19@1+ (1,0) [0|524287] "" Vector__XXX
+ SG_ SecondFMI : 83|5@1+ (1,3) [0|31] "" Vector__XXX
+
+BA_ "SPN" SG_ 2566834942 LampStatus 1213;
+BA_ "SPN" SG_ 2566834942 ActiveSPN 1214;
+BA_ "SPN" SG_ 2566834942 OccurrenceCount 1216;
+BA_ "SPN" SG_ 2566834942 SecondSPN 1217;
+BA_ "SPN" SG_ 2566834942 SecondFMI 1218;
+'''
+
+# signals of all byte orders, signs and scalings, big endian and signed signals are
+# read as unsigned little endian by read_dbc_file
+ORDERS_TEXT = '''VERSION ""
+
+BO_ 2364540158 EEC1: 8 Vector__XXX
+ SG_ Plain : 0|4@1+ (1,0) [0|15] "" Vector__XXX
+ SG_ Scaled : 24|16@1+ (0.125,0) [0|8031.875] "rpm" Vector__XXX
+ SG_ Offset : 16|8@1+ (1,-125) [-125|125] "%" Vector__XXX
+ SG_ Signed : 4|12@1- (0.5,-3) [-1024|1023] "" Vector__XXX
+ SG_ BigEndian : 47|16@0+ (0.01,10) [0|655.35] "" Vector__XXX
+ SG_ BigSigned : 63|8@0- (2,0) [-256|254] "" Vector__XXX
+ SG_ Full : 0|64@1+ (1,0) [0|1] "" Vector__XXX
+
+BA_ "SPN" SG_ 2364540158 Plain 1;
+BA_ "SPN" SG_ 2364540158 Scaled 2;
+BA_ "SPN" SG_ 2364540158 Offset 3;
+BA_ "SPN" SG_ 2364540158 Signed 4;
+BA_ "SPN" SG_ 2364540158 BigEndian 5;
+BA_ "SPN" SG_ 2364540158 BigSigned 6;
+BA_ "SPN" SG_ 2364540158 Full 7;
+'''
+
+# two signals of the same spn, the first one is decoded, the second one skipped
+DUPLICATE_TEXT = '''VERSION ""
+
+BO_ 2566844926 CCVS1: 8 Vector__XXX
+ SG_ WheelSpeed : 8|16@1+ (0.00390625,0) [0|250.996] "km/h" Vector__XXX
+ SG_ WheelSpeedCopy : 40|8@1+ (1,0) [0|250] "km/h" Vector__XXX
+ SG_ BrakeSwitch : 28|2@1+ (1,0) [0|3] "" Vector__XXX
+
+BA_ "SPN" SG_ 2566844926 WheelSpeed 84;
+BA_ "SPN" SG_ 2566844926 WheelSpeedCopy 84;
+BA_ "SPN" SG_ 2566844926 BrakeSwitch 597;
+'''
+
+
+def interpret(msg, data):
+    """Decode data bit by bit from the signal definitions as reference of the compiled decoders
+
+    Signals with bits beyond data and later signals of an already seen spn are not
+    part of the result.
+    """
+    values, spns = {}, set()
+    for sig in msg.signals:
+        if sig.spn in spns:
+            continue
+        spns.add(sig.spn)
+        if sig.pos + sig.slot.length > len(data) * 8:
+            continue
+        raw = 0
+        for bit in range(sig.slot.length):
+            idx = sig.pos + bit
+            if idx // 8 < len(data) and data[idx // 8] >> (idx % 8) & 1:
+                raw |= 1 << bit
+        values[sig.spn] = raw * sig.slot.scale + sig.slot.offset
+    return values
+
+
+def read_inline_dbc(text):
+    """Read dbc text through a temporary file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp).joinpath('inline.dbc')
+        path.write_text(text)
+        return johnypy.DBCConverter().read_dbc_file(path)
+
+
+def assert_batch_equals_scalar(dbc, batch):
+    """Check decode_batch against decode of every frame"""
+    decoder = johnypy.DBCDecoder(dbc)
+    expected = {}
+    for ts, canid, data in batch.frames():
+        for spn, value in (decoder.decode(canid, data.ljust(8, b'\x00')) or {}).items():
+            expected.setdefault(spn, ([], []))
+            expected[spn][0].append(ts)
+            expected[spn][1].append(value)
+    result = decoder.decode_batch(batch)
+    assert sorted(result) == sorted(expected)
+    for spn, (stamps, values) in expected.items():
+        order = np.argsort(stamps, kind='stable')
+        assert np.array_equal(result[spn][0], np.array(stamps)[order]), spn
+        assert np.array_equal(result[spn][1], np.array(values)[order]), spn
+    return result
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 50, 8, 60)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+    result = assert_batch_equals_scalar(dbc, johnypy.SynthGenerator(0).batch(dbc, FRAMES))
+    print('synthetic', len(result), 'spns')
+
+    # signals across and beyond bit 64 are not in 8 byte payloads, but in the whole message
+    dm1 = read_inline_dbc(DBC_TEXT)
+    result = assert_batch_equals_scalar(dm1, johnypy.SynthGenerator(1).batch(dm1, FRAMES))
+    print('dm1', {spn: values[:3] for spn, (_, values) in result.items()})
+    assert sorted(result) == [1213, 1214]
+    decode = johnypy.DBCDecoder(dm1).decode
+    assert sorted(decode(0x18fecaf1, bytes(14))) == [1213, 1214, 1216, 1217, 1218]
+    assert sorted(decode(0x18fecaf1, bytes(10))) == [1213, 1214, 1216]
+    assert decode(0x18fecaf1, bytes(8)) == {1213: 0.0, 1214: 0.0}
+    assert decode(0x18fecaf1, bytes(1)) == {1213: 0.0}
+
+    # decode and decode_batch keep the first signal of a duplicated spn
+    duplicate = read_inline_dbc(DUPLICATE_TEXT)
+    result = assert_batch_equals_scalar(duplicate, johnypy.SynthGenerator(3).batch(duplicate, FRAMES))
+    assert sorted(result) == [84, 597]
+    assert johnypy.DBCDecoder(duplicate).decode(0x18fef1fe, bytes([0, 0, 1, 0, 0, 255, 0, 0])) == \
+        {84: 1.0, 597: 0.0}
+
+    # compiled decoders match the interpreted signal definitions for short, full and long payloads
+    orders = read_inline_dbc(ORDERS_TEXT)
+    dbcs = (orders, dm1, duplicate, dbc)
+    for source in dbcs:
+        for msg in source.msgs:
+            decode = johnypy.DBCDecoder.compile_message(msg)
+            for data in [bytes(8), b'\xff' * 8, bytes([0x81]), b'\xff' * 14] + \
+                    [frame[2] for frame in johnypy.SynthGenerator(2).frames(source, 20)]:
+                assert decode(data) == interpret(msg, data), (msg.abbr, data)
+    print('compiled', sum(len(msg.signals) for source in dbcs for msg in source.msgs), 'signals')
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+
+import io
+import sys
+import socket
+import tempfile
+import threading
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+from johnypy.dbc import dbcconst
+
+
+def dump_in_memory(dbc):
+    """Return the dbc text accumulated section by section like dump_dbc did before streaming"""
+    payload_parts = {'value': '\n', 'comment': '\n', 'atrribute': '\n'}
+    for msg in dbc.msgs:
+        mvalue, mcomment, _ = msg.dbcfy()
+        payload_parts['value'] += mvalue
+        payload_parts['comment'] += mcomment
+        for sig in msg.signals:
+            svalue, scomment, sattribute = sig.dbcfy()
+            payload_parts['value'] += svalue
+            payload_parts['comment'] += scomment
+            payload_parts['atrribute'] += sattribute
+    return dbcconst['header'] + payload_parts['value'] + payload_parts['comment'] + \
+        dbcconst['attributeDef'] + payload_parts['atrribute'] + 'BA_ "DBName" "johnFear";' + dbcconst['footer']
+
+
+def dump_socket(dbc, chunk_size):
+    """Return the dbc text received from dump_dbc into a socket"""
+    rx, tx = socket.socketpair()
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(iter(lambda: rx.recv(1 << 16), b'')))
+    reader.start()
+    dbc.dump_dbc(tx, chunk_size=chunk_size)
+    tx.close()
+    reader.join()
+    rx.close()
+    return b''.join(received).decode('utf-8')
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(2).write_j1939da(tmp, 150, 6, 60)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile)
+        expected = dump_in_memory(dbc)
+        print(len(expected), 'bytes')
+        assert ''.join(dbc.iter_dbc()) == expected
+        assert ''.join(dbc.iter_dbc(johnypy.DBC.dbcfy_msg)) == expected
+
+        for chunk_size in (1, 7, 4096, johnypy.DBC.CHUNK_SIZE):
+            path = dbc.dump_dbc(Path(tmp).joinpath('%d.dbc' % chunk_size), chunk_size=chunk_size)
+            assert path.read_text(encoding='utf-8') == expected, chunk_size
+
+            text = io.StringIO()
+            dbc.dump_dbc(text, chunk_size=chunk_size)
+            assert text.getvalue() == expected, chunk_size
+
+            binary = io.BytesIO()
+            dbc.dump_dbc(binary, chunk_size=chunk_size, fragments=johnypy.DBC.dbcfy_msg)
+            assert binary.getvalue().decode('utf-8') == expected, chunk_size
+
+            assert dump_socket(dbc, chunk_size) == expected, chunk_size
+
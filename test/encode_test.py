@@ -0,0 +1,38 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 20, 4, 20)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+
+    encoder, decoder = johnypy.DBCEncoder(dbc), johnypy.DBCDecoder(dbc)
+    msg = dbc.msgs[0]
+    canid = msg.calc_canid(0x17)
+    sig = msg.signals[0]
+    value = sig.slot.offset + sig.slot.scale * 3
+
+    data = encoder.encode(canid, {sig.spn: value})
+    print(msg.abbr, sig.spn, data.hex())
+    assert decoder.decode(canid, data)[sig.spn] == value
+    assert encoder.encode(canid, {}) == b'\xff' * 8
+
+    stamps = np.arange(1000) * 0.01
+    values = {sig.spn: np.linspace(sig.slot.offset, sig.slot.offset + sig.slot.scale * 200, 1000)}
+    values[sig.spn][::10] = np.nan
+    batch = encoder.encode_frames(canid, stamps, values)
+    times, decoded = decoder.decode_batch(batch[1], batch[2], batch[0])[sig.spn]
+    valid = ~np.isnan(values[sig.spn])
+    assert np.allclose(decoded[valid], values[sig.spn][valid], atol=sig.slot.scale / 2)
+    assert all(encoder.encode(canid, {sig.spn: values[sig.spn][idx]}) == batch[2][idx].tobytes()
+               for idx in range(1000))
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+
+import sys
+import time
+import logging
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+FRAMES = 200000
+
+# EEC1, ET1 and CCVS of source 0xfe
+# signals named like the timestamp and source columns of the tables
+DBC_TEXT = '''VERSION ""
+
+BO_ 2364540158 EEC1: 8 Vector__XXX
+ SG_ EngTorqueMode : 0|4@1+ (1,0) [0|15] "" Vector__XXX
+ SG_ ActualEngPercentTorque : 16|8@1+ (1,-125) [-125|125] "%" Vector__XXX
+ SG_ EngSpeed : 24|16@1+ (0.125,0) [0|8031.875] "rpm" Vector__XXX
+
+BO_ 2566844414 ET1: 8 Vector__XXX
+ SG_ EngCoolantTemp : 0|8@1+ (1,-40) [-40|210] "degC" Vector__XXX
+ SG_ EngOilTemp1 : 16|16@1+ (0.03125,-273) [-273|1734.96875] "degC" Vector__XXX
+
+BO_ 2566845694 CCVS: 8 Vector__XXX
+ SG_ WheelBasedVehicleSpeed : 8|16@1+ (0.00390625,0) [0|250.996] "km/h" Vector__XXX
+ SG_ source : 24|2@1+ (1,0) [0|3] "" Vector__XXX
+ SG_ timestamp : 32|8@1+ (1,0) [0|250] "s" Vector__XXX
+
+BA_ "SPN" SG_ 2364540158 EngTorqueMode 899;
+BA_ "SPN" SG_ 2364540158 ActualEngPercentTorque 513;
+BA_ "SPN" SG_ 2364540158 EngSpeed 190;
+BA_ "SPN" SG_ 2566844414 EngCoolantTemp 110;
+BA_ "SPN" SG_ 2566844414 EngOilTemp1 175;
+BA_ "SPN" SG_ 2566845694 WheelBasedVehicleSpeed 84;
+BA_ "SPN" SG_ 2566845694 source 595;
+BA_ "SPN" SG_ 2566845694 timestamp 596;
+'''
+
+
+def by_spn(spns, stamps, values):
+    """Split long columns into spn -> (timestamps, values) in row order"""
+    return {spn: (stamps[spns == spn], values[spns == spn]) for spn in np.unique(spns).tolist()}
+
+
+def assert_decoded(result, expected):
+    assert sorted(result) == sorted(expected)
+    for spn, (stamps, values) in expected.items():
+        assert np.array_equal(result[spn][0], stamps) and np.array_equal(result[spn][1], values), spn
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp).joinpath('inline.dbc')
+        path.write_text(DBC_TEXT)
+        dbc = johnypy.DBCConverter().read_dbc_file(path)
+    # frames of unknown messages are counted and skipped
+    unknown = johnypy.FrameBatch.from_frames([(2e9, 0x18ffff00, bytes(8))])
+    batch = johnypy.FrameBatch.concat([johnypy.SynthGenerator(0).batch(dbc, FRAMES, period=0.001), unknown])
+    stamps, canids, payloads = batch
+
+    decoder = johnypy.DBCDecoder(dbc)
+    decoded = decoder.decode_batch(batch)
+    expected = sum(values.shape[0] for _, values in decoded.values())
+    sigs = {sig.spn: sig for msg in dbc.msgs for sig in msg.signals}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for path, layout in ((tmp.joinpath('long.parquet'), 'long'), (tmp.joinpath('long.arrow'), 'long'),
+                             (tmp.joinpath('wide'), 'wide')):
+            with johnypy.SignalWriter(dbc, path, layout, row_group_size=1 << 16) as writer:
+                for idx in range(0, len(batch), 1 << 14):
+                    writer.write_batch(batch[idx:idx + (1 << 14)])
+            print(path.name, writer.stats)
+            assert writer.stats['values'] == expected and writer.stats['unknown'] == 1
+
+        # long tables hold the decoded values, names and units of every spn
+        for table in (pq.read_table(tmp.joinpath('long.parquet')),
+                      pa.ipc.open_file(tmp.joinpath('long.arrow')).read_all()):
+            assert table.num_rows == expected
+            columns = {name: table.column(name).to_numpy() for name in ('timestamp', 'source', 'spn', 'value')}
+            assert_decoded(by_spn(columns['spn'], columns['timestamp'], columns['value']), decoded)
+            assert np.array_equal(columns['source'], canids[np.searchsorted(stamps, columns['timestamp'])] & 0xff)
+            names = table.column('name').to_pylist()
+            units = table.column('unit').to_pylist()
+            assert all(names[idx] == str(sigs[spn].name) and units[idx] == str(sigs[spn].slot.unit)
+                       for idx, spn in enumerate(columns['spn'].tolist()))
+
+        # wide tables hold one column per spn of their message
+        result = {}
+        for path in sorted(tmp.joinpath('wide').iterdir()):
+            table = pq.read_table(path)
+            assert len(set(table.schema.names)) == len(table.schema.names), table.schema.names
+            if path.name.startswith('CCVS'):
+                assert table.schema.names[-2:] == ['source_595', 'timestamp_596']
+            for field in table.schema:
+                if field.metadata:
+                    spn = int(field.metadata[b'spn'])
+                    assert field.metadata[b'unit'].decode() == str(sigs[spn].slot.unit)
+                    result[spn] = (table.column('timestamp').to_numpy(), table.column(field.name).to_numpy())
+        assert_decoded(result, decoded)
+
+        start = time.perf_counter()
+        pq.read_table(tmp.joinpath('long.parquet')).to_pandas().to_csv(tmp.joinpath('long.csv'), index=False)
+        print('csv write: %.2fs' % (time.perf_counter() - start))
+        for name in ('long.parquet', 'long.arrow', 'long.csv'):
+            print('%s: %.1f MB' % (name, tmp.joinpath(name).stat().st_size / 1e6))
+        print('wide: %.1f MB' % (sum(path.stat().st_size for path in tmp.joinpath('wide').iterdir()) / 1e6))
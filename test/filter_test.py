@@ -0,0 +1,28 @@
+#!/usr/bin/python
+
+import sys
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    canids = [0x18fef100, 0x18fef117, 0x0cf00400, 0x18ea00f9, 0x18eaff00, 0x123]
+
+    ffilter = johnypy.FrameFilter(pgns=[65265, 59904])
+    print([ffilter.match(canid) for canid in canids])
+    assert [ffilter.match(canid) for canid in canids] == [True, True, False, True, True, False]
+
+    ffilter = johnypy.FrameFilter(pgns=[(61440, 65535)], sources=[0x00], priorities=[3, 6])
+    print(ffilter.mask(canids))
+    assert ffilter.mask(canids).tolist() == [True, False, True, False, False, False]
+
+    fan = johnypy.FilterFanOut()
+    fan.add(johnypy.FrameFilter(sources=[0x17]), lambda ts, ids, data: print('source 0x17:', ids))
+    fan.add(johnypy.FrameFilter(pgns=[59904]), lambda ts, ids, data: print('request:', ids))
+    stamps = np.arange(len(canids), dtype=np.float64)
+    print(fan.run([(stamps, np.array(canids, dtype=np.uint32), np.zeros((len(canids), 8), dtype=np.uint8))]))
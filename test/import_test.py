@@ -0,0 +1,31 @@
+#!/usr/bin/python
+
+import sys
+import subprocess
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+
+# import time target for the pandas/numpy free core in seconds
+TARGET = 0.15
+
+SCRIPT = '''
+import sys, time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+import johnypy
+print(time.perf_counter() - start, 'pandas' in sys.modules, 'numpy' in sys.modules)
+'''
+
+
+if __name__ == "__main__":
+    runs = []
+    for _ in range(5):
+        out = subprocess.run([sys.executable, '-c', SCRIPT % str(libpath.resolve())],
+                             capture_output=True, text=True, check=True).stdout.split()
+        runs.append(float(out[0]))
+        print('import johnypy: %.4fs pandas: %s numpy: %s' % (runs[-1], out[1], out[2]))
+        assert out[1] == 'False' and out[2] == 'False', 'Heavy modules imported by johnypy'
+
+    print('best: %.4fs target: %.4fs' % (min(runs), TARGET))
+    assert min(runs) < TARGET, 'Import time target exceeded'
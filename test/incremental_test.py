@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+def full(jfile, sfile):
+    """Return dbc text of the serial conversion"""
+    return ''.join(johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv').iter_dbc())
+
+
+def update(state, jfile, sfile):
+    """Return (dbc text, changes) of an incremental update from the state file"""
+    converter = johnypy.IncrementalConverter(state)
+    dbc = converter.update_j1939da(jfile, sfile)
+    out = io.StringIO()
+    converter.dump_dbc(dbc, out)
+    return out.getvalue(), converter.changes, converter
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        state = tmp.joinpath('state.pkl')
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 100, 6, 60)
+        text, changes, _ = update(state, jfile, sfile)
+        assert text == full(jfile, sfile) and len(changes['added']) == 100
+
+        # unchanged sheets reuse every group
+        text, changes, _ = update(state, jfile, sfile)
+        assert text == full(jfile, sfile) and changes == {'added': [], 'changed': [], 'removed': []}
+
+        # change a signal name, a slot used by some groups and remove the last pgn
+        lines = Path(jfile).read_text().rstrip('\n').split('\n')
+        pgn = lines[-1].split('|')[0]
+        lines = [line for line in lines if line.split('|')[0] != pgn]
+        lines[3] = lines[3].replace('Synthetic signal', 'Renamed signal')
+        Path(jfile).write_text('\n'.join(lines) + '\n')
+        slots = Path(sfile).read_text().split('\n')
+        slots[5] = slots[5].replace('Type', 'Kind')
+        Path(sfile).write_text('\n'.join(slots))
+        text, changes, converter = update(state, jfile, sfile)
+        print(changes)
+        assert text == full(jfile, sfile)
+        assert changes['removed'] == [int(pgn)] and changes['changed'] and not changes['added']
+
+        # messages of other dbc instances never get the cached fragments
+        other = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+        other.msgs[0].signals.pop()
+        out = io.StringIO()
+        converter.dump_dbc(other, out)
+        assert out.getvalue() == ''.join(other.iter_dbc())
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+
+import sys
+import random
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+from johnypy.dbc import DBC, DBCMessage, DBCSignal
+
+
+def scan_pgn(dbc, pgn):
+    """Return first message with pgn by a linear scan"""
+    return next((msg for msg in dbc.msgs if msg.pgn == pgn), None)
+
+
+def scan_canid(dbc, canid):
+    """Return first message for canid by a linear scan"""
+    key = DBC.message_key(canid)
+    return next((msg for msg in dbc.msgs if DBC.message_key(msg.calc_canid()) == key), None)
+
+
+def scan_spn(dbc, spn):
+    """Return all signals with spn by a linear scan"""
+    return [sig for msg in dbc.msgs for sig in msg.signals if sig.spn == spn]
+
+
+def scan_name(dbc, name):
+    """Return all messages and signals with name by a linear scan"""
+    found = []
+    for msg in dbc.msgs:
+        if msg.abbr == name:
+            found.append(msg)
+        found.extend(sig for sig in msg.signals if sig.name == name)
+    return found
+
+
+def check(dbc, rnd):
+    """Compare all indexed lookups of dbc against linear scans, including unknown keys"""
+    pgns = [msg.pgn for msg in dbc.msgs] + [0, 0x1ffff]
+    canids = [msg.calc_canid() | rnd.randrange(0x100) | rnd.randrange(8) << 26 for msg in dbc.msgs] + [0x7ff]
+    spns = [sig.spn for msg in dbc.msgs for sig in msg.signals] + [-1]
+    names = [msg.abbr for msg in dbc.msgs] + [sig.name for msg in dbc.msgs for sig in msg.signals] + ['unknown']
+    for pgn in pgns:
+        assert dbc.find_pgn(pgn) is scan_pgn(dbc, pgn), pgn
+    for canid in canids:
+        assert dbc.find_canid(canid) is scan_canid(dbc, canid), hex(canid)
+    for spn in spns:
+        assert dbc.find_spn(spn) == scan_spn(dbc, spn), spn
+    for name in names:
+        assert dbc.find_name(name) == scan_name(dbc, name), name
+    return len(pgns) + len(canids) + len(spns) + len(names)
+
+
+if __name__ == "__main__":
+    rnd = random.Random(9)
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(3).write_j1939da(tmp, 200, 6, 80)
+        converter = johnypy.DBCConverter()
+        dbc = converter.read_j1939da(jfile, sfile)
+        print('converted', check(dbc, rnd), 'lookups')
+
+        # duplicated pgns and signals, the first added one is found
+        for msg in rnd.sample(dbc.msgs, 20):
+            slots = [sig.slot for sig in msg.signals]
+            dbc.add_msg(DBCMessage.unpack(msg.pack({id(slot): idx for idx, slot in enumerate(slots)}), slots))
+        for msg in rnd.sample(dbc.msgs, 10):
+            dbc.add_signal(msg, DBCSignal.from_parsed(
+                msg.signals[0].spn, 48, msg.signals[0].name, 'copy', msg.signals[0].slot))
+        print('duplicated', check(dbc, rnd), 'lookups')
+
+        for msg in rnd.sample(dbc.msgs, 40):
+            dbc.remove_msg(msg)
+        print('removed', check(dbc, rnd), 'lookups')
+
+        path = dbc.dump_dbc(Path(tmp).joinpath('index.dbc'))
+        spn = dbc.msgs[0].signals[0].spn
+        for lazy in (False, True):
+            read = converter.read_dbc_file(path, lazy=lazy)
+            assert [sig.name for sig in read.find_spn(spn)] == [sig.name for sig in dbc.find_spn(spn)]
+            print('read lazy=%s' % lazy, check(read, rnd), 'lookups')
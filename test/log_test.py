@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+import sys
+import time
+import logging
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+CANDUMP = b'''(1600000000.000100) can0 18FEF100#0102030405060708
+(1600000000.000200) can0 0CF00400#FFFF
+(1600000000.000300) can0 123#
+(1600000000.000400) can0 18FEF1001#0102
+(1600000000.000500) can0 18FEF100#01
+(1600000000.000600) can0 18FEF100#0A0B0C0D0E0F1011
+'''
+
+ASC = b'''date Mon Oct 19 10:00:00 2020
+base hex  timestamps absolute
+   0.000100 1  18FEF100x       Rx   d 8 01 02 03 04 05 06 07 08
+   0.000200 1  CF00400x        Rx   d 2 FF FF
+   0.000300 1  123             Rx   d 1 7
+   0.000400 1  ErrorFrame
+   0.000500 1  18FEF100x       Rx   d 8 0A 0B 0C 0D 0E 0F 10 11
+'''
+
+# relative timestamps are deltas to the previous event, frame or not
+ASC_RELATIVE = b'''date Mon Oct 19 10:00:00 2020
+base hex  timestamps relative
+Begin Triggerblock Mon Oct 19 10:00:00 2020
+   0.000000 Start of measurement
+   0.100000 1  18FEF100x       Rx   d 8 01 02 03 04 05 06 07 08
+   0.200000 1  ErrorFrame
+   0.300000 CAN 1 Status:chip status error active
+   0.400000 1  18FEF100x       Rx   d 8 0A 0B 0C 0D 0E 0F 10 11
+   0.500000 1  CF00400x        Rx   d 2 FF FF
+End TriggerBlock
+'''
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text in (('test.log', CANDUMP), ('test.asc', ASC)):
+            path = Path(tmp).joinpath(name)
+            path.write_bytes(text)
+
+            reader = johnypy.open_log(path)
+            frames = list(reader.frames())
+            print(frames, reader.stats)
+            assert frames[0][1:] == (0x18fef100, bytes(range(1, 9)))
+
+            reader = johnypy.open_log(path, pgns=[65265])
+            assert [canid for _, canid, _ in reader.frames()] == [0x18fef100] * (len(frames) - 2)
+
+        path = Path(tmp).joinpath('relative.asc')
+        path.write_bytes(ASC_RELATIVE)
+        stamps = [round(ts, 9) for ts, _, _ in johnypy.open_log(path).frames()]
+        print(stamps)
+        assert stamps == [0.1, 1.0, 1.5]
+
+    try:
+        johnypy.LogReader(__file__)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('LogReader is abstract')
+
+    home = Path.home()
+    for path in sorted(home.joinpath('Downloads/JohnFear/logs').glob('*')):
+        if path.suffix.lower() not in ('.log', '.asc'):
+            continue
+        start = time.perf_counter()
+        reader = johnypy.open_log(path)
+        count = sum(stamps.size for stamps, _, _ in reader.batches())
+        elapsed = time.perf_counter() - start
+        print('%s: %d frames %.1f MB/s %s' % (path.name, count, path.stat().st_size / elapsed / 1e6, reader.stats))
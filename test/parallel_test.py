@@ -0,0 +1,33 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+def dump(dbc):
+    """Return the dbc text of dbc"""
+    return ''.join(dbc.iter_dbc())
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 200, 6, 80)
+        # missing prio and length of some pgns
+        lines = Path(jfile).read_text().split('\n')
+        Path(jfile).write_text('\n'.join(line.replace('|6|8 bytes|', '|||') if idx % 5 == 0 else line
+                                         for idx, line in enumerate(lines)))
+
+        for options in ({'engine': 'csv'}, {'engine': 'pandas'}, {'engine': 'pandas', 'columnar': True}):
+            serial = dump(johnypy.DBCConverter().read_j1939da(jfile, sfile, **options))
+            parallel = dump(johnypy.ParallelConverter(workers=2).read_j1939da(jfile, sfile, **options))
+            print(options, len(serial), 'bytes')
+            assert parallel == serial, options
+
+        many = johnypy.ParallelConverter(workers=2).read_many([(jfile, sfile)] * 2, columnar=True, engine='pandas')
+        assert [dump(dbc) for dbc in many] == [serial] * 2
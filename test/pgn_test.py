@@ -18,3 +18,8 @@ if __name__ == "__main__":
 
     pgn = johnypy.PGN.from_canid(0x18ff0900)
     print(pgn)
+
+    cache = johnypy.CanIdCache()
+    print(cache.get(0x18ff0900) is cache.get(0x18ff0900))
+
+    print(johnypy.PGN.split_canids([0x18ff0900, 0x0cea17f9]))
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 60, 6, 60)
+        # unknown range and offset notations, missing prio and missing or variable length of some pgns
+        text = Path(sfile).read_text().replace('0 to 250 per byte', 'see table').replace('-125 %|', 'n/a|')
+        Path(sfile).write_text(text)
+        lines = Path(jfile).read_text().split('\n')
+        lines = [line.replace('|6|8 bytes|', '|||') if idx % 5 == 0 else
+                 line.replace('|8 bytes|', '|Variable|') if idx % 7 == 0 else line for idx, line in enumerate(lines)]
+        Path(jfile).write_text('\n'.join(lines))
+        # the length of a message is taken from the first row of its pgn
+        lengths = {}
+        for line in lines[1:]:
+            if line:
+                lengths.setdefault(line.split('|')[0], line.split('|')[3])
+
+        counters = []
+        for options in ({'engine': 'csv'}, {'engine': 'pandas'}, {'engine': 'pandas', 'columnar': True}):
+            with johnypy.Profiler() as profiler:
+                johnypy.DBCConverter().read_j1939da(jfile, sfile, **options)
+            print(options, profiler.counters)
+            counters.append(profiler.counters)
+
+    # fallbacks are counted per row, independent of the parsing engine
+    assert counters[0] == counters[1] == counters[2]
+    assert all(counters[0]['fallback.%s' % name] for name in ('range', 'scale', 'offset', 'prio', 'msg_length'))
+    assert counters[0]['fallback.msg_length'] == sum(length in ('', 'Variable') for length in lengths.values())
+
+    # parse_many parses distinct values once but counts every fallback value
+    with johnypy.Profiler() as profiler:
+        values = johnypy.fields.parse_scale.parse_many(['Binary', '1 %/bit', 'Binary', 'Binary'])
+    assert values == [1, 1.0, 1, 1] and profiler.counters == {'fallback.scale': 3}
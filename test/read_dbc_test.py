@@ -0,0 +1,30 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(5).write_j1939da(tmp, 300, 8, 120)
+        converter = johnypy.DBCConverter()
+        dbc = converter.read_j1939da(jfile, sfile)
+        path = dbc.dump_dbc(Path(tmp).joinpath('synthetic.dbc'))
+        expected = path.read_bytes()
+
+        for lazy in (False, True):
+            read = converter.read_dbc_file(path, lazy=lazy)
+            assert len(read.msgs) == len(dbc.msgs)
+            again = read.dump_dbc(Path(tmp).joinpath('again_%s.dbc' % lazy))
+            print('lazy=%s' % lazy, len(read.msgs), 'messages', len(expected), 'bytes')
+            assert again.read_bytes() == expected, lazy
+
+            # a second round trip is stable as well
+            assert converter.read_dbc_file(again, lazy=lazy).dump_dbc(
+                Path(tmp).joinpath('twice_%s.dbc' % lazy)).read_bytes() == expected, lazy
@@ -0,0 +1,32 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        gen = johnypy.SynthGenerator(0)
+        jfile, sfile = gen.write_j1939da(tmp, 50, 8, 40)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+        frames = list(gen.frames(dbc, 50000))
+        pcap, log = Path(tmp).joinpath('traffic.pcap'), Path(tmp).joinpath('traffic.log')
+        gen.write_pcap(pcap, frames)
+        gen.write_candump(log, frames)
+
+        for path, reader in ((pcap, johnypy.CaptureReader(pcap)), (log, johnypy.CandumpReader(log))):
+            stamps, canids, payloads = (np.concatenate(column) for column in zip(*reader.batches()))
+            expected = johnypy.DBCDecoder(dbc).decode_batch(canids, payloads, stamps)
+            decoder = johnypy.ShardedDecoder(dbc, workers=2)
+            result = decoder.decode(path)
+            print(path.name, decoder.stats)
+            assert result.keys() == expected.keys()
+            for spn, (times, values) in expected.items():
+                assert np.array_equal(result[spn][0], times) and np.array_equal(result[spn][1], values)
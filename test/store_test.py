@@ -0,0 +1,50 @@
+#!/usr/bin/python
+
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        jfile, sfile = johnypy.SynthGenerator(0).write_j1939da(tmp, 20, 4, 20)
+        dbc = johnypy.DBCConverter().read_j1939da(jfile, sfile, engine='csv')
+
+    msg = dbc.msgs[0]
+    sig = msg.signals[0]
+    encoder = johnypy.DBCEncoder(dbc)
+    store = johnypy.SignalStore(dbc, capacity=100)
+    changes = []
+    store.subscribe(lambda *args: changes.append(args), spns=[sig.spn], deadband=sig.slot.scale * 5)
+
+    # two sources send a ramp of 1000 values in one batch
+    stamps = np.repeat(np.arange(1000) * 0.1, 2)
+    canids = np.tile(np.array([msg.calc_canid(0x00), msg.calc_canid(0x17)], dtype=np.uint32), 1000)
+    raw = np.repeat(np.arange(1000) % 50, 2)
+    payloads = encoder.encode_batch(canids, {sig.spn: sig.slot.offset + sig.slot.scale * raw})
+    store.update_batch(stamps, canids, payloads)
+
+    print(store.stats, len(store), store.sources(sig.spn))
+    assert store.latest(sig.spn, 0x17) == (stamps[-1], sig.slot.offset + sig.slot.scale * 49)
+    times, values = store.history(sig.spn, 0x00)
+    assert times.shape[0] == 100 and times[0] == stamps[1800]
+    # every ramp crosses the deadband 8 times and drops back once
+    assert len(changes) == 2 * 20 * 9
+
+    store.update_frame(1000.0, msg.calc_canid(0x00), encoder.encode(msg.calc_canid(0x00), {sig.spn: sig.slot.offset}))
+    assert store.latest(sig.spn) == (1000.0, sig.slot.offset)
+
+    # payloads of another shape than (n, 8) are rejected
+    for bad in (payloads[:, :4], payloads[:10], payloads.ravel()):
+        try:
+            store.update_batch(stamps, canids, bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('Expected payloads of shape %s to fail' % (bad.shape,))
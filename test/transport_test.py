@@ -0,0 +1,90 @@
+#!/usr/bin/python
+
+import sys
+from pathlib import Path
+
+libpath = Path('.').joinpath('../')
+sys.path.insert(0, str(libpath.resolve()))
+
+import johnypy
+
+# DM1 of source 0x00 with two dtcs, 10 bytes in 2 packets
+DM1 = bytes([0x04, 0xff, 0x9e, 0x04, 0x03, 0x01, 0xbe, 0x04, 0x04, 0x01])
+# pdu1 pgn 0xd900 from 0x00 to 0xf9, 20 bytes in 3 packets
+PDU1 = bytes(range(20))
+
+
+def connect(control, src, dst, size, packets, pgn):
+    """Return TP.CM frame without timestamp"""
+    return 0x1cec0000 | (dst << 8) | src, bytes([control, size & 0xff, size >> 8, packets, 0xff,
+                                                 pgn & 0xff, (pgn >> 8) & 0xff, pgn >> 16])
+
+
+def packet(src, dst, payload, seq):
+    """Return TP.DT frame of packet seq of payload without timestamp"""
+    return 0x1ceb0000 | (dst << 8) | src, bytes([seq]) + payload[(seq - 1) * 7:seq * 7].ljust(7, b'\xff')
+
+
+def run(frames):
+    """Reassemble (timestamp, (canid, data)) frames with a new reassembler, returns (messages, stats)"""
+    reassembler = johnypy.TransportReassembler()
+    messages = list(reassembler.reassemble((ts, canid, data) for ts, (canid, data) in frames))
+    return messages, reassembler.stats
+
+
+if __name__ == "__main__":
+    # bam, single frames pass through unchanged
+    single = (0.05, 0x0cf00400, bytes(8))
+    messages, stats = run([(0.0, connect(32, 0x00, 0xff, 10, 2, 0xfeca)), (0.05, (single[1], single[2])),
+                           (0.1, packet(0x00, 0xff, DM1, 1)), (0.2, packet(0x00, 0xff, DM1, 2))])
+    print('bam', messages, stats)
+    assert messages == [single, (0.2, 0x1cfeca00, DM1)] and stats['completed'] == 1
+
+    # rts/cts to a destination, the reassembled pdu1 canid carries it
+    rts = [(0.0, connect(16, 0x00, 0xf9, 20, 3, 0xd900)), (0.01, connect(17, 0xf9, 0x00, 0, 3, 0xd900))]
+    data = [(0.02 + seq * 0.01, packet(0x00, 0xf9, PDU1, seq)) for seq in (1, 2, 3)]
+    messages, stats = run(rts + data + [(0.1, connect(19, 0xf9, 0x00, 20, 3, 0xd900))])
+    print('rts/cts', messages, stats)
+    assert messages == [(0.05, 0x1cd9f900, PDU1)] and stats['completed'] == 1
+
+    # cts holds with 0 packets keep the session alive beyond the timeout
+    holds = [(0.5 * idx, connect(17, 0xf9, 0x00, 0, 0, 0xd900)) for idx in (1, 2, 3)]
+    data = [(1.6 + seq * 0.1, packet(0x00, 0xf9, PDU1, seq)) for seq in (1, 2, 3)]
+    messages, stats = run(rts[:1] + holds + data)
+    print('cts hold', stats)
+    assert messages == [(data[-1][0], 0x1cd9f900, PDU1)] and stats['expired'] == 0
+
+    # abort of the receiver ends the session, later packets are ignored
+    abort = (0.02, connect(255, 0xf9, 0x00, 0xffff, 0xff, 0xd900))
+    messages, stats = run(rts + [abort] + [(0.03 + seq * 0.01, packet(0x00, 0xf9, PDU1, seq)) for seq in (1, 2, 3)])
+    print('abort', stats)
+    assert messages == [] and stats['aborted'] == 1
+
+    # abort and cts holds of another pgn between the same nodes leave the session alone
+    other = [(0.02, connect(255, 0xf9, 0x00, 0xffff, 0xff, 0xfecb))] + \
+        [(0.5 * idx, connect(17, 0xf9, 0x00, 0, 0, 0xfecb)) for idx in (1, 2, 3)]
+    messages, stats = run(rts + other[:1] + [(0.03 + seq * 0.01, packet(0x00, 0xf9, PDU1, seq)) for seq in (1, 2, 3)])
+    print('other abort', stats)
+    assert messages == [(0.06, 0x1cd9f900, PDU1)] and stats['aborted'] == 0
+    messages, stats = run(rts[:1] + other[1:] + data)
+    print('other cts hold', stats)
+    assert messages == [] and stats['expired'] == 1
+
+    # packets after the timeout expire the session
+    messages, stats = run([(0.0, connect(32, 0x00, 0xff, 10, 2, 0xfeca)), (0.1, packet(0x00, 0xff, DM1, 1)),
+                           (1.0, packet(0x00, 0xff, DM1, 2))])
+    print('timeout', stats)
+    assert messages == [] and stats['expired'] == 1
+
+    # out of order, duplicate and invalid sequence numbers
+    order = (2, 2, 0, 9, 3, 1)
+    messages, stats = run([(0.0, connect(16, 0x00, 0xf9, 20, 3, 0xd900))] +
+                          [(0.01 * (idx + 1), packet(0x00, 0xf9, PDU1.ljust(70, b'\x00'), seq))
+                           for idx, seq in enumerate(order)])
+    print('out of order', messages, stats)
+    assert messages == [(0.06, 0x1cd9f900, PDU1)] and stats['completed'] == 1
+
+    # a new bam of the same source replaces the running session
+    messages, stats = run([(0.0, connect(32, 0x00, 0xff, 10, 2, 0xfeca)), (0.1, packet(0x00, 0xff, DM1, 1)),
+                           (0.2, connect(32, 0x00, 0xff, 10, 2, 0xfeca)), (0.3, packet(0x00, 0xff, DM1, 2))])
+    assert messages == [] and stats['aborted'] == 1